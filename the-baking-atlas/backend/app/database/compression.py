@@ -0,0 +1,223 @@
+"""
+Compressed storage for long text columns (story bodies, sources, country overviews).
+
+Columns declared as CompressedText are compressed by SQLite functions that
+every connection gets when it opens (see register_functions below):
+
+    INSERT ... VALUES (compress_text(?))      when writing
+    SELECT decompress_text(stories.body) ...  when reading
+
+so the rest of the app only ever sees plain strings. A compressed value is
+stored as a BLOB: 2 bytes naming the dictionary it was compressed with,
+then raw zlib (deflate) data. Short values, and values that don't get
+smaller, stay plain TEXT, as do rows written before compression existed,
+so both kinds can be read side by side.
+
+The dictionary is what makes short-ish texts compress well. zlib can copy
+from it as if it were text that came just before the value, so it holds
+the words and phrases our stories share ("the dough", "butter and
+sugar"...). train_dictionary() learns one from the text already in the
+database; dictionaries are kept in the text_dictionaries table and never
+deleted, so every value can always be decompressed. Retrain with
+compress_text.py once the content has grown or changed a lot.
+
+Models also mark these columns deferred: they're only loaded (and so only
+decompressed) when a route actually returns them, not for lists.
+"""
+
+import random
+import re
+import struct
+import zlib
+from collections import Counter
+from datetime import datetime
+from sqlite3 import Connection as SQLiteConnection
+from sqlite3 import OperationalError
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Text, event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+from app.database.database import Base
+
+# Values shorter than this (in characters) aren't worth compressing
+MIN_LENGTH = 256
+LEVEL = 9
+
+# zlib only looks back 32 KB, so a bigger dictionary wouldn't help
+DICTIONARY_SIZE = 32 * 1024
+# Phrases of up to this many words go into the dictionary
+MAX_PHRASE_WORDS = 3
+# Train on at most this much text (a random sample of it)
+MAX_TRAINING_CHARS = 1024 * 1024
+# With less text than this, there's nothing worth learning yet
+MIN_TRAINING_CHARS = 16 * 1024
+
+HEADER = struct.Struct(">H")  # Dictionary id, 0 for none
+RAW_DEFLATE = -15  # Deflate data without zlib's 6-byte header and checksum
+
+WORD = re.compile(r"\S+\s*")
+
+
+class CompressedText(TypeDecorator):
+    """A Text column that is stored compressed (see this module's docstring)."""
+
+    impl = Text
+    cache_ok = True
+
+    def bind_expression(self, bindvalue):
+        return func.compress_text(bindvalue, type_=self)
+
+    def column_expression(self, column):
+        return func.decompress_text(column, type_=self)
+
+
+# === COMPRESSING (inside SQLite) ===
+
+class _Dictionaries:
+    """The dictionaries stored in one database, loaded for one connection."""
+
+    def __init__(self, connection: SQLiteConnection):
+        self._connection = connection
+        self.by_id = {}
+        self.latest = 0
+        self.reload()
+
+    def reload(self):
+        try:
+            rows = self._connection.execute("SELECT id, data FROM text_dictionaries").fetchall()
+        except OperationalError:
+            rows = []  # No text_dictionaries table yet (brand new database)
+        self.by_id = {dictionary_id: bytes(data) for dictionary_id, data in rows}
+        self.latest = max(self.by_id, default=0)
+
+    def _options(self, dictionary_id: int) -> dict:
+        return {"zdict": self.by_id[dictionary_id]} if dictionary_id else {}
+
+    def compress(self, value):
+        # bytes are already compressed, e.g. when recompressing twice
+        if not isinstance(value, str) or len(value) < MIN_LENGTH:
+            return value
+        raw = value.encode("utf-8")
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, RAW_DEFLATE, **self._options(self.latest))
+        packed = HEADER.pack(self.latest) + compressor.compress(raw) + compressor.flush()
+        return packed if len(packed) < len(raw) else value
+
+    def decompress(self, value):
+        if not isinstance(value, bytes):
+            return value
+        (dictionary_id,) = HEADER.unpack_from(value)
+        if dictionary_id and dictionary_id not in self.by_id:
+            self.reload()  # Trained by another connection since this one opened
+        decompressor = zlib.decompressobj(RAW_DEFLATE, **self._options(dictionary_id))
+        return (decompressor.decompress(value[HEADER.size:]) + decompressor.flush()).decode("utf-8")
+
+
+# Like the foreign key PRAGMA in database.py, this applies to every SQLite
+# engine in the app (the API's, scripts', benchmarks')
+@event.listens_for(Engine, "connect")
+def register_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, SQLiteConnection):
+        dictionaries = _Dictionaries(dbapi_connection)
+        dbapi_connection.create_function("compress_text", 1, dictionaries.compress)
+        dbapi_connection.create_function("decompress_text", 1, dictionaries.decompress)
+        dbapi_connection.create_function("reload_text_dictionaries", 0, dictionaries.reload)
+
+
+def compressed_columns() -> List[Tuple[str, str]]:
+    """(table, column) of every CompressedText column in the models."""
+    return [
+        (table.name, column.name)
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, CompressedText)
+    ]
+
+
+# === TRAINING A DICTIONARY ===
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a zlib dictionary from example texts.
+
+    Phrases score by how many texts contain them times their length (what
+    they'd save). The best are packed in until the dictionary is full,
+    best last: zlib finds the end of the dictionary cheapest to refer to.
+    """
+    frequency = Counter()
+    for text in samples:
+        words = WORD.findall(text)
+        phrases = set()
+        for length in range(1, MAX_PHRASE_WORDS + 1):
+            phrases.update("".join(words[i:i + length]) for i in range(len(words) - length + 1))
+        frequency.update(phrases)
+        if len(frequency) > 1_000_000:
+            # Forget phrases seen only once so far, to bound memory
+            frequency = Counter({phrase: count for phrase, count in frequency.items() if count > 1})
+
+    scores = Counter({
+        phrase: (count - 1) * len(phrase.encode("utf-8"))
+        for phrase, count in frequency.items() if count > 1
+    })
+    chosen = []
+    packed = ""
+    used = 0
+    for phrase, _ in scores.most_common(20_000):
+        if phrase in packed:
+            continue  # Already covered by a longer phrase
+        encoded = len(phrase.encode("utf-8"))
+        if used + encoded > size:
+            continue
+        chosen.append(phrase)
+        packed += phrase
+        used += encoded
+    return "".join(reversed(chosen)).encode("utf-8")
+
+
+def training_samples(conn) -> List[str]:
+    """A random sample of the long texts in the compressed columns, up to MAX_TRAINING_CHARS."""
+    # Pick rows first, so only the sampled texts are ever loaded
+    candidates = [
+        (table, column, rowid)
+        for table, column in compressed_columns()
+        for rowid, in conn.exec_driver_sql(f"SELECT rowid FROM {table} WHERE length({column}) >= ?", (MIN_LENGTH,))
+    ]
+    random.Random(0).shuffle(candidates)
+    sample = []
+    total = 0
+    for table, column, rowid in candidates:
+        if total >= MAX_TRAINING_CHARS:
+            break
+        text = conn.exec_driver_sql(
+            f"SELECT decompress_text({column}) FROM {table} WHERE rowid = ?", (rowid,)
+        ).scalar()
+        sample.append(text)
+        total += len(text)
+    return sample
+
+
+def train(conn) -> Optional[int]:
+    """
+    Train a dictionary on this database's text and store it as the one new
+    values are compressed with. Returns its id, or None if there's too
+    little text to learn from yet (values are then compressed without one).
+    """
+    samples = training_samples(conn)
+    if sum(len(text) for text in samples) < MIN_TRAINING_CHARS:
+        return None
+    dictionary_id = conn.exec_driver_sql(
+        "INSERT INTO text_dictionaries (data, created_at) VALUES (?, ?) RETURNING id",
+        (train_dictionary(samples), str(datetime.utcnow())),
+    ).scalar()
+    conn.exec_driver_sql("SELECT reload_text_dictionaries()")
+    return dictionary_id
+
+
+def recompress(conn):
+    """Rewrite every compressed column with the newest dictionary (plain text gets compressed too)."""
+    for table, column in compressed_columns():
+        conn.exec_driver_sql(
+            f"UPDATE {table} SET {column} = compress_text(decompress_text({column})) "
+            f"WHERE {column} IS NOT NULL"
+        )
\ No newline at end of file
@@ -1,25 +1,71 @@
 
-from sqlalchemy import create_engine
+import os
+from contextvars import ContextVar
+from sqlite3 import Connection as SQLiteConnection
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.database.snapshot import Snapshot
 
 # SQLite database URL
 # This creates a file called 'baking_atlas.db' in your backend folder
 SQLALCHEMY_DATABASE_URL = "sqlite:///./baking_atlas.db"
 
-# Create the database engine
+# Read-only replicas can serve from an in-memory copy of the file instead
+# (see app/database/snapshot.py)
+SERVE_FROM_MEMORY = os.environ.get("SERVE_FROM_MEMORY") == "1"
+
+# The database file itself
 # check_same_thread=False is needed for SQLite to work with FastAPI
-engine = create_engine(
+file_engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args={"check_same_thread": False}
 )
 
+# The engine requests use: the file, or its in-memory copy
+if SERVE_FROM_MEMORY:
+    snapshot = Snapshot(file_engine.url.database)
+    # QueuePool: for in-memory URLs SQLAlchemy would otherwise keep one connection per thread
+    engine = create_engine("sqlite://", creator=snapshot.connect, poolclass=QueuePool)
+else:
+    snapshot = None
+    engine = file_engine
+
+# SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked to,
+# once per connection. This applies to every SQLite engine in the app.
+@event.listens_for(Engine, "connect")
+def enable_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, SQLiteConnection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
+def use_wal(engine):
+    """
+    Put the database file in WAL mode (the setting is stored in the file),
+    so readers and the writer don't block each other, and online backups
+    (app/services/backups.py) can copy it a little at a time.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
 # Create a SessionLocal class - this will be used to create database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False keeps objects usable after commit, so write routes
+# can build their response from data they already have instead of reloading it
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for our models
 Base = declarative_base()
 
+# Set by POST /api/batch (app/routes/batch.py) while its sub-requests run,
+# so they all share its session
+shared_session: ContextVar[Optional[Session]] = ContextVar("shared_session", default=None)
+
 # Dependency to get database session
 def get_db():
     """
@@ -27,6 +73,11 @@ def get_db():
     
     Think of this like checking out a book from the library and returning it.
     """
+    shared = shared_session.get()
+    if shared is not None:
+        # A batch's sub-request: the batch closes the session when it's done
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
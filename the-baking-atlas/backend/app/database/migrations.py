@@ -0,0 +1,261 @@
+"""
+Schema migrations for existing databases.
+
+Base.metadata.create_all() only creates tables that don't exist yet, so any
+change to a table that already has data lives here. Each migration runs once,
+in order, and the number of applied migrations is kept in SQLite's
+PRAGMA user_version.
+
+Migrations must also be safe on a brand new database, where create_all()
+has already built the tables in their latest shape.
+"""
+
+import json
+
+from app.database import compression
+from app.database.database import Base
+from app.models import models
+from app.models.models import normalize_ingredient_name
+from app.services import story_pins, story_sections
+from app.services.region_tree import get_or_create_region_for_name
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _merge_extra_data(values):
+    """
+    One extra_data from several rows' (oldest first): their attributes
+    together, the oldest row's winning where they differ. A value that
+    isn't an object can't be merged, so the oldest one of those wins whole.
+    """
+    merged = None
+    for value in reversed(values):
+        if isinstance(merged, dict) and isinstance(value, dict):
+            merged = {**merged, **value}
+        else:
+            merged = value
+    return merged
+
+
+def canonical_ingredients(conn):
+    """
+    Move ingredient names into the shared canonical_ingredients table.
+
+    Rows whose names only differ by case/spacing become one canonical
+    ingredient, and duplicate rows for the same country are merged (see
+    _merge_extra_data()).
+    """
+    if "name" not in _columns(conn, "ingredients"):
+        return
+
+    if "canonical_id" not in _columns(conn, "ingredients"):
+        conn.exec_driver_sql(
+            "ALTER TABLE ingredients ADD COLUMN canonical_id INTEGER "
+            "REFERENCES canonical_ingredients (id)"
+        )
+
+    # Create one canonical row per normalized name (first spelling wins)
+    canonical_ids = {
+        normalized: id for id, normalized in
+        conn.exec_driver_sql("SELECT id, normalized_name FROM canonical_ingredients")
+    }
+    rows = conn.exec_driver_sql("SELECT id, name FROM ingredients ORDER BY id").fetchall()
+    for ingredient_id, name in rows:
+        normalized = normalize_ingredient_name(name)
+        if normalized not in canonical_ids:
+            result = conn.exec_driver_sql(
+                "INSERT INTO canonical_ingredients (name, normalized_name) VALUES (?, ?)",
+                (" ".join(name.split()), normalized),
+            )
+            canonical_ids[normalized] = result.lastrowid
+        conn.exec_driver_sql(
+            "UPDATE ingredients SET canonical_id = ? WHERE id = ?",
+            (canonical_ids[normalized], ingredient_id),
+        )
+
+    # Merge duplicates within a country: keep the oldest row, borrow a
+    # description from a duplicate if the oldest row has none, and merge
+    # their extra_data into it
+    duplicates = conn.exec_driver_sql(
+        "SELECT country_id, canonical_id, MIN(id) FROM ingredients "
+        "GROUP BY country_id, canonical_id HAVING COUNT(*) > 1"
+    ).fetchall()
+    for country_id, canonical_id, keep_id in duplicates:
+        conn.exec_driver_sql(
+            "UPDATE ingredients SET description = ("
+            "  SELECT description FROM ingredients"
+            "  WHERE country_id = ? AND canonical_id = ? AND description IS NOT NULL"
+            "  ORDER BY id LIMIT 1"
+            ") WHERE id = ? AND description IS NULL",
+            (country_id, canonical_id, keep_id),
+        )
+        extras = conn.exec_driver_sql(
+            "SELECT extra_data FROM ingredients WHERE country_id = ? AND canonical_id = ? "
+            "AND extra_data IS NOT NULL ORDER BY id",
+            (country_id, canonical_id),
+        ).fetchall()
+        if extras:
+            conn.exec_driver_sql(
+                "UPDATE ingredients SET extra_data = ? WHERE id = ?",
+                (json.dumps(_merge_extra_data([json.loads(extra) for extra, in extras])), keep_id),
+            )
+        conn.exec_driver_sql(
+            "DELETE FROM ingredients WHERE country_id = ? AND canonical_id = ? AND id != ?",
+            (country_id, canonical_id, keep_id),
+        )
+
+    conn.exec_driver_sql("ALTER TABLE ingredients DROP COLUMN name")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ingredients_canonical_id ON ingredients (canonical_id)"
+    )
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_ingredients_country_canonical "
+        "ON ingredients (country_id, canonical_id)"
+    )
+
+
+def region_hierarchy(conn):
+    """Attach every country to a node of the new region tree, based on its free-text region."""
+    if "region_id" not in _columns(conn, "countries"):
+        conn.exec_driver_sql("ALTER TABLE countries ADD COLUMN region_id INTEGER REFERENCES regions (id)")
+
+    countries = conn.exec_driver_sql(
+        "SELECT id, region FROM countries WHERE region_id IS NULL AND region IS NOT NULL"
+    ).fetchall()
+    for country_id, region in countries:
+        conn.exec_driver_sql(
+            "UPDATE countries SET region_id = ? WHERE id = ?",
+            (get_or_create_region_for_name(conn, region), country_id),
+        )
+
+
+def story_pin_index(conn):
+    """Create the story_pins R*Tree and its cluster counts from the stories' coordinates."""
+    story_pins.rebuild(conn)
+
+
+# Rows pointing at parents that are already gone. SQLite didn't enforce
+# foreign keys before, so there may be some; they must go before the
+# cascading tables are rebuilt (which copies rows under enforcement).
+ORPHANS = [
+    ("story_regions", "story_id", "stories"),
+    ("story_regions", "country_id", "countries"),
+    ("story_tags", "story_id", "stories"),
+    ("story_tags", "tag_id", "tags"),
+    ("baked_goods", "country_id", "countries"),
+    ("ingredients", "country_id", "countries"),
+    ("ingredients", "canonical_id", "canonical_ingredients"),
+    ("region_closure", "ancestor_id", "regions"),
+    ("region_closure", "descendant_id", "regions"),
+]
+
+
+def _cascades(conn, table, parent):
+    """Does every foreign key from `table` to `parent` say ON DELETE CASCADE?"""
+    keys = [row for row in conn.exec_driver_sql(f"PRAGMA foreign_key_list({table})") if row[2] == parent]
+    return all(row[6] == "CASCADE" for row in keys)
+
+
+def _rebuild_table(conn, table):
+    """
+    Recreate a table in its current model shape, keeping its rows.
+
+    SQLite can't change a foreign key in place, so the old table is renamed,
+    the new one is created from the model (with its indexes), and the rows
+    are copied across.
+    """
+    name = table.name
+    old = f"_{name}_old"
+    conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {old}")
+    # The old indexes moved with the table; free up their names
+    for index, in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (old,)
+    ).fetchall():
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    table.create(conn)
+    columns = ", ".join(column.name for column in table.columns if column.name in _columns(conn, old))
+    conn.exec_driver_sql(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {old}")
+    conn.exec_driver_sql(f"DROP TABLE {old}")
+
+
+def cascading_deletes(conn):
+    """
+    Let SQLite delete a country's baked goods and ingredients with it.
+
+    Foreign keys are enforced from now on (see database.py), so rows that
+    point at missing parents are cleaned up first.
+    """
+    for table, column, parent in ORPHANS:
+        conn.exec_driver_sql(
+            f"DELETE FROM {table} WHERE {column} IS NOT NULL AND {column} NOT IN (SELECT id FROM {parent})"
+        )
+    conn.exec_driver_sql(
+        "UPDATE countries SET region_id = NULL WHERE region_id NOT IN (SELECT id FROM regions)"
+    )
+
+    for model in (models.BakedGood, models.Ingredient):
+        if not _cascades(conn, model.__tablename__, "countries"):
+            _rebuild_table(conn, model.__table__)
+
+
+def story_revision_history(conn):
+    """Save every existing story as its revision 1, the base its later edits build on."""
+    conn.exec_driver_sql(
+        "INSERT INTO story_revisions (story_id, number, title, body, created_at) "
+        "SELECT id, 1, title, body, COALESCE(updated_at, published_at) FROM stories "
+        "WHERE id NOT IN (SELECT story_id FROM story_revisions)"
+    )
+
+
+def compressed_text_columns(conn):
+    """
+    Compress the long text columns (app/database/compression.py), with a
+    dictionary trained on the text already here if there's enough of it.
+    """
+    compression.train(conn)
+    compression.recompress(conn)
+
+
+def story_section_index(conn):
+    """Cut every existing story's body into sections for its table of contents."""
+    story_sections.rebuild(conn)
+
+
+# In order. Never reorder or remove entries - append new migrations at the end.
+MIGRATIONS = [
+    canonical_ingredients,
+    region_hierarchy,
+    story_pin_index,
+    cascading_deletes,
+    story_revision_history,
+    compressed_text_columns,
+    story_section_index,
+]
+
+
+def create_missing_indexes(conn):
+    """
+    Create any index declared on the models that the database doesn't have yet.
+
+    create_all() only builds indexes together with new tables, so indexes
+    added to existing tables (like the extra_data ones) are created here.
+    """
+    # Look the names up in sqlite_master: reflection skips expression
+    # indexes, so checkfirst=True would try to create those again
+    existing = {name for name, in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+
+def run_migrations(engine):
+    """Apply any migrations this database hasn't had yet, then add missing indexes."""
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        create_missing_indexes(conn)
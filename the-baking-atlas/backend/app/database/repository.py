@@ -0,0 +1,109 @@
+"""
+The lookups routes do all the time, in one place: a country by its code,
+a story by its slug, a tag by its name, and so on.
+
+Each lookup is a select() built once, when this module is imported, with
+bindparam() placeholders for the values it's called with. Writing the
+same lookup as db.query(...).filter(...) builds a new query object on
+every call, and SQLAlchemy then has to work out its cache key before it
+can find the already compiled SQL in the engine's statement cache; for a
+one-row lookup by an indexed column that costs more than SQLite's own
+work. A prebuilt statement already has its cache key, so each call goes
+straight to running the SQL. (benchmarks/bench_lookups.py measures the
+difference.)
+
+The functions take care of normalizing the value the way it's stored
+(country codes upper case, tag names lower case...), and return None when
+nothing matches.
+"""
+
+from typing import Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session, undefer_group
+
+from app.models import models
+
+# === COUNTRIES ===
+
+_COUNTRY_BY_CODE = select(models.Country).where(models.Country.code == bindparam("code"))
+_COUNTRY_WITH_TEXT_BY_CODE = _COUNTRY_BY_CODE.options(undefer_group("text"))
+_COUNTRY_ID_BY_CODE = select(models.Country.id).where(models.Country.code == bindparam("code"))
+
+
+def country_by_code(db: Session, code: str, with_text: bool = False) -> Optional[models.Country]:
+    """A country by code (any case). with_text also loads its (deferred) overview."""
+    statement = _COUNTRY_WITH_TEXT_BY_CODE if with_text else _COUNTRY_BY_CODE
+    return db.scalars(statement, {"code": code.upper()}).first()
+
+
+def country_id_by_code(db: Session, code: str) -> Optional[int]:
+    return db.scalars(_COUNTRY_ID_BY_CODE, {"code": code.upper()}).first()
+
+
+# === BAKED GOODS AND INGREDIENTS ===
+
+_BAKED_GOOD_BY_ID = select(models.BakedGood).where(models.BakedGood.id == bindparam("id"))
+_INGREDIENT_BY_ID = select(models.Ingredient).where(models.Ingredient.id == bindparam("id"))
+_CANONICAL_INGREDIENT_BY_NAME = select(models.CanonicalIngredient).where(
+    models.CanonicalIngredient.normalized_name == bindparam("normalized_name")
+)
+
+
+def baked_good_by_id(db: Session, baked_good_id: int) -> Optional[models.BakedGood]:
+    return db.scalars(_BAKED_GOOD_BY_ID, {"id": baked_good_id}).first()
+
+
+def ingredient_by_id(db: Session, ingredient_id: int) -> Optional[models.Ingredient]:
+    return db.scalars(_INGREDIENT_BY_ID, {"id": ingredient_id}).first()
+
+
+def canonical_ingredient_by_name(db: Session, name: str) -> Optional[models.CanonicalIngredient]:
+    """The catalogue entry for an ingredient name (case and extra spaces ignored)."""
+    normalized = models.normalize_ingredient_name(name)
+    return db.scalars(_CANONICAL_INGREDIENT_BY_NAME, {"normalized_name": normalized}).first()
+
+
+# === STORIES ===
+
+_STORY_BY_SLUG = select(models.Story).where(models.Story.slug == bindparam("slug")).options(undefer_group("text"))
+_STORY_BY_ID = select(models.Story).where(models.Story.id == bindparam("id")).options(undefer_group("text"))
+_STORY_ID_BY_SLUG = select(models.Story.id).where(models.Story.slug == bindparam("slug"))
+_STORY_SUMMARY_BY_SLUG = select(models.Story.id, models.Story.title, models.Story.updated_at).where(
+    models.Story.slug == bindparam("slug")
+)
+
+
+def story_by_slug(db: Session, slug: str) -> Optional[models.Story]:
+    """A story by slug, with its (deferred) text columns loaded."""
+    return db.scalars(_STORY_BY_SLUG, {"slug": slug}).first()
+
+
+def story_by_id(db: Session, story_id: int) -> Optional[models.Story]:
+    """A story by id, with its (deferred) text columns loaded."""
+    return db.scalars(_STORY_BY_ID, {"id": story_id}).first()
+
+
+def story_id_by_slug(db: Session, slug: str) -> Optional[int]:
+    return db.scalars(_STORY_ID_BY_SLUG, {"slug": slug}).first()
+
+
+def story_summary_by_slug(db: Session, slug: str):
+    """(id, title, updated_at) of a story, without loading the rest of it."""
+    return db.execute(_STORY_SUMMARY_BY_SLUG, {"slug": slug}).first()
+
+
+# === TAGS AND REGIONS ===
+
+_TAG_BY_NAME = select(models.Tag).where(models.Tag.name == bindparam("name"))
+_REGION_BY_SLUG = select(models.Region).where(models.Region.slug == bindparam("slug"))
+
+
+def tag_by_name(db: Session, name: str) -> Optional[models.Tag]:
+    """A tag by name (any case)."""
+    return db.scalars(_TAG_BY_NAME, {"name": name.lower()}).first()
+
+
+def region_by_slug(db: Session, slug: str) -> Optional[models.Region]:
+    """A region by slug (any case)."""
+    return db.scalars(_REGION_BY_SLUG, {"slug": slug.lower()}).first()
\ No newline at end of file
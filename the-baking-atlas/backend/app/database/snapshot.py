@@ -0,0 +1,152 @@
+"""
+Serve reads from an in-memory copy of the database (SERVE_FROM_MEMORY=1).
+
+Read-only replicas of the public site never write, yet every query would
+still read pages from baking_atlas.db. In this mode the file is copied at
+startup into a shared-cache in-memory SQLite database, with SQLite's
+online backup API (so the copy is consistent even while something else
+writes to the file), and the engine in database.py connects to that copy
+instead. Its connections are query_only, and app/main.py turns away
+POST, PUT, PATCH and DELETE requests with 405.
+
+A fresh copy is loaded and swapped in, without dropping requests, when:
+
+- the file changes (checked every SNAPSHOT_POLL_INTERVAL seconds, 1 by
+  default), or
+- the process gets SIGHUP.
+
+Requests already running finish on the old copy, which is freed once
+their connections close. In-memory caches built from tables that changed
+(per table_versions) are dropped at the swap, as
+app/services/cache_sync.py does between workers, and rebuild from the new
+copy.
+
+Each server process holds its own copy: memory use is about the size of
+the file per worker, and twice that for a moment during a swap.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+POLL_INTERVAL = float(os.environ.get("SNAPSHOT_POLL_INTERVAL", "1"))
+
+# Shared-cache memory databases are shared by name across the whole process,
+# so every copy gets a name of its own
+_copy_numbers = itertools.count(1)
+
+
+class Snapshot:
+    """An in-memory copy of a database file, swapped for a new one when the file changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0  # Copies loaded so far
+        self._lock = threading.Lock()  # Guards swapping against opening connections
+        self._load_lock = threading.Lock()  # One load at a time
+        # A memory database lives only while a connection to it is open; this one keeps the copy alive
+        self._anchor: Optional[sqlite3.Connection] = None
+        self._uri: Optional[str] = None
+        self._file_state = None  # The file's state when the current copy was taken
+        self._on_swap: List[Callable[[], None]] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._reload_requested = False
+        self._thread: Optional[threading.Thread] = None
+
+    def on_swap(self, callback: Callable[[], None]):
+        """Call `callback` after each new copy is swapped in (e.g. to drop caches)."""
+        self._on_swap.append(callback)
+
+    # === CONNECTING ===
+
+    def connect(self) -> sqlite3.Connection:
+        """A new read-only connection to the current copy (the engine's creator)."""
+        if self._uri is None:
+            self.load()
+        # Under the lock, so the copy can't be swapped out and freed mid-connect
+        # (connecting to a freed one would quietly create an empty database)
+        with self._lock:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    # === LOADING ===
+
+    def load(self):
+        """Copy the file into a new in-memory database and point new connections at it."""
+        with self._load_lock:
+            # Taken before copying: a change during the copy triggers another load
+            state = self._read_file_state()
+            self.generation += 1
+            uri = f"file:baking_atlas_snapshot_{next(_copy_numbers)}?mode=memory&cache=shared"
+            copy = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            source = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            try:
+                source.backup(copy)
+            except sqlite3.Error:
+                copy.close()
+                raise
+            finally:
+                source.close()
+
+            with self._lock:
+                old, self._anchor, self._uri = self._anchor, copy, uri
+                self._file_state = state
+            for callback in self._on_swap:
+                callback()
+            if old is not None:
+                old.close()
+
+    def _read_file_state(self):
+        """Size, modification time and inode of the file and its WAL (commits in WAL mode only touch the WAL)."""
+        state = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    # === WATCHING FOR CHANGES ===
+
+    def request_reload(self):
+        """Load a fresh copy soon (safe to call from a signal handler)."""
+        self._reload_requested = True
+        self._wake.set()
+
+    def start(self, interval: float = POLL_INTERVAL):
+        """Start watching the file (once per process). Call before serving requests."""
+        if self._thread is not None:
+            return
+        if self._uri is None:
+            self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="snapshot-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float):
+        while True:
+            # Without polling (interval 0) only a reload request wakes us
+            self._wake.wait(interval if interval > 0 else None)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            if self._reload_requested or (interval > 0 and self._read_file_state() != self._file_state):
+                self._reload_requested = False
+                try:
+                    self.load()
+                except sqlite3.Error:
+                    # e.g. the file is mid-replace; keep serving the old copy and try again next round
+                    self._file_state = None
\ No newline at end of file
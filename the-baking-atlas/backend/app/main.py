@@ -1,17 +1,64 @@
-from fastapi import FastAPI
+import signal
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.database.database import engine, file_engine, snapshot, use_wal, Base
+from app.database.migrations import run_migrations
+from app.routes import admin, baked_goods, batch, changes, countries, ingredients, regions, search, stories, tiles
+from app.routes.coalescing import CoalescingMiddleware
+from app.routes.profiling import PROFILE_TOKEN, ProfilingMiddleware
+from app.routes.writes import WRITE_METHODS
+from app.services.cache_sync import cache_sync
+from app.services.change_log import change_feed
+
+# Create database tables, then bring existing ones up to date (in the file,
+# even when serving from an in-memory copy of it)
+Base.metadata.create_all(bind=file_engine)
+run_migrations(file_engine)
+use_wal(file_engine)
+
+
+def snapshot_swapped():
+    """
+    A new in-memory copy is in: drop pooled connections to the old one, and
+    the caches built from tables that changed between the two copies.
+    """
+    engine.dispose()
+    with engine.connect() as conn:
+        cache_sync.apply(dict(conn.exec_driver_sql("SELECT name, version FROM table_versions").all()))
 
-from app.database.database import engine, Base
-from app.routes import countries, stories
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Wake the change streams (GET /api/changes/stream) when changes come in
+    change_feed.start(engine)
+    if snapshot is not None:
+        # Reload the in-memory copy when the file changes, or on SIGHUP
+        snapshot.on_swap(snapshot_swapped)
+        snapshot.start()
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: snapshot.request_reload())
+        yield
+        snapshot.stop()
+        change_feed.stop()
+        return
+    # Notice writes from other processes (other workers, scripts) and drop
+    # the in-memory indexes they made stale
+    cache_sync.start(engine.url.database)
+    yield
+    cache_sync.stop()
+    change_feed.stop()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="The Baking Atlas API",
     description="API for exploring global baking traditions",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS (allows your frontend to talk to the backend)
@@ -26,9 +73,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Identical GET requests arriving together share one response (app/routes/coalescing.py)
+app.add_middleware(CoalescingMiddleware)
+
+# Requests sent with X-Profile-Token: $PROFILE_TOKEN are profiled (app/routes/profiling.py)
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+# A read-only replica (SERVE_FROM_MEMORY=1) turns writes away before they reach a route
+if snapshot is not None:
+    @app.middleware("http")
+    async def reject_writes(request: Request, call_next):
+        # POST /api/batch only reads
+        if request.method in WRITE_METHODS and request.url.path != "/api/batch":
+            return JSONResponse(
+                status_code=405,
+                content={"detail": "This server is a read-only replica; send changes to the main API"},
+                headers={"Allow": "GET, HEAD, OPTIONS"}
+            )
+        return await call_next(request)
+
 # Include routers
 app.include_router(countries.router)
+app.include_router(baked_goods.router)
 app.include_router(stories.router)
+app.include_router(ingredients.router)
+app.include_router(regions.router)
+app.include_router(search.router)
+app.include_router(tiles.router)
+app.include_router(batch.router)
+app.include_router(changes.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def root():
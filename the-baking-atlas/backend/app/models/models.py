@@ -1,24 +1,92 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, JSON, DateTime, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Integer, String, Text, ForeignKey, JSON, DateTime, LargeBinary, Table, UniqueConstraint, Index, func, literal_column
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
+from app.database.compression import CompressedText
 from app.database.database import Base
 
 
+def extra_field(column, key: str):
+    """
+    SQL for one attribute inside an extra_data column, e.g. extra_data -> "texture".
+
+    The path is written out literally (not as a bound parameter) so that the
+    expression matches the extra_data indexes below and SQLite can use them.
+    Only use it with keys from EXTRA_INDEXED_KEYS, never with user input.
+    """
+    return func.json_extract(column, literal_column(f"'$.{key}'"))
+
+
+def extra_is_list(column, key: str):
+    """SQL that is true where an attribute inside extra_data holds a list, written like extra_field()."""
+    return func.json_type(column, literal_column(f"'$.{key}'")) == literal_column("'array'")
+
+
+def extra_data_indexes(table_name: str, column, keys):
+    """
+    Two indexes per indexed extra_data attribute: an expression index on
+    its value, and a partial index of the rows where it holds a list
+    (app/routes/filters.py looks inside those).
+    """
+    indexes = ()
+    for key in keys:
+        indexes += (
+            Index(f"ix_{table_name}_extra_{key}", extra_field(column, key)),
+            Index(f"ix_{table_name}_extra_{key}_lists", "id", sqlite_where=extra_is_list(column, key)),
+        )
+    return indexes
+
+
 # Junction tables for many-to-many relationships
 story_regions = Table(
     "story_regions",
     Base.metadata,
     Column("story_id", Integer, ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True),
-    Column("country_id", Integer, ForeignKey("countries.id", ondelete="CASCADE"), primary_key=True)
+    # The primary key only helps lookups by story; this one is for "stories in a country"
+    Column("country_id", Integer, ForeignKey("countries.id", ondelete="CASCADE"), primary_key=True, index=True)
+)
+
+# Every (ancestor, descendant) pair of regions, including each region with
+# itself at depth 0. "Everything under Asia" is then a single indexed lookup,
+# however deep the tree is. Maintained by app/services/region_tree.py.
+region_closure = Table(
+    "region_closure",
+    Base.metadata,
+    Column("ancestor_id", Integer, ForeignKey("regions.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", Integer, ForeignKey("regions.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("depth", Integer, nullable=False)
 )
 
 story_tags = Table(
     "story_tags",
     Base.metadata,
     Column("story_id", Integer, ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True),
-    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True)  # "Stories with a tag"
 )
 
+class Region(Base):
+    """
+    A geographic grouping of countries, e.g. "Asia" > "East Asia".
+
+    Regions are navigational containers, not baking cultures. Countries
+    hang off the smallest region they belong to.
+    """
+    __tablename__ = "regions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False)  # e.g., "East Asia"
+    slug = Column(String(200), unique=True, nullable=False, index=True)  # e.g., "east-asia"
+    type = Column(String(20), nullable=False)  # "region" | "subregion"
+    parent_region_id = Column(Integer, ForeignKey("regions.id"), nullable=True, index=True)
+
+    # Relationships
+    parent = relationship("Region", remote_side=[id], back_populates="children")
+    children = relationship("Region", back_populates="parent")
+    countries = relationship("Country", back_populates="region_node")
+
+    def __repr__(self):
+        return f"<Region {self.name}>"
+
+
 class Country(Base):
     """
     Stores information about countries and their baking cultures.
@@ -26,18 +94,27 @@ class Country(Base):
     Think of this as the main "chapter" for each country.
     """
     __tablename__ = "countries"
+
+    # extra_data attributes with their own index (filter with ?extra.<key>=...)
+    EXTRA_INDEXED_KEYS = ()
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)  # e.g., "Japan"
     code = Column(String(10), unique=True, nullable=False, index=True)  # e.g., "JP"
     region = Column(String(100))  # e.g., "East Asia"
-    overview = Column(Text)  # Long description of baking culture
+    region_id = Column(Integer, ForeignKey("regions.id"), nullable=True, index=True)  # Same region, as a tree node
+    # Long description of baking culture. Stored compressed, and only loaded
+    # when a response shows it (undefer_group("text"))
+    overview = deferred(Column(CompressedText), group="text")
     extra_data = Column(JSON, nullable=True)  # Flexible storage for extra data
     
     # Relationships - this creates easy access to related data
-    baked_goods = relationship("BakedGood", back_populates="country", cascade="all, delete-orphan")
-    ingredients = relationship("Ingredient", back_populates="country", cascade="all, delete-orphan")
-    stories = relationship("Story", secondary=story_regions, back_populates="regions")
+    # passive_deletes: SQLite removes the children itself (ON DELETE CASCADE),
+    # so deleting a country doesn't load them all first
+    baked_goods = relationship("BakedGood", back_populates="country", cascade="all, delete-orphan", passive_deletes=True)
+    ingredients = relationship("Ingredient", back_populates="country", cascade="all, delete-orphan", passive_deletes=True)
+    stories = relationship("Story", secondary=story_regions, back_populates="regions", passive_deletes=True)
+    region_node = relationship("Region", back_populates="countries")
     
     def __repr__(self):
         return f"<Country {self.name} ({self.code})>"
@@ -52,11 +129,15 @@ class BakedGood(Base):
     __tablename__ = "baked_goods"
     
     id = Column(Integer, primary_key=True, index=True)
-    country_id = Column(Integer, ForeignKey("countries.id"), nullable=False)
+    country_id = Column(Integer, ForeignKey("countries.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(200), nullable=False)  # e.g., "Melonpan"
     description = Column(Text)  # What it is, how it tastes, etc.
-    category = Column(String(100))  # e.g., "bread", "pastry", "cake"
+    category = Column(String(100), index=True)  # e.g., "bread", "pastry", "cake"
     extra_data = Column(JSON, nullable=True)  # For flavor notes, occasions, etc.
+
+    # extra_data attributes with their own index (filter with ?extra.<key>=...)
+    EXTRA_INDEXED_KEYS = ("texture", "origin")
+    __table_args__ = extra_data_indexes("baked_goods", extra_data, EXTRA_INDEXED_KEYS)
     
     # Relationship back to country
     country = relationship("Country", back_populates="baked_goods")
@@ -65,22 +146,59 @@ class BakedGood(Base):
         return f"<BakedGood {self.name}>"
 
 
+def normalize_ingredient_name(name: str) -> str:
+    """Key used to match ingredient names: "  Azuki  Beans" -> "azuki beans"."""
+    return " ".join(name.lower().split())
+
+
+class CanonicalIngredient(Base):
+    """
+    One row per distinct ingredient, shared by every country that uses it.
+
+    "Matcha" exists once here, no matter how many countries bake with it.
+    """
+    __tablename__ = "canonical_ingredients"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False)  # Display name, e.g. "Azuki beans"
+    normalized_name = Column(String(200), unique=True, nullable=False, index=True)  # e.g. "azuki beans"
+
+    # Relationships
+    usages = relationship("Ingredient", back_populates="canonical")
+
+    def __repr__(self):
+        return f"<CanonicalIngredient {self.name}>"
+
+
 class Ingredient(Base):
     """
-    Stores common ingredients used in each country's baking.
+    Stores how a country uses a (canonical) ingredient in its baking.
     
     This helps users discover what makes each region's baking unique.
+    The name lives on the canonical ingredient; description and extra_data
+    are specific to this country.
     """
     __tablename__ = "ingredients"
     
     id = Column(Integer, primary_key=True, index=True)
-    country_id = Column(Integer, ForeignKey("countries.id"), nullable=False)
-    name = Column(String(200), nullable=False)  # e.g., "matcha", "azuki beans"
+    country_id = Column(Integer, ForeignKey("countries.id", ondelete="CASCADE"), nullable=False)
+    canonical_id = Column(Integer, ForeignKey("canonical_ingredients.id"), nullable=False, index=True)
     description = Column(Text, nullable=True)  # How it's used, what it adds
     extra_data = Column(JSON, nullable=True)  # For seasonal info, alternatives, etc.
+
+    # extra_data attributes with their own index (filter with ?extra.<key>=...)
+    EXTRA_INDEXED_KEYS = ("preparation",)
+    __table_args__ = (
+        UniqueConstraint("country_id", "canonical_id", name="uq_ingredients_country_canonical"),
+    ) + extra_data_indexes("ingredients", extra_data, EXTRA_INDEXED_KEYS)
     
-    # Relationship back to country
+    # Relationships - the canonical ingredient is always needed for the name
     country = relationship("Country", back_populates="ingredients")
+    canonical = relationship("CanonicalIngredient", back_populates="usages", lazy="joined")
+
+    @property
+    def name(self):
+        return self.canonical.name if self.canonical else None
 
     def __repr__(self):
         return f"<Ingredient {self.name}>"
@@ -100,22 +218,79 @@ class Story(Base):
     title = Column(String(300), nullable=False)
     slug = Column(String(300), unique=True, nullable=False, index=True)  # URL-friendly identifier
     summary = Column(Text)  # Excerpt for previews
-    body = Column(Text, nullable=False)  # Markdown content
+    # Long text is stored compressed, and only loaded when a response shows
+    # it (undefer_group("text")), so story lists never read it
+    body = deferred(Column(CompressedText, nullable=False), group="text")  # Markdown content
     time_context = Column(String(50))  # "historical" | "modern" | "ongoing" | "mixed"
     author_name = Column(String(200))  # Simple string for MVP
-    sources = Column(Text, nullable=True)  # References and citations
+    sources = deferred(Column(CompressedText, nullable=True), group="text")  # References and citations
     published_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     extra_data = Column(JSON, nullable=True)  # Future flexibility (pin coords, etc.)
 
+    # extra_data attributes with their own index (filter with ?extra.<key>=...)
+    EXTRA_INDEXED_KEYS = ()
+
     # Relationships
-    regions = relationship("Country", secondary=story_regions, back_populates="stories")
-    tags = relationship("Tag", secondary=story_tags, back_populates="stories")
+    regions = relationship("Country", secondary=story_regions, back_populates="stories", passive_deletes=True)
+    tags = relationship("Tag", secondary=story_tags, back_populates="stories", passive_deletes=True)
 
     def __repr__(self):
         return f"<Story {self.title}>"
 
 
+class StorySection(Base):
+    """
+    One section of a story's body: from a heading up to the next one, with
+    its entry in the story's table of contents. Section 1 is the text
+    before the first heading, if there is any.
+    Maintained by app/services/story_sections.py.
+    """
+    __tablename__ = "story_sections"
+
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    number = Column(Integer, primary_key=True)  # 1, 2, 3... in reading order
+    heading = Column(Text, nullable=True)  # None for the text before the first heading
+    level = Column(Integer, nullable=False)  # 1 for "#", 2 for "##"...; 0 without a heading
+    byte_offset = Column(Integer, nullable=False)  # Where it starts in the UTF-8 encoded body
+    byte_length = Column(Integer, nullable=False)
+    word_count = Column(Integer, nullable=False)
+    # Its own compressed copy, so one section is read without decompressing the whole body
+    body = deferred(Column(CompressedText, nullable=False), group="text")
+
+    def __repr__(self):
+        return f"<StorySection {self.story_id} #{self.number}>"
+
+
+class StoryRevision(Base):
+    """
+    One saved version of a story's title and body. Revision 1 is the story
+    as first written; every edit to the title or body adds the next one.
+
+    Most revisions only store a delta against the previous revision. Every
+    so often one stores the whole body (a snapshot), so rebuilding any
+    version only applies a bounded number of deltas.
+    Maintained by app/services/story_revisions.py.
+    """
+    __tablename__ = "story_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), nullable=False)
+    number = Column(Integer, nullable=False)  # 1, 2, 3... per story
+    title = Column(String(300), nullable=False)
+    body = Column(CompressedText, nullable=True)  # The full body, for snapshots only
+    body_delta = Column(Text, nullable=True)  # Otherwise: the changes since the previous revision
+    revision_notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("story_id", "number", name="uq_story_revisions_story_number"),
+    )
+
+    def __repr__(self):
+        return f"<StoryRevision {self.story_id} #{self.number}>"
+
+
 class Tag(Base):
     """
     Lightweight tags for cross-story discovery.
@@ -130,7 +305,81 @@ class Tag(Base):
     tag_type = Column(String(50), nullable=True)  # "ingredient" | "technique" | "theme"
 
     # Relationships
-    stories = relationship("Story", secondary=story_tags, back_populates="tags")
+    stories = relationship("Story", secondary=story_tags, back_populates="tags", passive_deletes=True)
 
     def __repr__(self):
-        return f"<Tag {self.name}>"
\ No newline at end of file
+        return f"<Tag {self.name}>"
+
+
+class TableVersion(Base):
+    """
+    A counter per table, bumped by every write route in the same transaction.
+
+    GET routes build their ETag from the versions of the tables they read,
+    so a client's cached copy stays valid until one of those tables changes.
+    Maintained by app/services/versions.py.
+    """
+    __tablename__ = "table_versions"
+
+    name = Column(String(100), primary_key=True)  # Table name, e.g. "countries"
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<TableVersion {self.name} v{self.version}>"
+
+
+class ChangeLogEntry(Base):
+    """
+    One change to a country, story or tag, for clients keeping a copy of
+    the atlas in step (GET /api/changes). Written by the write routes in
+    the same transaction as the change itself, and never updated.
+
+    The id is the cursor clients pass back. Ids only go up in commit order
+    (SQLite runs one write transaction at a time, and AUTOINCREMENT never
+    reuses an id), so a client that has seen id N has seen everything
+    before it. Maintained by app/services/change_log.py.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)  # "country" | "story" | "tag"
+    entity_id = Column(Integer, nullable=False)
+    ref = Column(String(200), nullable=True)  # Country code, story slug or tag name (as of the change)
+    deleted = Column(Boolean, nullable=False, default=False)  # A tombstone: the entity is gone
+    changed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ChangeLogEntry {self.id} {self.entity} {self.entity_id}>"
+
+
+class ContentHash(Base):
+    """
+    A hash of each record synced from the content folder, as of the last
+    sync, so the next one only writes records whose hash changed.
+    Records added through the API have none. Maintained by
+    app/services/content_sync.py.
+    """
+    __tablename__ = "content_hashes"
+
+    entity = Column(String(20), primary_key=True)  # "country" | "baked_good" | "ingredient" | "story" | "tag"
+    ref = Column(String(300), primary_key=True)  # Key in the content folder, e.g. "JP" or "JP/Melonpan"
+    entity_id = Column(Integer, nullable=False)  # The row it was synced to
+    hash = Column(String(64), nullable=False)  # SHA-256 of the record
+
+    def __repr__(self):
+        return f"<ContentHash {self.entity} {self.ref}>"
+
+
+class TextDictionary(Base):
+    """
+    A zlib dictionary trained on the site's own text, which the compressed
+    text columns are compressed with (see app/database/compression.py).
+    Never deleted: compressed values refer to theirs by id.
+    """
+    __tablename__ = "text_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -103,6 +103,27 @@ class IngredientCreate(BaseModel):
     description: Optional[str] = None
     extra_data: Optional[Dict[str, Any]] = None
 
+class CountryPatch(BaseModel):
+    """Schema for PATCH: only the fields that are sent get changed"""
+    name: Optional[str] = None
+    code: Optional[str] = None
+    region: Optional[str] = None
+    overview: Optional[str] = None
+    extra_data: Optional[Dict[str, Any]] = None
+
+class BakedGoodPatch(BaseModel):
+    """Schema for PATCH: only the fields that are sent get changed"""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    extra_data: Optional[Dict[str, Any]] = None
+
+class IngredientPatch(BaseModel):
+    """Schema for PATCH: only the fields that are sent get changed"""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    extra_data: Optional[Dict[str, Any]] = None
+
 
 # === TAG SCHEMAS ===
 
@@ -202,4 +223,168 @@ class StoryUpdate(BaseModel):
     sources: Optional[str] = None
     extra_data: Optional[Dict[str, Any]] = None
     region_codes: Optional[List[str]] = None
-    tag_names: Optional[List[str]] = None
\ No newline at end of file
+    tag_names: Optional[List[str]] = None
+    revision_notes: Optional[str] = None  # Why the title/body changed (kept with the revision)
+
+
+class StoryRevisionListItem(BaseModel):
+    """One saved version of a story, without its body"""
+    number: int
+    title: str
+    revision_notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    is_snapshot: bool  # Stored as a full copy rather than a delta
+    stored_bytes: int  # Space the revision takes up
+
+    class Config:
+        from_attributes = True
+
+
+class StoryRevision(BaseModel):
+    """One saved version of a story, with the body as it was then"""
+    number: int
+    title: str
+    revision_notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    body: str
+
+class StoryTocEntry(BaseModel):
+    """One section in a story's table of contents"""
+    number: int  # Fetch it with GET /api/stories/{slug}/sections/{number}
+    heading: Optional[str] = None  # None for the text before the first heading
+    level: int  # 1 for "#", 2 for "##"...; 0 without a heading
+    byte_offset: int  # Where it starts in the UTF-8 encoded body
+    byte_length: int
+    word_count: int
+
+
+class StorySection(StoryTocEntry):
+    """One section of a story, with its markdown"""
+    body: str
+
+# === REGION TREE SCHEMAS ===
+
+class Region(BaseModel):
+    """Schema for returning a node of the region tree"""
+    id: int
+    name: str
+    slug: str
+    type: str  # "region" | "subregion"
+    parent_region_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RegionCreate(BaseModel):
+    """Schema for creating a region"""
+    name: str
+    type: str = "subregion"  # "region" | "subregion"
+    parent_slug: Optional[str] = None  # Leave out for a top-level region
+
+
+class RegionUpdate(BaseModel):
+    """Schema for updating a region (all fields optional)"""
+    name: Optional[str] = None
+    type: Optional[str] = None
+    parent_slug: Optional[str] = None  # Send null explicitly to make it top-level
+
+
+# === SEARCH SCHEMAS ===
+
+class Suggestion(BaseModel):
+    """A single typeahead suggestion"""
+    type: str  # "country" | "baked_good" | "ingredient" | "tag" | "story"
+    id: int
+    name: str
+    ref: Optional[str] = None  # Country code, story slug or tag name to link to
+    score: float
+
+
+# === MAP PIN SCHEMAS ===
+
+class StoryPin(BaseModel):
+    """A story's pin on the map, or a cluster of nearby pins when zoomed out."""
+    type: str  # "story" | "cluster"
+    lat: float
+    lng: float
+    count: int = 1  # Stories in the cluster
+    id: Optional[int] = None  # Story fields, for type "story"
+    slug: Optional[str] = None
+    title: Optional[str] = None
+
+# === BATCH SCHEMAS ===
+
+class BatchItem(BaseModel):
+    """One request in a batch"""
+    method: str = "GET"  # Only GET can be batched
+    url: str  # e.g. "/api/stories/?region=JP"
+    headers: Optional[Dict[str, str]] = None  # e.g. {"If-None-Match": "..."}
+
+
+class BatchRequest(BaseModel):
+    """Several GET requests to run in one round trip (POST /api/batch)"""
+    requests: List[BatchItem]
+
+# === CHANGE FEED SCHEMAS ===
+
+class Change(BaseModel):
+    """One entry of the change log: a country, story or tag changed, or went away"""
+    id: int  # Pass it back as ?since= to get what changed after it
+    entity: str  # "country" | "story" | "tag"
+    entity_id: int
+    ref: Optional[str] = None  # Country code, story slug or tag name, to re-fetch it by
+    deleted: bool  # A tombstone: drop your copy
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ChangePage(BaseModel):
+    """Changes after a cursor, oldest first (GET /api/changes)"""
+    changes: List[Change]
+    cursor: int  # Ask again with ?since=<cursor> for what comes next
+    has_more: bool  # More changes are waiting already; ask again straight away
+
+# === ADMIN SCHEMAS ===
+
+class WriteQueueStats(BaseModel):
+    """How busy the write queue is (app/services/write_queue.py), for this server process"""
+    queue_depth: int  # Writes waiting right now
+    max_queue_depth: int  # More than this are turned away with 503
+    peak_queue_depth: int
+    batches: int  # Transactions committed (or attempted)
+    operations: int  # Writes run in them
+    average_batch_size: float
+    largest_batch: int
+    rejected: int  # Turned away because the queue was full
+    timed_out: int  # Dropped after waiting past their deadline
+    failed_commits: int
+    wait_ms_p50: float  # Time from queued to started, over recent writes
+    wait_ms_p99: float
+
+
+class CoalescingStats(BaseModel):
+    """How many GET requests shared another's response (app/routes/coalescing.py), for this server process"""
+    leaders: int  # Requests that ran
+    coalesced: int  # Requests answered with a copy of a running identical request's response
+    not_shareable: int  # Waited for one whose response couldn't be shared, then ran themselves
+    largest_group: int  # Most requests answered by a single run
+    in_flight: int  # Distinct GET requests running right now
+
+class BackupFile(BaseModel):
+    """A verified backup in the backup folder (app/services/backups.py)"""
+    name: str
+    bytes: int
+    created_at: datetime
+
+
+class BackupStatus(BaseModel):
+    """The running backup, if any, and the backups kept"""
+    running: bool
+    pages_done: int  # Progress of the running backup
+    pages_total: int
+    last_backup: Optional[str] = None  # Latest backup taken by this server process
+    last_error: Optional[str] = None  # Why this process's last backup failed, if it did
+    backups: List[BackupFile] = []  # Newest first
\ No newline at end of file
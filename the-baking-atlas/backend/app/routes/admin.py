@@ -0,0 +1,76 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.database.database import file_engine
+from app.models import schemas
+from app.routes.coalescing import coalescing_stats
+from app.services.backups import backup_runner
+from app.services.write_queue import write_queue
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# Admin actions need this in an X-Admin-Token header; they're off when it isn't set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin actions are turned off; set ADMIN_TOKEN to turn them on"
+        )
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Missing or wrong X-Admin-Token header"
+        )
+
+
+@router.get("/write-queue", response_model=schemas.WriteQueueStats)
+def get_write_queue_stats():
+    """
+    Queue depth, batch sizes and load shedding counts for the write queue.
+
+    Each server process has its own queue, so with several workers this
+    describes whichever one answered.
+    """
+    return write_queue.stats()
+
+
+@router.get("/coalescing", response_model=schemas.CoalescingStats)
+def get_coalescing_stats():
+    """
+    How many GET requests were answered with a copy of an identical
+    request's response that was already running, instead of running again.
+
+    Per server process, like the write queue stats.
+    """
+    return coalescing_stats.as_dict()
+
+
+@router.get("/backups", response_model=schemas.BackupStatus, dependencies=[Depends(require_admin_token)])
+def get_backups():
+    """
+    The backups kept (newest first), and the progress of a running backup.
+    """
+    return backup_runner.status()
+
+
+@router.post("/backups", response_model=schemas.BackupStatus, status_code=202, dependencies=[Depends(require_admin_token)])
+def start_backup():
+    """
+    Start an online backup of the database in the background.
+
+    The API keeps serving reads and writes while it runs. Poll GET
+    /api/admin/backups to see when it's done; the new backup has been
+    checked with PRAGMA integrity_check before it shows up there.
+    """
+    if not backup_runner.start(file_engine.url.database):
+        raise HTTPException(
+            status_code=409,
+            detail="A backup is already running"
+        )
+    return backup_runner.status()
\ No newline at end of file
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database.database import get_db
+from app.models import models, schemas
+from app.routes.conditional import conditional_get
+from app.routes.filters import extra_filters, filter_by_extra
+from app.services import region_tree
+
+router = APIRouter(prefix="/api/baked-goods", tags=["baked goods"])
+
+
+@router.get("/", response_model=List[schemas.BakedGood], dependencies=[Depends(conditional_get("baked_goods", "countries", "regions"))])
+def get_baked_goods(
+    request: Request,
+    category: Optional[str] = Query(None, description="Filter by category, e.g. bread"),
+    region: Optional[str] = Query(None, description="Region slug (includes subregions, e.g. southeast-asia) or country code"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (default: everything)"),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    List baked goods across all countries.
+
+    `region` takes a region from the region tree, which includes every
+    country underneath it, or a single country code. Filter on extra_data attributes with extra.<key>=<value>,
+    e.g. /api/baked-goods/?category=bread&extra.texture=crispy
+    """
+    query = db.query(models.BakedGood)
+
+    if category:
+        query = query.filter(models.BakedGood.category == category)
+
+    if region:
+        region_id = region_tree.find_region_id(db, region)
+        if region_id is not None:
+            country_ids = region_tree.region_country_ids(region_id)
+        else:
+            country_ids = select(models.Country.id).where(models.Country.code == region.upper())
+        query = query.filter(models.BakedGood.country_id.in_(country_ids))
+
+    query = filter_by_extra(query, models.BakedGood, extra_filters(request))
+
+    query = query.order_by(models.BakedGood.id).offset(offset)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
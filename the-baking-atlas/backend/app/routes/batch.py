@@ -0,0 +1,123 @@
+"""
+POST /api/batch: several GET requests in one round trip.
+
+A screen that needs a country, its stories and the tag list can ask for
+them all at once:
+
+    POST /api/batch
+    {"requests": [{"url": "/api/countries/JP"},
+                  {"url": "/api/stories/?region=JP"},
+                  {"url": "/api/stories/tags/"}]}
+
+Each sub-request runs through the app as a normal request would (same
+routes, validation, errors), but they all share one database session in
+one read transaction, so they see the same snapshot of the data. The
+answer lists each sub-request's status, a few headers and its JSON body,
+in order.
+
+To keep one batch from hogging the server, it may hold at most
+BATCH_MAX_REQUESTS sub-requests, and once it has run for
+BATCH_MAX_SECONDS or produced BATCH_MAX_BYTES of responses, the rest are
+answered 503 without running.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database.database import get_db, shared_session
+from app.models import schemas
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+MAX_SECONDS = float(os.environ.get("BATCH_MAX_SECONDS", "5"))
+MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Sub-response headers passed on to the client
+PASSED_HEADERS = ("etag", "last-modified", "x-total-count")
+
+async def call_get(app, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+    """GET `url` from the app in-process; (status, headers, body)."""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("in-process", 0), "server": ("in-process", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    response_headers = {k.decode().lower(): v.decode() for k, v in messages[0]["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], response_headers, body
+
+
+def begin_snapshot(db: Session):
+    """
+    Start a read transaction, so every query in the batch sees the same data.
+    (pysqlite doesn't begin one for SELECTs by itself.)
+    """
+    connection = db.connection()
+    connection.exec_driver_sql("BEGIN")
+    # The snapshot is taken at the first read
+    connection.exec_driver_sql("SELECT 1 FROM sqlite_master LIMIT 1").all()
+
+
+def error_body(detail: str) -> bytes:
+    return json.dumps({"detail": detail}).encode()
+
+
+@router.post("", response_class=Response)
+async def run_batch(batch: schemas.BatchRequest, request: Request, db: Session = Depends(get_db)):
+    """
+    Run several GET requests against the API in one round trip.
+
+    Returns {"responses": [{"url", "status", "headers", "body"}, ...]} in
+    the order asked. A sub-request that fails only fails its own item.
+    """
+    if len(batch.requests) > MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {MAX_REQUESTS} requests, got {len(batch.requests)}"
+        )
+
+    await run_in_threadpool(begin_snapshot, db)
+    session_token = shared_session.set(db)
+    started = time.perf_counter()
+    total_bytes = 0
+    items = []
+    try:
+        for item in batch.requests:
+            if item.method.upper() != "GET":
+                status, headers, body = 405, {}, error_body("Only GET requests can be batched")
+            elif not item.url.startswith("/api/"):
+                status, headers, body = 400, {}, error_body("Batched URLs must start with /api/")
+            elif time.perf_counter() - started > MAX_SECONDS or total_bytes > MAX_BYTES:
+                status, headers, body = 503, {}, error_body("Batch limit reached before this request ran")
+            else:
+                status, headers, body = await call_get(request.app, item.url, item.headers)
+                total_bytes += len(body)
+                if not body or not headers.get("content-type", "").startswith("application/json"):
+                    body = b"null"
+            passed = {name: headers[name] for name in PASSED_HEADERS if name in headers}
+            # The bodies are already JSON: splice them in rather than parsing and re-encoding
+            items.append(b'{"url":' + json.dumps(item.url).encode() + b',"status":' + str(status).encode()
+                         + b',"headers":' + json.dumps(passed).encode() + b',"body":' + body + b"}")
+    finally:
+        shared_session.reset(session_token)
+        await run_in_threadpool(db.rollback)
+
+    return Response(content=b'{"responses":[' + b",".join(items) + b"]}", media_type="application/json")
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+The change feed: what changed in the atlas, for clients that keep a copy
+of it (and caches in front of the API).
+
+    GET /api/changes                    {"changes": [], "cursor": 1234, ...}
+    GET /api/changes?since=1234         the changes after 1234, and the next cursor
+    GET /api/changes/stream?since=1234  the same, pushed as server-sent events
+
+A client asks for a cursor first (no ?since), then fetches what it wants
+to keep, then asks for the changes since that cursor from then on. (Any
+change made while it was fetching comes through again; re-fetching it
+is harmless.) Each change says which country, story or tag to re-fetch,
+or to drop (deleted: true). See app/services/change_log.py.
+
+The stream sends each change as an event with the change's id as its
+event id, so a browser's EventSource picks up where it left off after a
+dropped connection (it sends Last-Event-ID). While nothing changes, it
+sends a comment every CHANGE_STREAM_HEARTBEAT seconds so proxies don't
+close an idle connection.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database.database import get_db, shared_session
+from app.models import schemas
+from app.services import change_log
+from app.services.change_log import change_feed
+
+router = APIRouter(prefix="/api/changes", tags=["changes"])
+
+MAX_LIMIT = 5000
+HEARTBEAT_SECONDS = float(os.environ.get("CHANGE_STREAM_HEARTBEAT", "15"))
+
+# Changes read (and sent) at a time by a stream
+STREAM_PAGE = 500
+
+# How long an EventSource waits before reconnecting, in milliseconds
+RETRY_MS = 3000
+
+
+def cursor_ahead(db: Session, since: int):
+    """A cursor past the newest change comes from another copy of the database: start over."""
+    if since > change_log.latest_id(db):
+        raise HTTPException(
+            status_code=410,
+            detail=f"Cursor {since} is ahead of the change log; fetch everything again and get a new cursor"
+        )
+
+
+@router.get("", response_model=schemas.ChangePage)
+def get_changes(
+    since: Optional[int] = Query(None, ge=0, description="Cursor from an earlier call; leave out to get the current one"),
+    limit: int = Query(500, ge=1, le=MAX_LIMIT, description="Most changes to return"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get what changed after a cursor, oldest first.
+
+    Without ?since, returns no changes and the current cursor: where to
+    start from after fetching everything. When has_more is true, ask again
+    with the new cursor straight away.
+    """
+    if since is None:
+        return {"changes": [], "cursor": change_log.latest_id(db), "has_more": False}
+
+    entries = change_log.read_changes(db, since, limit + 1)
+    if not entries:
+        cursor_ahead(db, since)
+    return {
+        "changes": entries[:limit],
+        "cursor": entries[:limit][-1].id if entries else since,
+        "has_more": len(entries) > limit,
+    }
+
+
+def read_events(bind, since: int):
+    """The next page of changes after `since`, as server-sent events: (last id, text)."""
+    with Session(bind=bind) as db:
+        entries = change_log.read_changes(db, since, STREAM_PAGE)
+        if not entries:
+            return since, ""
+        events = [
+            f"id: {entry.id}\nevent: change\ndata: {schemas.Change.model_validate(entry).model_dump_json()}\n\n"
+            for entry in entries
+        ]
+    return entries[-1].id, "".join(events)
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Cursor to start after; leave out to get only new changes"),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events: each change as it's committed.
+
+    Event type "change", data as one entry of GET /api/changes. A
+    Last-Event-ID header (sent by EventSource when it reconnects) takes
+    the place of ?since.
+    """
+    if shared_session.get() is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="The change stream never ends, so it can't be part of a batch"
+        )
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        if not last_event_id.isdigit():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Last-Event-ID must be a change id, got '{last_event_id}'"
+            )
+        since = int(last_event_id)
+
+    if since is None:
+        since = await run_in_threadpool(change_log.latest_id, db)
+    else:
+        await run_in_threadpool(cursor_ahead, db, since)
+    # The request's own session is closed once the stream starts; each read
+    # gets a short-lived one on the same engine
+    bind = db.get_bind()
+
+    async def events():
+        cursor = since
+        yield f"retry: {RETRY_MS}\n\n"
+        last_sent = time.monotonic()
+        while True:
+            cursor, text = await run_in_threadpool(read_events, bind, cursor)
+            if text:
+                yield text
+                last_sent = time.monotonic()
+                continue  # There may be more pages waiting
+            if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            if change_feed.latest > cursor:
+                # The feed has seen changes this read didn't yet; don't spin
+                await asyncio.sleep(change_log.POLL_INTERVAL)
+            elif change_feed.running:
+                await change_feed.wait(cursor, HEARTBEAT_SECONDS)
+            else:
+                # No feed in this process (e.g. a script): poll instead
+                await asyncio.sleep(change_log.POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Tell nginx not to hold events back
+    })
\ No newline at end of file
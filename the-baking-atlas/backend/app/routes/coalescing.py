@@ -0,0 +1,159 @@
+"""
+Single-flight GET requests: identical requests that arrive together share
+one response.
+
+When a story is linked from somewhere busy, hundreds of identical
+GET /api/stories/{slug} requests can arrive within milliseconds, and each
+would run the same queries and build the same JSON. With this middleware
+the first one (the "leader") runs as usual, and identical requests that
+arrive while it's still running wait for it and get a copy of its
+response instead of running themselves.
+
+It sits in front of the whole app, so it works the same for sync route
+functions (run in the thread pool) and async ones. Requests count as
+identical when they have the same path, the same query parameters (in
+any order), and the same values of the headers a response can depend on
+(conditional GET validators, Origin for CORS). Admin routes are never
+shared, nor responses that stream (event streams) or are larger than
+COALESCE_MAX_BYTES; requests that waited for one of those run on their
+own afterwards. The sub-requests of POST /api/batch are left alone too:
+they must read the batch's snapshot, and nobody else should.
+COALESCE_GETS=0 turns it off.
+"""
+
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from app.database.database import shared_session
+
+ENABLED = os.environ.get("COALESCE_GETS", "1") != "0"
+MAX_BYTES = int(os.environ.get("COALESCE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Request headers a response can differ by (and the profiling token, so a
+# profiled request always runs itself; see app/routes/profiling.py)
+KEY_HEADERS = (b"if-none-match", b"if-modified-since", b"origin", b"x-profile-token")
+
+# Paths never shared (responses depend on who's asking)
+EXCLUDED_PREFIXES = ("/api/admin",)
+
+
+class CoalescingStats:
+    """Counts for GET /api/admin/coalescing (per server process)."""
+
+    def __init__(self):
+        self.leaders = 0  # Requests that ran (and others could join)
+        self.coalesced = 0  # Requests answered with another request's response
+        self.not_shareable = 0  # Joined a request whose response couldn't be shared, so ran themselves
+        self.largest_group = 0  # Most requests answered by a single run
+        self.in_flight = 0  # Distinct requests running right now
+
+    def as_dict(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "not_shareable": self.not_shareable,
+            "largest_group": self.largest_group,
+            "in_flight": self.in_flight,
+        }
+
+
+# One per process
+coalescing_stats = CoalescingStats()
+
+
+def request_key(scope) -> Tuple:
+    """What makes two GET requests identical."""
+    query = tuple(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+    headers = tuple(sorted((name, value) for name, value in scope["headers"] if name in KEY_HEADERS))
+    return scope["path"], query, headers
+
+
+class _Flight:
+    """One running request, and what the requests waiting on it get."""
+
+    def __init__(self):
+        self.done = asyncio.get_running_loop().create_future()
+        self.waiting = 0
+
+
+class CoalescingMiddleware:
+    """ASGI middleware: concurrent identical GETs share one run (see module docstring)."""
+
+    def __init__(self, app, stats: CoalescingStats = coalescing_stats, max_bytes: int = MAX_BYTES):
+        self.app = app
+        self.stats = stats
+        self.max_bytes = max_bytes
+        self._flights: Dict[Tuple, _Flight] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (not ENABLED or scope["type"] != "http" or scope["method"] != "GET"
+                or scope["path"].startswith(EXCLUDED_PREFIXES)
+                # A batch's sub-request, reading in the batch's session (app/routes/batch.py)
+                or shared_session.get() is not None):
+            await self.app(scope, receive, send)
+            return
+
+        key = request_key(scope)
+        flight = self._flights.get(key)
+        if flight is not None:
+            await self._follow(flight, scope, receive, send)
+        else:
+            await self._lead(key, scope, receive, send)
+
+    async def _follow(self, flight: _Flight, scope, receive, send):
+        flight.waiting += 1
+        # shield: if this client goes away, the leader carries on for the others
+        messages = await asyncio.shield(flight.done)
+        if messages is None:
+            self.stats.not_shareable += 1
+            await self.app(scope, receive, send)
+            return
+        self.stats.coalesced += 1
+        for message in messages:
+            await send(message)
+
+    async def _lead(self, key: Tuple, scope, receive, send):
+        flight = self._flights[key] = _Flight()
+        self.stats.leaders += 1
+        self.stats.in_flight += 1
+        recorded: Optional[List[dict]] = []
+        size = 0
+
+        def finish(messages: Optional[List[dict]]):
+            """Hand the waiting requests their response (None: run your own)."""
+            if flight.done.done():
+                return
+            # New identical requests from here on start a run of their own
+            del self._flights[key]
+            self.stats.largest_group = max(self.stats.largest_group, flight.waiting + 1)
+            flight.done.set_result(messages)
+
+        async def send_and_record(message):
+            nonlocal recorded, size
+            if recorded is not None:
+                if message["type"] == "http.response.start":
+                    content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                    if content_type.startswith(b"text/event-stream"):
+                        recorded = None
+                else:
+                    size += len(message.get("body", b""))
+                    if size > self.max_bytes:
+                        recorded = None
+                if recorded is None:
+                    # Don't keep the others waiting for a stream that may never end
+                    finish(None)
+                else:
+                    recorded.append(message)
+            # The leader's own client gets everything straight away
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except BaseException:
+            recorded = None
+            raise
+        finally:
+            self.stats.in_flight -= 1
+            finish(recorded)
\ No newline at end of file
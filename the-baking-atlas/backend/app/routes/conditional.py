@@ -0,0 +1,88 @@
+"""
+HTTP conditional requests for the GET routes.
+
+Every GET response carries an ETag built from the URL and the versions of
+the tables it reads, a Last-Modified date and a Cache-Control header.
+When a client sends the ETag back in If-None-Match (or a date in
+If-Modified-Since) and nothing has changed, we answer 304 Not Modified
+before the route runs any of its own queries.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.database.database import get_db
+from app.services import versions
+
+# Caches must check back every time (a cheap 304 when nothing changed), but
+# may show the stored copy straight away while they do, for up to a minute
+CACHE_CONTROL = "public, max-age=0, stale-while-revalidate=60"
+
+
+def check_not_modified(
+    request: Request,
+    db: Session,
+    tables: Iterable[str],
+    extra: str = "",
+    last_modified: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """
+    Raise a 304 if the client's copy is current; otherwise return the
+    validator headers (ETag, Last-Modified, Cache-Control) for the response.
+
+    `extra` and `last_modified` let a route add something more specific
+    than table versions, like one story's updated_at.
+    """
+    table_versions, changed = versions.current(db, tables)
+    if last_modified and (changed is None or last_modified > changed):
+        changed = last_modified
+
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}|{sorted(table_versions.items())}|{extra}"
+    etag = f'"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if changed:
+        headers["Last-Modified"] = format_datetime(changed.replace(tzinfo=timezone.utc), usegmt=True)
+
+    if _not_modified(request, etag, changed):
+        raise HTTPException(status_code=304, headers=headers)
+    return headers
+
+
+def _not_modified(request: Request, etag: str, changed: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and changed:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates only have whole seconds
+        return changed.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def conditional_get(*tables: str):
+    """
+    Route dependency adding ETag/304 handling, e.g.
+
+        @router.get("/", dependencies=[Depends(conditional_get("countries"))])
+
+    `tables` are the tables the route's response is built from.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_db)):
+        response.headers.update(check_not_modified(request, db, tables))
+    return dependency
\ No newline at end of file
@@ -1,35 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload, undefer_group
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List
 
+from app.database import repository
 from app.database.database import get_db
 from app.models import models, schemas
+from app.routes.conditional import conditional_get
+from app.routes.filters import extra_filters, filter_by_extra
+from app.routes.ingredients import get_or_create_canonical_ingredient, index_canonical_ingredient
+from app.routes.stories import split_values
+from app.routes.writes import QueuedWriteRoute
+from app.services import change_log, versions
+from app.services.region_tree import get_or_create_region_for_name
+from app.services.story_filter_index import story_filter_index
+from app.services.suggest_index import suggest_index
+from app.services.vector_tiles import tile_cache
 from typing import Optional
 
-router = APIRouter(prefix="/api/countries", tags=["countries"])
+router = APIRouter(prefix="/api/countries", tags=["countries"], route_class=QueuedWriteRoute)
 
 
-@router.get("/", response_model=List[schemas.CountryListItem])
-def get_all_countries(db: Session = Depends(get_db)):
+@router.get("/", response_model=List[schemas.CountryListItem], dependencies=[Depends(conditional_get("countries"))])
+def get_all_countries(request: Request, db: Session = Depends(get_db)):
     """
     Get a list of all countries (without full details).
     
     This is what you'd use to populate your map or country selector.
+    Filter on extra_data attributes with extra.<key>=<value>.
     """
-    countries = db.query(models.Country).all()
+    query = filter_by_extra(db.query(models.Country), models.Country, extra_filters(request))
+    countries = query.all()
     return countries
 
 
-@router.get("/{country_code}", response_model=schemas.Country)
+@router.get("/{country_code}", response_model=schemas.Country, dependencies=[Depends(conditional_get("countries", "baked_goods", "ingredients", "canonical_ingredients", "stories"))])
 def get_country_by_code(country_code: str, db: Session = Depends(get_db)):
     """
     Get full details for a specific country by its code (e.g., "JP" for Japan).
     
-    This includes all baked goods and ingredients for that country.
+    This includes all baked goods, ingredients and stories for that country.
     """
-    country = db.query(models.Country).filter(
-        models.Country.code == country_code.upper()
-    ).first()
+    country = repository.country_by_code(db, country_code, with_text=True)
     
     if not country:
         raise HTTPException(
@@ -40,6 +54,50 @@ def get_country_by_code(country_code: str, db: Session = Depends(get_db)):
     return country
 
 
+# Loader options for the related rows (and deferred overview) a schemas.Country response shows
+COUNTRY_DETAIL = (
+    undefer_group("text"),
+    selectinload(models.Country.baked_goods),
+    selectinload(models.Country.ingredients),
+    selectinload(models.Country.stories),
+)
+
+
+def insert_for_country(db: Session, model, country_code: str, values: dict):
+    """
+    Insert a row belonging to a country (found by its code) in one
+    INSERT ... SELECT ... RETURNING statement, and return the new object.
+
+    Returns None if there is no country with that code.
+    """
+    columns = {name: literal(value, model.__table__.c[name].type) for name, value in values.items()}
+    row = select(models.Country.id, *columns.values()).where(models.Country.code == country_code.upper())
+    return db.scalars(
+        insert(model).from_select(["country_id", *columns], row).returning(model)
+    ).first()
+
+
+def update_returning(db: Session, model, where, values: dict, *options):
+    """Apply `values` with one UPDATE ... RETURNING and return the updated object (or None)."""
+    statement = update(model).where(where).values(**values).returning(model)
+    return db.scalars(statement.options(*options)).first()
+
+
+def record_country_change(db: Session, country_id: int):
+    """
+    Note a change to a country found by id (e.g. one of its baked goods or
+    ingredients changed: they're part of its response).
+    """
+    change_log.record_query(db, "country", select(models.Country.id, models.Country.code).where(models.Country.id == country_id))
+
+
+def reject_nulls(values: dict, *fields: str):
+    """PATCH bodies may leave out required fields, but not set them to null."""
+    for field in fields:
+        if field in values and values[field] is None:
+            raise HTTPException(status_code=400, detail=f"'{field}' cannot be null")
+
+
 @router.post("/", response_model=schemas.Country)
 def create_country(country: schemas.CountryCreate, db: Session = Depends(get_db)):
     """
@@ -48,28 +106,33 @@ def create_country(country: schemas.CountryCreate, db: Session = Depends(get_db)
     You'll use this to add countries to your database.
     """
     # Check if country code already exists
-    existing = db.query(models.Country).filter(
-        models.Country.code == country.code.upper()
-    ).first()
-    
-    if existing:
+    if repository.country_id_by_code(db, country.code) is not None:
         raise HTTPException(
             status_code=400,
             detail=f"Country with code '{country.code}' already exists"
         )
     
-    # Create new country
+    # Create new country (a new country has no baked goods etc. yet, so say
+    # so up front instead of having the response load them afterwards)
     db_country = models.Country(
         name=country.name,
         code=country.code.upper(),
         region=country.region,
+        region_id=get_or_create_region_for_name(db, country.region),
         overview=country.overview,
-        extra_data=country.extra_data
+        extra_data=country.extra_data,
+        baked_goods=[],
+        ingredients=[],
+        stories=[]
     )
     
     db.add(db_country)
+    db.flush()  # Get the country's id for the change log
+    change_log.record(db, "country", db_country.id, db_country.code)
+    versions.bump(db, "countries", "regions")
     db.commit()
-    db.refresh(db_country)
+    suggest_index.add("country", db_country.id, db_country.name, db_country.code)
+    tile_cache.invalidate_countries([db_country.code])
     
     return db_country
 
@@ -83,29 +146,23 @@ def add_baked_good(
     """
     Add a baked good to a specific country.
     """
-    # Find the country
-    country = db.query(models.Country).filter(
-        models.Country.code == country_code.upper()
-    ).first()
-    
-    if not country:
+    db_baked_good = insert_for_country(db, models.BakedGood, country_code, {
+        "name": baked_good.name,
+        "description": baked_good.description,
+        "category": baked_good.category,
+        "extra_data": baked_good.extra_data,
+    })
+    
+    if not db_baked_good:
         raise HTTPException(
             status_code=404,
             detail=f"Country with code '{country_code}' not found"
         )
     
-    # Create the baked good
-    db_baked_good = models.BakedGood(
-        country_id=country.id,
-        name=baked_good.name,
-        description=baked_good.description,
-        category=baked_good.category,
-        extra_data=baked_good.extra_data
-    )
-    
-    db.add(db_baked_good)
+    change_log.record(db, "country", db_baked_good.country_id, country_code.upper())
+    versions.bump(db, "baked_goods")
     db.commit()
-    db.refresh(db_baked_good)
+    suggest_index.add("baked_good", db_baked_good.id, db_baked_good.name)
     
     return db_baked_good
 
@@ -119,31 +176,83 @@ def add_ingredient(
     """
     Add an ingredient to a specific country.
     """
-    # Find the country
-    country = db.query(models.Country).filter(
-        models.Country.code == country_code.upper()
-    ).first()
+    # Look up (or add) the ingredient in the shared catalogue
+    canonical = get_or_create_canonical_ingredient(db, ingredient.name)
+    
+    # A country can only list each ingredient once (a unique index checks that)
+    try:
+        db_ingredient = insert_for_country(db, models.Ingredient, country_code, {
+            "canonical_id": canonical.id,
+            "description": ingredient.description,
+            "extra_data": ingredient.extra_data,
+        })
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Country '{country_code}' already has ingredient '{canonical.name}'"
+        )
     
-    if not country:
+    if not db_ingredient:
         raise HTTPException(
             status_code=404,
             detail=f"Country with code '{country_code}' not found"
         )
+    # RETURNING only loads the row itself; hand it the catalogue entry we
+    # already have so reading its name doesn't cost another query
+    set_committed_value(db_ingredient, "canonical", canonical)
     
-    # Create the ingredient
-    db_ingredient = models.Ingredient(
-        country_id=country.id,
-        name=ingredient.name,
-        description=ingredient.description,
-        extra_data=ingredient.extra_data
-    )
-    
-    db.add(db_ingredient)
+    change_log.record(db, "country", db_ingredient.country_id, country_code.upper())
+    versions.bump(db, "ingredients", "canonical_ingredients")
     db.commit()
-    db.refresh(db_ingredient)
+    index_canonical_ingredient(canonical)
     
     return db_ingredient
 
+
+def save_country_changes(db: Session, country_code: str, values: dict) -> models.Country:
+    """Shared by PUT and PATCH: write `values` to a country and return it."""
+    reject_nulls(values, "name", "code")
+    if "code" in values:
+        values["code"] = values["code"].upper()
+    if "region" in values:
+        values["region_id"] = get_or_create_region_for_name(db, values["region"])
+    
+    where = models.Country.code == country_code.upper()
+    try:
+        if values:
+            country = update_returning(db, models.Country, where, values, *COUNTRY_DETAIL)
+        else:
+            country = db.query(models.Country).filter(where).options(*COUNTRY_DETAIL).first()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Country with code '{values['code']}' already exists"
+        )
+    
+    if not country:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Country with code '{country_code}' not found"
+        )
+    
+    change_log.record(db, "country", country.id, country.code)
+    if "name" in values or "code" in values:
+        # Its stories list it among their regions, by name and code
+        change_log.record_query(db, "story", select(models.Story.id, models.Story.slug).join(
+            models.story_regions, models.story_regions.c.story_id == models.Story.id
+        ).where(models.story_regions.c.country_id == country.id))
+    versions.bump(db, "countries", "regions")
+    db.commit()
+    old_code = country_code.upper()
+    suggest_index.add("country", country.id, country.name, country.code)
+    story_filter_index.rename_region(old_code, country.code)
+    tile_cache.invalidate_countries([old_code, country.code])
+    
+    return country
+
+
 @router.put("/{country_code}", response_model=schemas.Country)
 def update_country(
     country_code: str,
@@ -154,29 +263,46 @@ def update_country(
     Update an existing country's information.
     
     This replaces ALL fields, so make sure to include everything.
+    To change just a few fields, use PATCH instead.
     """
-    # Find the country
-    country = db.query(models.Country).filter(
-        models.Country.code == country_code.upper()
-    ).first()
+    return save_country_changes(db, country_code, country_update.model_dump())
+
+
+@router.patch("/{country_code}", response_model=schemas.Country)
+def patch_country(
+    country_code: str,
+    changes: schemas.CountryPatch,
+    db: Session = Depends(get_db)
+):
+    """
+    Update only the fields you send, e.g. {"overview": "..."}.
+    """
+    return save_country_changes(db, country_code, changes.model_dump(exclude_unset=True))
+
+
+def save_baked_good_changes(db: Session, baked_good_id: int, values: dict) -> models.BakedGood:
+    """Shared by PUT and PATCH: write `values` to a baked good and return it."""
+    reject_nulls(values, "name")
+    values.pop("country_id", None)  # Baked goods don't move between countries
     
-    if not country:
+    where = models.BakedGood.id == baked_good_id
+    if values:
+        baked_good = update_returning(db, models.BakedGood, where, values)
+    else:
+        baked_good = repository.baked_good_by_id(db, baked_good_id)
+    
+    if not baked_good:
         raise HTTPException(
             status_code=404,
-            detail=f"Country with code '{country_code}' not found"
+            detail=f"Baked good with ID {baked_good_id} not found"
         )
     
-    # Update all fields
-    country.name = country_update.name
-    country.code = country_update.code.upper()
-    country.region = country_update.region
-    country.overview = country_update.overview
-    country.extra_data = country_update.extra_data
-    
+    record_country_change(db, baked_good.country_id)
+    versions.bump(db, "baked_goods")
     db.commit()
-    db.refresh(country)
+    suggest_index.add("baked_good", baked_good.id, baked_good.name)
     
-    return country
+    return baked_good
 
 
 @router.put("/baked-goods/{baked_good_id}", response_model=schemas.BakedGood)
@@ -190,27 +316,60 @@ def update_baked_good(
     
     You need the baked_good's ID (get it from GET /api/countries/{code})
     """
-    # Find the baked good
-    baked_good = db.query(models.BakedGood).filter(
-        models.BakedGood.id == baked_good_id
-    ).first()
+    return save_baked_good_changes(db, baked_good_id, baked_good_update.model_dump())
+
+
+@router.patch("/baked-goods/{baked_good_id}", response_model=schemas.BakedGood)
+def patch_baked_good(
+    baked_good_id: int,
+    changes: schemas.BakedGoodPatch,
+    db: Session = Depends(get_db)
+):
+    """
+    Update only the fields you send, e.g. {"category": "pastry"}.
+    """
+    return save_baked_good_changes(db, baked_good_id, changes.model_dump(exclude_unset=True))
+
+
+def save_ingredient_changes(db: Session, ingredient_id: int, values: dict) -> models.Ingredient:
+    """Shared by PUT and PATCH: write `values` to an ingredient and return it."""
+    reject_nulls(values, "name")
+    values.pop("country_id", None)  # Ingredients don't move between countries
+    
+    # Renaming points this row at a different catalogue entry
+    canonical = None
+    if "name" in values:
+        canonical = get_or_create_canonical_ingredient(db, values.pop("name"))
+        values["canonical_id"] = canonical.id
+    
+    where = models.Ingredient.id == ingredient_id
+    try:
+        if values:
+            ingredient = update_returning(db, models.Ingredient, where, values)
+        else:
+            ingredient = repository.ingredient_by_id(db, ingredient_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"This country already has ingredient '{canonical.name}'"
+        )
     
-    if not baked_good:
+    if not ingredient:
         raise HTTPException(
             status_code=404,
-            detail=f"Baked good with ID {baked_good_id} not found"
+            detail=f"Ingredient with ID {ingredient_id} not found"
         )
+    if canonical is not None:
+        set_committed_value(ingredient, "canonical", canonical)
     
-    # Update fields
-    baked_good.name = baked_good_update.name
-    baked_good.description = baked_good_update.description
-    baked_good.category = baked_good_update.category
-    baked_good.extra_data = baked_good_update.extra_data
-    
+    record_country_change(db, ingredient.country_id)
+    versions.bump(db, "ingredients", "canonical_ingredients")
     db.commit()
-    db.refresh(baked_good)
+    if canonical is not None:
+        index_canonical_ingredient(canonical)
     
-    return baked_good
+    return ingredient
 
 
 @router.put("/ingredients/{ingredient_id}", response_model=schemas.Ingredient)
@@ -224,26 +383,99 @@ def update_ingredient(
     
     You need the ingredient's ID (get it from GET /api/countries/{code})
     """
-    # Find the ingredient
-    ingredient = db.query(models.Ingredient).filter(
-        models.Ingredient.id == ingredient_id
-    ).first()
-    
-    if not ingredient:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Ingredient with ID {ingredient_id} not found"
-        )
-    
-    # Update fields
-    ingredient.name = ingredient_update.name
-    ingredient.description = ingredient_update.description
-    ingredient.extra_data = ingredient_update.extra_data
-    
+    return save_ingredient_changes(db, ingredient_id, ingredient_update.model_dump())
+
+
+@router.patch("/ingredients/{ingredient_id}", response_model=schemas.Ingredient)
+def patch_ingredient(
+    ingredient_id: int,
+    changes: schemas.IngredientPatch,
+    db: Session = Depends(get_db)
+):
+    """
+    Update only the fields you send, e.g. {"description": "..."}.
+    """
+    return save_ingredient_changes(db, ingredient_id, changes.model_dump(exclude_unset=True))
+
+
+# Deleting more baked goods than this drops the whole suggest index (it
+# reloads on the next search) instead of removing them one at a time
+SUGGEST_REMOVE_LIMIT = 1000
+
+
+def delete_countries(db: Session, codes: List[str]) -> List[str]:
+    """
+    Delete countries by code in one statement and return the codes deleted.
+
+    SQLite removes their baked goods, ingredients and story links itself
+    (ON DELETE CASCADE), so nothing is loaded into memory and the time
+    doesn't grow with the number of children. Commits, then updates the
+    in-memory indexes.
+    """
+    codes = [code.upper() for code in codes]
+    in_codes = models.Country.code.in_(codes)
+
+    # The suggest index needs the ids of the baked goods going away
+    baked_good_ids = None
+    if suggest_index.loaded:
+        baked_good_ids = db.scalars(
+            select(models.BakedGood.id).join(models.Country).where(in_codes).limit(SUGGEST_REMOVE_LIMIT + 1)
+        ).all()
+
+    # Their stories lose them as regions; find those before the links go
+    linked_stories = db.execute(
+        select(models.Story.id, models.Story.slug).distinct()
+        .join(models.story_regions, models.story_regions.c.story_id == models.Story.id)
+        .join(models.Country, models.Country.id == models.story_regions.c.country_id)
+        .where(in_codes)
+    ).all()
+
+    deleted = db.execute(
+        delete(models.Country).where(in_codes).returning(models.Country.id, models.Country.code),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not deleted:
+        return []
+
+    for country_id, code in deleted:
+        change_log.record(db, "country", country_id, code, deleted=True)
+    for story_id, slug in linked_stories:
+        change_log.record(db, "story", story_id, slug)
+    versions.bump(db, "countries", "baked_goods", "ingredients", "stories")
     db.commit()
-    db.refresh(ingredient)
-    
-    return ingredient
+
+    if baked_good_ids is not None and len(baked_good_ids) > SUGGEST_REMOVE_LIMIT:
+        suggest_index.invalidate()
+    else:
+        for country_id, _ in deleted:
+            suggest_index.remove("country", country_id)
+        for baked_good_id in baked_good_ids or ():
+            suggest_index.remove("baked_good", baked_good_id)
+    for _, code in deleted:
+        story_filter_index.remove_region(code)
+    tile_cache.invalidate_countries([code for _, code in deleted])
+
+    return [code for _, code in deleted]
+
+
+@router.delete("/")
+def delete_countries_by_code(
+    codes: List[str] = Query(..., description="Country codes to delete, e.g. codes=JP,KR"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete several countries at once, with all their related data.
+
+    WARNING: This also deletes all baked goods and ingredients for these countries!
+    Codes that don't exist are listed under "not_found".
+    """
+    requested = [code.upper() for code in split_values(codes)]
+    deleted = delete_countries(db, requested)
+    return {
+        "message": f"Deleted {len(deleted)} countries",
+        "deleted": deleted,
+        "not_found": [code for code in requested if code not in deleted],
+    }
 
 
 @router.delete("/{country_code}")
@@ -253,28 +485,19 @@ def delete_country(country_code: str, db: Session = Depends(get_db)):
     
     WARNING: This also deletes all baked goods and ingredients for this country!
     """
-    country = db.query(models.Country).filter(
-        models.Country.code == country_code.upper()
-    ).first()
-    
-    if not country:
+    if not delete_countries(db, [country_code]):
         raise HTTPException(
             status_code=404,
             detail=f"Country with code '{country_code}' not found"
         )
     
-    db.delete(country)
-    db.commit()
-    
     return {"message": f"Country {country_code} deleted successfully"}
 
 
 @router.delete("/baked-goods/{baked_good_id}")
 def delete_baked_good(baked_good_id: int, db: Session = Depends(get_db)):
     """Delete a specific baked good by ID"""
-    baked_good = db.query(models.BakedGood).filter(
-        models.BakedGood.id == baked_good_id
-    ).first()
+    baked_good = repository.baked_good_by_id(db, baked_good_id)
     
     if not baked_good:
         raise HTTPException(
@@ -283,7 +506,10 @@ def delete_baked_good(baked_good_id: int, db: Session = Depends(get_db)):
         )
     
     db.delete(baked_good)
+    record_country_change(db, baked_good.country_id)
+    versions.bump(db, "baked_goods")
     db.commit()
+    suggest_index.remove("baked_good", baked_good_id)
     
     return {"message": f"Baked good '{baked_good.name}' deleted successfully"}
 
@@ -291,9 +517,7 @@ def delete_baked_good(baked_good_id: int, db: Session = Depends(get_db)):
 @router.delete("/ingredients/{ingredient_id}")
 def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db)):
     """Delete a specific ingredient by ID"""
-    ingredient = db.query(models.Ingredient).filter(
-        models.Ingredient.id == ingredient_id
-    ).first()
+    ingredient = repository.ingredient_by_id(db, ingredient_id)
     
     if not ingredient:
         raise HTTPException(
@@ -301,7 +525,10 @@ def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db)):
             detail=f"Ingredient with ID {ingredient_id} not found"
         )
     
+    # The catalogue entry stays, even if no country uses it any more
     db.delete(ingredient)
+    record_country_change(db, ingredient.country_id)
+    versions.bump(db, "ingredients")
     db.commit()
     
     return {"message": f"Ingredient '{ingredient.name}' deleted successfully"}
\ No newline at end of file
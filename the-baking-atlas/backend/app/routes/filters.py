@@ -0,0 +1,77 @@
+"""
+Helpers shared by the listing routes for filtering on extra_data attributes.
+
+Clients pass `?extra.<key>=<value>`, e.g. /api/baked-goods/?extra.texture=crispy.
+Keys listed in a model's EXTRA_INDEXED_KEYS are matched through their
+indexes; any other key is matched the same way, by scanning.
+"""
+
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException, Request
+from sqlalchemy import and_, exists, func, literal_column, or_, select, union_all
+from sqlalchemy.orm import aliased
+
+from app.models.models import extra_field, extra_is_list
+
+EXTRA_PREFIX = "extra."
+
+
+def parse_value(raw: str) -> Any:
+    """Query values are text; let numbers and true/false match JSON numbers and booleans."""
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return raw
+    return value if isinstance(value, (int, float, bool)) else raw
+
+
+def extra_filters(request: Request) -> Dict[str, Any]:
+    """Collect ?extra.<key>=<value> query parameters into {key: value}."""
+    filters = {}
+    for name, raw in request.query_params.multi_items():
+        if not name.startswith(EXTRA_PREFIX):
+            continue
+        key = name[len(EXTRA_PREFIX):]
+        if not key or '"' in key:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid extra_data filter '{name}'"
+            )
+        filters[key] = parse_value(raw)
+    return filters
+
+
+def filter_by_extra(query, model, filters: Dict[str, Any]):
+    """
+    Narrow a query on `model` to rows whose extra_data has all the given attributes.
+
+    Indexed or not, every key is matched the same way: the attribute must
+    equal the value, or be a list containing it (e.g. "occasions":
+    ["new-year", "wedding"] matches ?extra.occasions=new-year). Indexed keys
+    are only faster.
+    """
+    for key, value in filters.items():
+        if key in model.EXTRA_INDEXED_KEYS:
+            # Written out like the index expressions, so SQLite uses the indexes.
+            # An id IN (... UNION ALL ...) rather than an OR: with an OR SQLite
+            # would rather search by another filter's index and test every row
+            equal, listed = aliased(model), aliased(model)
+            items = func.json_each(listed.extra_data, literal_column(f"'$.{key}'")).table_valued("value")
+            ids = union_all(
+                select(equal.id).where(extra_field(equal.extra_data, key) == value),
+                select(listed.id).where(extra_is_list(listed.extra_data, key),
+                                        exists().select_from(items).where(items.c.value == value)),
+            )
+            query = query.filter(model.id.in_(ids))
+        else:
+            # The key comes from the client, so its path is a bound parameter
+            path = f'$."{key}"'
+            items = func.json_each(model.extra_data, path).table_valued("value")
+            query = query.filter(or_(
+                func.json_extract(model.extra_data, path) == value,
+                and_(func.json_type(model.extra_data, path) == "array",
+                     exists().select_from(items).where(items.c.value == value)),
+            ))
+    return query
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import repository
+from app.database.database import get_db
+from app.models import models, schemas
+from app.routes.conditional import conditional_get
+from app.routes.filters import extra_filters, filter_by_extra
+from app.services.suggest_index import suggest_index
+
+router = APIRouter(prefix="/api/ingredients", tags=["ingredients"])
+
+
+def get_or_create_canonical_ingredient(db: Session, name: str) -> models.CanonicalIngredient:
+    """Helper to get the shared catalogue entry for an ingredient name, creating it if needed."""
+    canonical = repository.canonical_ingredient_by_name(db, name)
+    if not canonical:
+        canonical = models.CanonicalIngredient(
+            name=" ".join(name.split()), normalized_name=models.normalize_ingredient_name(name)
+        )
+        db.add(canonical)
+        db.flush()  # Get ID without committing
+    return canonical
+
+
+def index_canonical_ingredient(canonical: models.CanonicalIngredient):
+    """Keep the typeahead index in step with the ingredient catalogue."""
+    suggest_index.add("ingredient", canonical.id, canonical.name, canonical.name)
+
+
+@router.get("/", response_model=List[schemas.Ingredient], dependencies=[Depends(conditional_get("ingredients", "canonical_ingredients"))])
+def get_ingredients(request: Request, db: Session = Depends(get_db)):
+    """
+    List every country's ingredients.
+
+    Filter on extra_data attributes with extra.<key>=<value>,
+    e.g. /api/ingredients/?extra.preparation=roasted
+    """
+    query = filter_by_extra(db.query(models.Ingredient), models.Ingredient, extra_filters(request))
+    return query.order_by(models.Ingredient.id).all()
+
+
+@router.get("/{name}/countries", response_model=List[schemas.CountryListItem], dependencies=[Depends(conditional_get("ingredients", "canonical_ingredients", "countries"))])
+def get_countries_using_ingredient(name: str, db: Session = Depends(get_db)):
+    """
+    Get every country that bakes with an ingredient (e.g., "cassava").
+
+    Matching ignores case and extra spaces.
+    """
+    canonical = repository.canonical_ingredient_by_name(db, name)
+
+    if not canonical:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ingredient '{name}' not found"
+        )
+
+    # Uses the index on ingredients.canonical_id, no full scan
+    return db.query(models.Country).join(
+        models.Ingredient, models.Ingredient.country_id == models.Country.id
+    ).filter(
+        models.Ingredient.canonical_id == canonical.id
+    ).order_by(models.Country.name).all()
@@ -0,0 +1,199 @@
+"""
+Profiling a single request on a live server, on demand.
+
+With PROFILE_TOKEN set, a request carrying that value in an
+X-Profile-Token header runs under the sampling profiler
+(app/services/profiler.py), which covers the route, its dependencies and
+the validation and serialization of its response:
+
+    curl -H "X-Profile-Token: $PROFILE_TOKEN" http://localhost:8000/api/countries/JP
+
+The profile is written to PROFILE_DIR (default "profiles") in speedscope's
+format, and the response says where in an X-Profile-File header. Add an
+X-Profile-Options header, a comma separated list, for more:
+
+- memory: also trace memory allocations (tracemalloc) and write a
+  .memory.json next to the profile with the peak and the source lines
+  still holding the most memory at the end. Tracing slows the whole
+  process down while the request runs.
+- download: answer with the profile itself (as an attachment) instead of
+  the response; the response's status is in X-Profiled-Status.
+
+One request is profiled at a time; a second one sent meanwhile runs
+normally, with an X-Profile-Skipped header. A wrong token gets 401.
+
+Without PROFILE_TOKEN this middleware isn't installed at all, and with it
+a request without the header costs one look through its headers.
+"""
+
+import hmac
+import json
+import os
+import re
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Optional, Set
+
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from app.services.profiler import SamplingProfiler
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+TOKEN_HEADER = b"x-profile-token"
+OPTIONS_HEADER = b"x-profile-options"
+
+# Source lines listed in a memory report
+MEMORY_TOP = 30
+
+
+def route_codes(app, scope) -> Set:
+    """
+    Code objects of the functions that run for this request outside the
+    event loop: the route function, its dependencies, and FastAPI's
+    validation of the route's return value.
+    """
+    # FastAPI validates the return value through pydantic's public
+    # TypeAdapter (its own ModelField wrapper is private API)
+    codes = {TypeAdapter.validate_python.__code__}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match != Match.FULL:
+            continue
+        dependants = [route.dependant] if hasattr(route, "dependant") else []
+        while dependants:
+            dependant = dependants.pop()
+            code = getattr(dependant.call, "__code__", None)
+            if code is not None:
+                codes.add(code)
+            dependants.extend(dependant.dependencies)
+        break
+    return codes
+
+
+def profile_name(scope) -> str:
+    """e.g. 20261019-142501-337-GET-api-countries-JP"""
+    path = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-")[:80] or "root"
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}-{scope['method']}-{path}"
+
+
+def memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, peak: int) -> dict:
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return {
+        "peak_bytes": peak,
+        "net_bytes": sum(stat.size_diff for stat in stats),
+        "top": [
+            {"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "bytes": stat.size_diff, "blocks": stat.count_diff}
+            for stat in stats[:MEMORY_TOP]
+        ],
+    }
+
+
+def write_json(path: str, data: dict) -> bytes:
+    body = json.dumps(data).encode()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+    return body
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profiles requests that ask for it (see module docstring)."""
+
+    def __init__(self, app, token: Optional[str] = PROFILE_TOKEN, profile_dir: str = PROFILE_DIR):
+        self.app = app
+        self.token = (token or "").encode()
+        self.profile_dir = profile_dir
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        given, options = None, b""
+        for name, value in scope["headers"]:
+            if name == TOKEN_HEADER:
+                given = value
+            elif name == OPTIONS_HEADER:
+                options = value
+        if given is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.token or not hmac.compare_digest(given, self.token):
+            body = json.dumps({"detail": "Wrong X-Profile-Token header"}).encode()
+            await send({"type": "http.response.start", "status": 401,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        if self._busy:
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-profile-skipped", b"another request is being profiled")]}
+                await send(message)
+            await self.app(scope, receive, send_skipped)
+            return
+
+        words = {word.strip() for word in options.decode("latin-1").lower().split(",")}
+        self._busy = True
+        try:
+            await self._profile(scope, receive, send, "memory" in words, "download" in words)
+        finally:
+            self._busy = False
+
+    async def _profile(self, scope, receive, send, memory: bool, download: bool):
+        name = profile_name(scope)
+        profile_file = f"{name}.speedscope.json"
+        memory_file = f"{name}.memory.json"
+        extra_headers = [(b"x-profile-file", profile_file.encode())]
+        if memory:
+            extra_headers.append((b"x-profile-memory-file", memory_file.encode()))
+        status = None
+
+        async def send_profiled(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), *extra_headers]}
+            if not download:
+                await send(message)
+
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+
+        # This coroutine's frame is on the event loop thread's stack whenever
+        # the request (and not some other one) is running there
+        profiler = SamplingProfiler(sys._getframe(), route_codes(scope["app"], scope))
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            profiler.stop()
+            if memory:
+                report = memory_report(before, tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1])
+                if started_tracing:
+                    tracemalloc.stop()
+                await run_in_threadpool(write_json, os.path.join(self.profile_dir, memory_file), report)
+            profile = profiler.speedscope(f"{scope['method']} {scope['path']}")
+            body = await run_in_threadpool(write_json, os.path.join(self.profile_dir, profile_file), profile)
+
+        if download:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"content-disposition", f'attachment; filename="{profile_file}"'.encode()),
+                (b"x-profiled-status", str(status).encode()),
+                *extra_headers,
+            ]})
+            await send({"type": "http.response.body", "body": body})
\ No newline at end of file
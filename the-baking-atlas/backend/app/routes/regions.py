@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import repository
+from app.database.database import get_db
+from app.models import models, schemas
+from app.routes.conditional import conditional_get
+from app.routes.writes import QueuedWriteRoute
+from app.services import region_tree, versions
+
+router = APIRouter(prefix="/api/regions", tags=["regions"], route_class=QueuedWriteRoute)
+
+REGION_TYPES = ("region", "subregion")
+
+
+def get_region_or_404(db: Session, slug: str) -> models.Region:
+    region = repository.region_by_slug(db, slug)
+    if not region:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Region '{slug}' not found"
+        )
+    return region
+
+
+def check_region_type(region_type: str):
+    if region_type not in REGION_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Region type must be one of: {', '.join(REGION_TYPES)}"
+        )
+
+
+def resolve_parent_id(db: Session, parent_slug: Optional[str]) -> Optional[int]:
+    if parent_slug is None:
+        return None
+    parent = repository.region_by_slug(db, parent_slug)
+    if not parent:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Parent region '{parent_slug}' not found"
+        )
+    return parent.id
+
+
+@router.get("/", response_model=List[schemas.Region], dependencies=[Depends(conditional_get("regions"))])
+def get_all_regions(db: Session = Depends(get_db)):
+    """
+    Get every region in the tree (flat; use parent_region_id to nest them).
+    """
+    return db.query(models.Region).order_by(models.Region.name).all()
+
+
+@router.get("/{slug}/countries", response_model=List[schemas.CountryListItem], dependencies=[Depends(conditional_get("regions", "countries"))])
+def get_region_countries(slug: str, db: Session = Depends(get_db)):
+    """
+    Get every country in a region, including those in its subregions.
+    """
+    region = get_region_or_404(db, slug)
+    return db.query(models.Country).filter(
+        models.Country.id.in_(region_tree.region_country_ids(region.id))
+    ).order_by(models.Country.name).all()
+
+
+@router.post("/", response_model=schemas.Region)
+def create_region(region: schemas.RegionCreate, db: Session = Depends(get_db)):
+    """
+    Create a new region, optionally under a parent (e.g. "Southeast Asia" under "asia").
+    """
+    check_region_type(region.type)
+    slug = region_tree.slugify(region.name)
+    if repository.region_by_slug(db, slug) is not None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Region '{slug}' already exists"
+        )
+
+    parent_id = resolve_parent_id(db, region.parent_slug)
+    region_id = region_tree.add_region(db, region.name, region.type, parent_id)
+    versions.bump(db, "regions")
+    db.commit()
+
+    return db.get(models.Region, region_id)
+
+
+@router.put("/{slug}", response_model=schemas.Region)
+def update_region(
+    slug: str,
+    region_update: schemas.RegionUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Rename a region, change its type, or move it (with everything under it) to a new parent.
+
+    Only provided fields will be updated.
+    """
+    region = get_region_or_404(db, slug)
+
+    if region_update.name is not None:
+        new_slug = region_tree.slugify(region_update.name)
+        if new_slug != region.slug and repository.region_by_slug(db, new_slug) is not None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Region '{new_slug}' already exists"
+            )
+        region.name = region_update.name
+        region.slug = new_slug
+    if region_update.type is not None:
+        check_region_type(region_update.type)
+        region.type = region_update.type
+
+    # parent_slug: null means "make top-level", leaving it out means "don't move"
+    if "parent_slug" in region_update.model_fields_set:
+        parent_id = resolve_parent_id(db, region_update.parent_slug)
+        if parent_id is not None and region_tree.is_descendant(db, parent_id, region.id):
+            raise HTTPException(
+                status_code=400,
+                detail="A region can't be moved inside itself"
+            )
+        if parent_id != region.parent_region_id:
+            db.flush()
+            region_tree.move_region(db, region.id, parent_id)
+
+    versions.bump(db, "regions")
+    db.commit()
+    db.refresh(region)
+
+    return region
+
+
+@router.delete("/{slug}")
+def delete_region(slug: str, db: Session = Depends(get_db)):
+    """
+    Delete a region. Only empty regions (no subregions, no countries) can be deleted.
+    """
+    region = get_region_or_404(db, slug)
+
+    if region.children or region.countries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Region '{slug}' still has subregions or countries"
+        )
+
+    db.execute(models.region_closure.delete().where(models.region_closure.c.descendant_id == region.id))
+    db.delete(region)
+    versions.bump(db, "regions")
+    db.commit()
+
+    return {"message": f"Region '{region.name}' deleted successfully"}
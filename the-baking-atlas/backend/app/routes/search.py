@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database.database import get_db
+from app.models import schemas
+from app.routes.conditional import conditional_get
+from app.services.suggest_index import KINDS, suggest_index
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+
+@router.get("/suggest", response_model=List[schemas.Suggestion], dependencies=[Depends(conditional_get("countries", "baked_goods", "canonical_ingredients", "tags", "stories"))])
+def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    type: Optional[List[str]] = Query(None, description=f"Limit to these types: {', '.join(KINDS)}"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Typeahead suggestions across countries, baked goods, ingredients, tags and stories.
+
+    Matches by prefix first ("melon pan" -> Melonpan), then falls back to
+    fuzzy matching for typos ("castela" -> Castella).
+    """
+    suggest_index.ensure_loaded(db)
+    return suggest_index.suggest(q, limit=limit, kinds=type)
@@ -1,68 +1,272 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 
+from app.database import repository
 from app.database.database import get_db
 from app.models import models, schemas
+from app.routes.conditional import check_not_modified, conditional_get
+from app.routes.filters import extra_filters, filter_by_extra
+from app.routes.writes import QueuedWriteRoute
+from app.services import change_log, region_tree, story_pins, story_revisions, story_sections, versions
+from app.services.story_filter_index import story_filter_index
+from app.services.suggest_index import suggest_index
+from app.services.vector_tiles import tile_cache
 
-router = APIRouter(prefix="/api/stories", tags=["stories"])
+router = APIRouter(prefix="/api/stories", tags=["stories"], route_class=QueuedWriteRoute)
 
 
 def get_or_create_tag(db: Session, tag_name: str, tag_type: Optional[str] = None) -> models.Tag:
     """Helper to get existing tag or create new one."""
-    tag = db.query(models.Tag).filter(models.Tag.name == tag_name.lower()).first()
+    tag = repository.tag_by_name(db, tag_name)
     if not tag:
         tag = models.Tag(name=tag_name.lower(), tag_type=tag_type)
         db.add(tag)
         db.flush()  # Get ID without committing
+        change_log.record(db, "tag", tag.id, tag.name)
     return tag
 
 
-@router.get("/", response_model=List[schemas.StoryListItem])
+def record_story_change(db: Session, story: models.Story, countries=()):
+    """
+    Note a change to a story, and to the countries given (their responses
+    list the story's title, slug, summary and time context).
+    """
+    change_log.record(db, "story", story.id, story.slug)
+    for country in countries:
+        change_log.record(db, "country", country.id, country.code)
+
+
+def index_story(story: models.Story):
+    """Keep the in-memory indexes in step with a story (and any tags it created)."""
+    suggest_index.add("story", story.id, story.title, story.slug)
+    for tag in story.tags:
+        suggest_index.add("tag", tag.id, tag.name, tag.name)
+    story_filter_index.set_story(story)
+
+
+def split_values(values: Optional[List[str]]) -> List[str]:
+    """Flatten repeated and comma-separated query values: ["JP,KR", "CN"] -> ["JP", "KR", "CN"]."""
+    if not values:
+        return []
+    return [value.strip() for item in values for value in item.split(",") if value.strip()]
+
+
+def parse_bbox(value: str):
+    """Parse a minLon,minLat,maxLon,maxLat query value, or answer 400."""
+    box = story_pins.parse_bbox(value)
+    if box is None:
+        raise HTTPException(
+            status_code=400,
+            detail="bbox must be minLon,minLat,maxLon,maxLat (e.g. 120,20,150,50)"
+        )
+    return box
+
+
+def region_codes(db: Session, value: str) -> List[str]:
+    """Country codes a region filter value stands for: a region's whole subtree, or one country."""
+    region_id = region_tree.find_region_id(db, value)
+    if region_id is not None:
+        return region_tree.region_country_codes(db, region_id)
+    return [value.upper()]
+
+
+def find_story_ids(request: Request, db: Session, region, tag, time_context, match, bbox,
+                   offset: int = 0, limit: Optional[int] = None):
+    """(ids of the matching stories on this page, newest first; total matches) for the list filters."""
+    # extra_data and bbox filters run in SQLite and narrow down the in-memory filters
+    within = None
+    filters = extra_filters(request)
+    if filters:
+        query = filter_by_extra(db.query(models.Story.id), models.Story, filters)
+        within = {story_id for story_id, in query}
+    if bbox is not None:
+        in_box = story_pins.story_ids_in_bbox(db, parse_bbox(bbox))
+        within = in_box if within is None else within & in_box
+
+    story_filter_index.ensure_loaded(db)
+    return story_filter_index.query(
+        tags=[name.lower() for name in split_values(tag)],
+        regions=[region_codes(db, value) for value in split_values(region)],
+        time_contexts=split_values(time_context),
+        match_all=(match == "all"),
+        within=within,
+        offset=offset,
+        limit=limit,
+    )
+
+
+@router.get("/", response_model=List[schemas.StoryListItem], dependencies=[Depends(conditional_get("stories", "tags", "countries", "regions"))])
 def get_all_stories(
-    region: Optional[str] = Query(None, description="Filter by country code"),
-    tag: Optional[str] = Query(None, description="Filter by tag name"),
-    time_context: Optional[str] = Query(None, description="Filter by time context"),
+    request: Request,
+    response: Response,
+    region: Optional[List[str]] = Query(None, description="Filter by country code(s) or region slug(s), e.g. region=JP,KR or region=east-asia"),
+    tag: Optional[List[str]] = Query(None, description="Filter by tag name(s), e.g. tag=rice&tag=steaming"),
+    time_context: Optional[List[str]] = Query(None, description="Filter by time context(s)"),
+    match: str = Query("all", pattern="^(all|any)$", description="Stories must match all, or any, of the given tags/regions"),
+    bbox: Optional[str] = Query(None, description="Only stories pinned inside minLon,minLat,maxLon,maxLat"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (default: everything)"),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
     """
     Get a list of all stories (without full body content).
 
-    Supports filtering by region (country code), tag, or time_context.
+    Supports filtering by region (country code, or a region slug which
+    covers every country under it), tag, or time_context. Each filter takes several values, repeated or comma-separated; `match`
+    decides whether a story needs all of the tags/regions or just one.
+    extra_data attributes can be filtered with extra.<key>=<value>, and
+    bbox keeps only stories whose map pin is inside the box.
+    The total number of matches is returned in the X-Total-Count header.
+    """
+    story_ids, total = find_story_ids(request, db, region, tag, time_context, match, bbox, offset, limit)
+    response.headers["X-Total-Count"] = str(total)
+
+    # Only the stories on this page are loaded, with their regions and tags
+    stories = db.query(models.Story).filter(models.Story.id.in_(story_ids)).options(
+        selectinload(models.Story.regions),
+        selectinload(models.Story.tags),
+    ).all()
+    stories_by_id = {story.id: story for story in stories}
+    return [stories_by_id[story_id] for story_id in story_ids if story_id in stories_by_id]
+
+
+@router.get("/pins/", response_model=List[schemas.StoryPin], dependencies=[Depends(conditional_get("stories"))])
+def get_story_pins(
+    bbox: str = Query(..., description="Map viewport as minLon,minLat,maxLon,maxLat"),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level"),
+    db: Session = Depends(get_db)
+):
     """
-    query = db.query(models.Story)
+    Get the story pins inside the map's viewport.
 
-    if region:
-        query = query.join(models.Story.regions).filter(
-            models.Country.code == region.upper()
-        )
+    When zoomed out (zoom <= 12), nearby pins are grouped into clusters with
+    a count; a cluster holding a single story comes back as that story's pin.
+    Zoomed in, every pin comes back on its own, unless the viewport holds
+    more than 1000: then it gets zoom 12's clusters, so none go missing.
+    A story gets a pin by having "lat" and "lng" in its extra_data.
+    """
+    box = parse_bbox(bbox)
+    pins = None
+    if zoom > story_pins.CLUSTER_MAX_ZOOM:
+        found = story_pins.pins_in_bbox(db, box, limit=story_pins.MAX_PINS + 1)
+        if len(found) <= story_pins.MAX_PINS:
+            pins = [(story_id, lon, lat, 1) for story_id, lon, lat in found]
+    if pins is None:
+        # clusters_in_bbox() clusters at CLUSTER_MAX_ZOOM at most
+        clusters = story_pins.clusters_in_bbox(db, box, zoom)
+        pins = [(story_id, lon, lat, count) for count, lon, lat, story_id in clusters]
+
+    # Titles and slugs for the single-story pins, in one query
+    story_ids = [story_id for story_id, _, _, _ in pins if story_id is not None]
+    stories = {story_id: (slug, title) for story_id, slug, title in db.query(
+        models.Story.id, models.Story.slug, models.Story.title
+    ).filter(models.Story.id.in_(story_ids))} if story_ids else {}
+
+    results = []
+    for story_id, lon, lat, count in pins:
+        # The R*Tree keeps 32-bit floats; 5 decimals is about a metre
+        lon, lat = round(lon, 5), round(lat, 5)
+        if story_id in stories:
+            slug, title = stories[story_id]
+            results.append(schemas.StoryPin(type="story", lat=lat, lng=lon, id=story_id, slug=slug, title=title))
+        else:
+            results.append(schemas.StoryPin(type="cluster", lat=lat, lng=lon, count=count))
+    return results
+
+
+@router.get("/{slug}", response_model=schemas.Story)
+def get_story_by_slug(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Get full story content by its URL slug.
+    """
+    story_id = check_story_not_modified(request, response, db, slug, ("countries", "tags"))
+    return repository.story_by_id(db, story_id)
+
+
+def check_story_not_modified(request: Request, response: Response, db: Session, slug: str, tables=()) -> int:
+    """
+    A story's id, after answering 304 if the client's copy is still current.
+
+    The client's cached copy is checked against the story's updated_at (and
+    the versions of `tables`) first, so an unchanged story costs one small
+    lookup and a 304.
+    """
+    found = repository.story_summary_by_slug(db, slug)
 
-    if tag:
-        query = query.join(models.Story.tags).filter(
-            models.Tag.name == tag.lower()
+    if not found:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Story with slug '{slug}' not found"
         )
 
-    if time_context:
-        query = query.filter(models.Story.time_context == time_context)
+    story_id, updated_at = found.id, found.updated_at
+    response.headers.update(check_not_modified(
+        request, db, tables, extra=f"{story_id}:{updated_at}", last_modified=updated_at
+    ))
+    return story_id
 
-    stories = query.order_by(models.Story.published_at.desc()).all()
-    return stories
 
+@router.get("/{slug}/toc", response_model=List[schemas.StoryTocEntry])
+def get_story_toc(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Get a story's table of contents: each section's heading, size and word
+    count, without any of the text. Load the sections themselves one at a
+    time with /sections/{number}.
+    """
+    return story_sections.table_of_contents(db, check_story_not_modified(request, response, db, slug))
 
-@router.get("/{slug}", response_model=schemas.Story)
-def get_story_by_slug(slug: str, db: Session = Depends(get_db)):
+
+@router.get("/{slug}/sections/{number}", response_model=schemas.StorySection)
+def get_story_section(slug: str, number: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
-    Get full story content by its URL slug.
+    Get one section of a story's body (numbered from 1, as in its table of
+    contents), without loading the rest of the body.
     """
-    story = db.query(models.Story).filter(models.Story.slug == slug).first()
+    section = story_sections.get_section(db, check_story_not_modified(request, response, db, slug), number)
+    if section is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Story '{slug}' has no section {number}"
+        )
+    return section
 
-    if not story:
+
+def get_story_id_or_404(db: Session, slug: str) -> int:
+    story_id = repository.story_id_by_slug(db, slug)
+    if story_id is None:
         raise HTTPException(
             status_code=404,
             detail=f"Story with slug '{slug}' not found"
         )
+    return story_id
 
-    return story
+
+@router.get("/{slug}/revisions", response_model=List[schemas.StoryRevisionListItem], dependencies=[Depends(conditional_get("stories"))])
+def get_story_revisions(slug: str, db: Session = Depends(get_db)):
+    """
+    List a story's saved versions, newest first (without their bodies).
+
+    Revision 1 is the story as first written; each edit to the title or
+    body adds one.
+    """
+    return story_revisions.list_revisions(db, get_story_id_or_404(db, slug))
+
+
+@router.get("/{slug}/revisions/{number}", response_model=schemas.StoryRevision, dependencies=[Depends(conditional_get("stories"))])
+def get_story_revision(slug: str, number: int, db: Session = Depends(get_db)):
+    """
+    Get one saved version of a story, with the body as it was then.
+    """
+    revision = story_revisions.get_revision(db, get_story_id_or_404(db, slug), number)
+    if revision is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Story '{slug}' has no revision {number}"
+        )
+    return revision
 
 
 @router.post("/", response_model=schemas.Story)
@@ -74,8 +278,7 @@ def create_story(story: schemas.StoryCreate, db: Session = Depends(get_db)):
     Pass tag_names as a list of tag names (tags are created if they don't exist).
     """
     # Check if slug already exists
-    existing = db.query(models.Story).filter(models.Story.slug == story.slug).first()
-    if existing:
+    if repository.story_id_by_slug(db, story.slug) is not None:
         raise HTTPException(
             status_code=400,
             detail=f"Story with slug '{story.slug}' already exists"
@@ -96,9 +299,7 @@ def create_story(story: schemas.StoryCreate, db: Session = Depends(get_db)):
     # Associate regions (countries)
     if story.region_codes:
         for code in story.region_codes:
-            country = db.query(models.Country).filter(
-                models.Country.code == code.upper()
-            ).first()
+            country = repository.country_by_code(db, code)
             if country:
                 db_story.regions.append(country)
             else:
@@ -114,8 +315,16 @@ def create_story(story: schemas.StoryCreate, db: Session = Depends(get_db)):
             db_story.tags.append(tag)
 
     db.add(db_story)
+    db.flush()  # Get the story's id for its map pin
+    story_pins.set_pin(db, db_story.id, db_story.extra_data, new=True)
+    story_revisions.record_first(db, db_story)
+    story_sections.write_sections(db, db_story.id, db_story.body, new=True)
+    record_story_change(db, db_story, db_story.regions)
+    versions.bump(db, "stories", "tags")
     db.commit()
-    db.refresh(db_story)
+    index_story(db_story)
+    # The map shows story counts per country
+    tile_cache.invalidate_countries(country.code for country in db_story.regions)
 
     return db_story
 
@@ -131,7 +340,7 @@ def update_story(
 
     Only provided fields will be updated.
     """
-    story = db.query(models.Story).filter(models.Story.slug == slug).first()
+    story = repository.story_by_slug(db, slug)
 
     if not story:
         raise HTTPException(
@@ -139,16 +348,18 @@ def update_story(
             detail=f"Story with slug '{slug}' not found"
         )
 
+    old_regions = list(story.regions)
+    old_region_codes = [country.code for country in old_regions]
+    old_title, old_body = story.title, story.body
+    old_ref = (story.title, story.slug, story.summary, story.time_context)
+
     # Update scalar fields if provided
     if story_update.title is not None:
         story.title = story_update.title
     if story_update.slug is not None:
         # Check new slug doesn't conflict
         if story_update.slug != slug:
-            existing = db.query(models.Story).filter(
-                models.Story.slug == story_update.slug
-            ).first()
-            if existing:
+            if repository.story_id_by_slug(db, story_update.slug) is not None:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Story with slug '{story_update.slug}' already exists"
@@ -166,14 +377,13 @@ def update_story(
         story.sources = story_update.sources
     if story_update.extra_data is not None:
         story.extra_data = story_update.extra_data
+        story_pins.set_pin(db, story.id, story.extra_data)
 
     # Update regions if provided
     if story_update.region_codes is not None:
         story.regions.clear()
         for code in story_update.region_codes:
-            country = db.query(models.Country).filter(
-                models.Country.code == code.upper()
-            ).first()
+            country = repository.country_by_code(db, code)
             if country:
                 story.regions.append(country)
             else:
@@ -189,34 +399,115 @@ def update_story(
             tag = get_or_create_tag(db, tag_name)
             story.tags.append(tag)
 
+    # Region/tag changes alone don't touch the stories row, so set this ourselves
+    story.updated_at = datetime.utcnow()
+
+    # Edits to the title or body are kept in the revision history
+    if story.title != old_title or story.body != old_body:
+        story_revisions.record(db, story.id, old_body, story.title, story.body, story_update.revision_notes)
+    if story.body != old_body:
+        story_sections.write_sections(db, story.id, story.body)
+    # The countries it's in (or was in) list it by title, slug, summary and time context
+    ref_changed = (story.title, story.slug, story.summary, story.time_context) != old_ref
+    if ref_changed or story_update.region_codes is not None:
+        record_story_change(db, story, set(old_regions) | set(story.regions))
+    else:
+        record_story_change(db, story)
+    versions.bump(db, "stories", "tags")
     db.commit()
-    db.refresh(story)
+    index_story(story)
+    if story_update.region_codes is not None:
+        tile_cache.invalidate_countries(old_region_codes + [country.code for country in story.regions])
 
     return story
 
 
+def delete_stories(db: Session, story_ids: List[int]):
+    """
+    Delete stories by id with set-based statements, then commit and update
+    the in-memory indexes.
+
+    SQLite removes their tag and region links itself (ON DELETE CASCADE),
+    so the stories' collections are never loaded.
+    """
+    countries = set()
+    story_pins.remove_pins(db, story_ids)
+    for start in range(0, len(story_ids), story_pins.ID_BATCH_SIZE):
+        batch = story_ids[start:start + story_pins.ID_BATCH_SIZE]
+        # The map tiles of these countries show story counts (and their
+        # responses list the stories)
+        countries.update(db.execute(
+            select(models.Country.id, models.Country.code).distinct()
+            .join(models.story_regions, models.story_regions.c.country_id == models.Country.id)
+            .where(models.story_regions.c.story_id.in_(batch))
+        ).all())
+        deleted = db.execute(
+            delete(models.Story).where(models.Story.id.in_(batch)).returning(models.Story.id, models.Story.slug),
+            execution_options={"synchronize_session": False},
+        ).all()
+        for story_id, slug in deleted:
+            change_log.record(db, "story", story_id, slug, deleted=True)
+    for country_id, code in countries:
+        change_log.record(db, "country", country_id, code)
+    versions.bump(db, "stories")
+    db.commit()
+
+    for story_id in story_ids:
+        suggest_index.remove("story", story_id)
+        story_filter_index.remove_story(story_id)
+    tile_cache.invalidate_countries(code for _, code in countries)
+
+
+@router.delete("/")
+def delete_matching_stories(
+    request: Request,
+    region: Optional[List[str]] = Query(None, description="Delete stories in these country code(s) or region slug(s)"),
+    tag: Optional[List[str]] = Query(None, description="Delete stories with these tag name(s)"),
+    time_context: Optional[List[str]] = Query(None, description="Delete stories with these time context(s)"),
+    match: str = Query("all", pattern="^(all|any)$", description="Stories must match all, or any, of the given tags/regions"),
+    bbox: Optional[str] = Query(None, description="Delete stories pinned inside minLon,minLat,maxLon,maxLat"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete every story matching a filter.
+
+    Takes the same filters as the story list (including extra.<key>=<value>),
+    so you can check what would go with a GET first. At least one filter is
+    required.
+    """
+    if not (region or tag or time_context or bbox or extra_filters(request)):
+        raise HTTPException(
+            status_code=400,
+            detail="Give at least one filter (region, tag, time_context, bbox or extra.<key>)"
+        )
+
+    story_ids, total = find_story_ids(request, db, region, tag, time_context, match, bbox)
+    delete_stories(db, story_ids)
+
+    return {"message": f"Deleted {total} stories", "deleted": total}
+
+
 @router.delete("/{slug}")
 def delete_story(slug: str, db: Session = Depends(get_db)):
     """
     Delete a story by its slug.
     """
-    story = db.query(models.Story).filter(models.Story.slug == slug).first()
+    found = repository.story_summary_by_slug(db, slug)
 
-    if not story:
+    if not found:
         raise HTTPException(
             status_code=404,
             detail=f"Story with slug '{slug}' not found"
         )
 
-    db.delete(story)
-    db.commit()
+    delete_stories(db, [found.id])
 
-    return {"message": f"Story '{story.title}' deleted successfully"}
+    return {"message": f"Story '{found.title}' deleted successfully"}
 
 
 # === TAG ENDPOINTS ===
 
-@router.get("/tags/", response_model=List[schemas.Tag])
+@router.get("/tags/", response_model=List[schemas.Tag], dependencies=[Depends(conditional_get("tags"))])
 def get_all_tags(
     tag_type: Optional[str] = Query(None, description="Filter by tag type"),
     db: Session = Depends(get_db)
@@ -239,8 +530,7 @@ def create_tag(tag: schemas.TagCreate, db: Session = Depends(get_db)):
     """
     Create a new tag.
     """
-    existing = db.query(models.Tag).filter(models.Tag.name == tag.name.lower()).first()
-    if existing:
+    if repository.tag_by_name(db, tag.name) is not None:
         raise HTTPException(
             status_code=400,
             detail=f"Tag '{tag.name}' already exists"
@@ -248,26 +538,79 @@ def create_tag(tag: schemas.TagCreate, db: Session = Depends(get_db)):
 
     db_tag = models.Tag(name=tag.name.lower(), tag_type=tag.tag_type)
     db.add(db_tag)
+    db.flush()  # Get the tag's id for the change log
+    change_log.record(db, "tag", db_tag.id, db_tag.name)
+    versions.bump(db, "tags")
     db.commit()
-    db.refresh(db_tag)
+    suggest_index.add("tag", db_tag.id, db_tag.name, db_tag.name)
 
     return db_tag
 
 
+def delete_tags(db: Session, names: List[str]) -> List[str]:
+    """
+    Delete tags by name in one statement, then commit and update the
+    in-memory indexes. Returns the names that were deleted.
+
+    SQLite removes the tags' story links itself (ON DELETE CASCADE).
+    """
+    in_names = models.Tag.name.in_([name.lower() for name in names])
+    # Their stories lose them; find those before the links go
+    tagged_stories = db.execute(
+        select(models.Story.id, models.Story.slug).distinct()
+        .join(models.story_tags, models.story_tags.c.story_id == models.Story.id)
+        .join(models.Tag, models.Tag.id == models.story_tags.c.tag_id)
+        .where(in_names)
+    ).all()
+
+    deleted = db.execute(
+        delete(models.Tag).where(in_names).returning(models.Tag.id, models.Tag.name),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not deleted:
+        return []
+
+    for tag_id, name in deleted:
+        change_log.record(db, "tag", tag_id, name, deleted=True)
+    for story_id, slug in tagged_stories:
+        change_log.record(db, "story", story_id, slug)
+    versions.bump(db, "tags", "stories")
+    db.commit()
+    for tag_id, name in deleted:
+        suggest_index.remove("tag", tag_id)
+        story_filter_index.remove_tag(name)
+
+    return [name for _, name in deleted]
+
+
+@router.delete("/tags/")
+def delete_tags_by_name(
+    names: List[str] = Query(..., description="Tag names to delete, e.g. names=rice,steaming"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete several tags at once. Their stories stay; they just lose the tags.
+
+    Names that don't exist are listed under "not_found".
+    """
+    requested = [name.lower() for name in split_values(names)]
+    deleted = delete_tags(db, requested)
+    return {
+        "message": f"Deleted {len(deleted)} tags",
+        "deleted": deleted,
+        "not_found": [name for name in requested if name not in deleted],
+    }
+
+
 @router.delete("/tags/{tag_name}")
 def delete_tag(tag_name: str, db: Session = Depends(get_db)):
     """
     Delete a tag by name.
     """
-    tag = db.query(models.Tag).filter(models.Tag.name == tag_name.lower()).first()
-
-    if not tag:
+    if not delete_tags(db, [tag_name]):
         raise HTTPException(
             status_code=404,
             detail=f"Tag '{tag_name}' not found"
         )
 
-    db.delete(tag)
-    db.commit()
-
     return {"message": f"Tag '{tag_name}' deleted successfully"}
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.database.database import get_db
+from app.routes.conditional import check_not_modified
+from app.services.vector_tiles import LAYER_NAME, tile_cache
+
+router = APIRouter(prefix="/api/tiles", tags=["tiles"])
+
+
+def require_tiles() -> int:
+    """The highest zoom we have tiles for, or 404 if build_tiles.py hasn't been run."""
+    max_zoom = tile_cache.max_zoom
+    if max_zoom is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Map tiles have not been built yet (run build_tiles.py)"
+        )
+    return max_zoom
+
+
+@router.get("/tiles.json")
+def get_tilejson(request: Request):
+    """
+    TileJSON describing our country tiles, for MapLibre's `url` source option.
+    """
+    max_zoom = require_tiles()
+    tile_url = str(request.url_for("get_tile", z=0, x=0, y=0)).replace("/0/0/0.pbf", "/{z}/{x}/{y}.pbf")
+    return {
+        "tilejson": "3.0.0",
+        "name": "The Baking Atlas countries",
+        "tiles": [tile_url],
+        "minzoom": 0,
+        "maxzoom": max_zoom,
+        "vector_layers": [{
+            "id": LAYER_NAME,
+            "fields": {"iso_a2": "String", "name": "String", "level": "Number",
+                       "hasData": "Boolean", "storyCount": "Number"},
+        }],
+    }
+
+
+@router.get("/{z}/{x}/{y}.pbf")
+def get_tile(z: int, x: int, y: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Get one vector tile of country boundaries.
+
+    Each country carries hasData and storyCount so the map can style
+    countries by how much content we have. Tiles are cut on first request
+    and cached; 204 means the tile is empty (open ocean).
+    """
+    max_zoom = require_tiles()
+    if not 0 <= z <= max_zoom or not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise HTTPException(status_code=404, detail=f"Tile {z}/{x}/{y} not found")
+
+    # Tiles show story counts, so they change with countries and stories
+    headers = check_not_modified(request, db, ("countries", "stories", "tiles"))
+    data = tile_cache.get_tile(db, z, x, y)
+    if not data:
+        return Response(status_code=204, headers=headers)
+    return Response(
+        content=data,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Content-Encoding": "gzip", **headers},
+    )
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Sends write requests through the write queue (app/services/write_queue.py).
+
+Routers that change data use QueuedWriteRoute as their route class:
+
+    router = APIRouter(prefix="/api/stories", tags=["stories"], route_class=QueuedWriteRoute)
+
+Their POST, PUT, PATCH and DELETE routes stay written as usual, taking
+`db: Session = Depends(get_db)` and calling db.commit(); they simply run
+on the writer thread with a session from there. The response is built
+there too, before the session closes. When the queue is full, or a write
+waits too long for its turn, the client gets 503 with a Retry-After header.
+"""
+
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.services.write_queue import WriteQueueFull, WriteTimedOut, write_queue
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def queued(endpoint: Callable, response_model=None) -> Callable:
+    """Wrap a route function so it runs on the write queue."""
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def respond(**values):
+        result = endpoint(**values)
+        # Read everything the response needs while the session is still open
+        return adapter.validate_python(result, from_attributes=True) if adapter else result
+
+    async def run_queued(**values):
+        name = next((name for name, value in values.items() if isinstance(value, Session)), None)
+        if name is None or not write_queue.enabled:
+            return await run_in_threadpool(respond, **values)
+
+        try:
+            return await write_queue.run(values[name], lambda session: respond(**{**values, name: session}))
+        except (WriteQueueFull, WriteTimedOut) as busy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many writes at once, please retry shortly",
+                headers={"Retry-After": str(busy.retry_after)}
+            )
+
+    return run_queued
+
+
+class QueuedWriteRoute(APIRoute):
+    """An APIRoute whose write methods run on the write queue."""
+
+    def get_route_handler(self):
+        if self.methods & WRITE_METHODS:
+            self.dependant.call = queued(self.endpoint, self.response_model)
+        return super().get_route_handler()
\ No newline at end of file
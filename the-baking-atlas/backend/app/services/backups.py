@@ -0,0 +1,178 @@
+"""
+Online backups of the database (used by backup_database.py and /api/admin/backups).
+
+Copying baking_atlas.db with cp while the API is running can catch it in
+the middle of a write, and the copy comes out corrupt. This uses SQLite's
+online backup API instead, which copies the database page by page
+through SQLite itself:
+
+- BACKUP_PAGES_PER_STEP pages at a time, sleeping BACKUP_STEP_SLEEP
+  seconds in between, so the disk and the database are never busy for
+  long and the API's readers and writer carry on at full speed.
+- In WAL mode (the app turns it on at startup) the whole copy is read inside one
+  read transaction: it's the database as it was when the backup started,
+  however many writes commit meanwhile. Without WAL, a write between two
+  steps makes SQLite start the copy over, which on a busy database can go
+  on forever, so then it's copied in a single step instead.
+- The copy goes to a .partial file, is checked with PRAGMA
+  integrity_check, and only then renamed into place, so every .db file in
+  the backup folder is a complete, verified backup. File names hold the
+  time down to the microsecond and the process id, so backups started
+  together (backup_database.py and the endpoint, or one per worker)
+  never write to the same file.
+- The newest BACKUP_KEEP backups are kept and older ones deleted.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
+KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "100"))
+STEP_SLEEP = float(os.environ.get("BACKUP_STEP_SLEEP", "0.005"))
+
+PREFIX = "baking_atlas-"
+SUFFIX = ".db"
+
+
+class BackupFailed(Exception):
+    """The copy failed its integrity check (it has been deleted)."""
+
+
+def backup(
+    source_path: str,
+    backup_dir: str = BACKUP_DIR,
+    keep: int = KEEP,
+    pages: int = PAGES_PER_STEP,
+    sleep: float = STEP_SLEEP,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """
+    Back up the database at `source_path` into `backup_dir`, verify it,
+    rotate old backups, and return the new backup's path.
+
+    `progress(pages_done, pages_total)` is called after every step.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, f"{PREFIX}{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{os.getpid()}{SUFFIX}")
+    partial = path + ".partial"
+
+    try:
+        # isolation_level=None: transactions only where we BEGIN them ourselves
+        source = sqlite3.connect(source_path, isolation_level=None)
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                # Hold one snapshot of the database for the whole copy
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            else:
+                # Writes between steps would restart the copy: do it all at once
+                pages = -1
+            target = sqlite3.connect(partial)
+            try:
+                def step(status, remaining, total):
+                    if progress:
+                        progress(total - remaining, total)
+                    if remaining:
+                        time.sleep(sleep)
+
+                source.backup(target, pages=pages, progress=step)
+                # A backup should be one self-contained file
+                target.execute("PRAGMA journal_mode = DELETE")
+                problems = [row[0] for row in target.execute("PRAGMA integrity_check")]
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        if problems != ["ok"]:
+            raise BackupFailed(f"Backup failed its integrity check: {'; '.join(problems[:5])}")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    rotate(backup_dir, keep)
+    return path
+
+
+def list_backups(backup_dir: str = BACKUP_DIR) -> List[dict]:
+    """The backups in `backup_dir`, newest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        if name.startswith(PREFIX) and name.endswith(SUFFIX):
+            stat = os.stat(os.path.join(backup_dir, name))
+            backups.append({"name": name, "bytes": stat.st_size,
+                            "created_at": datetime.utcfromtimestamp(stat.st_mtime)})
+    # The names hold the time they were taken, so they sort by age
+    return sorted(backups, key=lambda backup: backup["name"], reverse=True)
+
+
+def rotate(backup_dir: str = BACKUP_DIR, keep: int = KEEP) -> List[str]:
+    """Delete all but the newest `keep` backups; return the names deleted."""
+    removed = [backup["name"] for backup in list_backups(backup_dir)[keep:]]
+    for name in removed:
+        try:
+            os.remove(os.path.join(backup_dir, name))
+        except FileNotFoundError:
+            pass  # Another process rotating at the same time got there first
+    return removed
+
+
+class BackupRunner:
+    """Runs one backup at a time in the background, for the admin endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.progress = (0, 0)  # (pages done, pages in the database) of the running backup
+        self.last_backup: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source_path: str, backup_dir: str = BACKUP_DIR) -> bool:
+        """Start a backup; False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.progress = (0, 0)
+            self._thread = threading.Thread(target=self._run, args=(source_path, backup_dir),
+                                            name="backup", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, source_path: str, backup_dir: str):
+        def note_progress(done, total):
+            self.progress = (done, total)
+
+        try:
+            path = backup(source_path, backup_dir, progress=note_progress)
+        except (sqlite3.Error, OSError, BackupFailed) as error:
+            self.last_error = str(error)
+        else:
+            self.last_backup = os.path.basename(path)
+            self.last_error = None
+
+    def status(self, backup_dir: str = BACKUP_DIR) -> dict:
+        done, total = self.progress
+        return {
+            "running": self.running,
+            "pages_done": done,
+            "pages_total": total,
+            "last_backup": self.last_backup,
+            "last_error": self.last_error,
+            "backups": list_backups(backup_dir),
+        }
+
+
+# One per process
+backup_runner = BackupRunner()
\ No newline at end of file
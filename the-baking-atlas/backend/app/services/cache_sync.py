@@ -0,0 +1,145 @@
+"""
+Keeps the in-memory indexes of several server processes in step.
+
+Every worker process (see serve.py) builds its own suggest index, story
+filter index and tile geometry. When one worker changes a table, the other
+workers' copies go stale. Write routes already bump the table's counter in
+table_versions in the same transaction (app/services/versions.py), so that
+table doubles as a change log every process can see.
+
+A background thread in each process polls it. PRAGMA data_version only
+changes after some other connection commits, so a quiet database costs
+one tiny query per poll; table_versions is read only after a commit. Any
+cache built from a table that changed is dropped and reloads from the
+database on next use. Changes therefore reach every worker within one
+poll interval (CACHE_SYNC_INTERVAL seconds, 0 turns polling off).
+
+A process's own writes are noted when they commit, so its incrementally
+updated indexes aren't thrown away for changes they already contain. In
+the write queue a route's commit only releases a SAVEPOINT; those writes
+are noted by the queue once the whole batch has really committed.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.services import versions
+from app.services.story_filter_index import story_filter_index
+from app.services.suggest_index import suggest_index
+from app.services.vector_tiles import tile_cache
+
+POLL_INTERVAL = float(os.environ.get("CACHE_SYNC_INTERVAL", "0.25"))
+
+# session.info key for sessions whose commit() only releases a SAVEPOINT:
+# a list their committed versions are collected in, to note_commit() once
+# the outer transaction commits (see app/services/write_queue.py)
+PENDING_KEY = "cache_sync_pending_versions"
+
+# Each in-memory cache and the tables it is built from
+CACHES: List[Tuple[Tuple[str, ...], Callable[[], None]]] = [
+    (("countries", "baked_goods", "canonical_ingredients", "tags", "stories"), suggest_index.invalidate),
+    (("countries", "tags", "stories"), story_filter_index.invalidate),
+    (("tiles",), tile_cache.forget_geometry),
+]
+
+
+class CacheSync:
+    """Polls table_versions and drops the caches of tables changed elsewhere."""
+
+    def __init__(self, caches: List[Tuple[Tuple[str, ...], Callable[[], None]]]):
+        self._caches = caches
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, database_path: str, interval: float = POLL_INTERVAL):
+        """Start polling (once per process). Call before serving requests."""
+        if self._thread is not None or interval <= 0 or database_path in ("", ":memory:"):
+            return
+        conn = sqlite3.connect(database_path, check_same_thread=False)
+        with self._lock:
+            self._seen = self._read_versions(conn)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(conn, interval), name="cache-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, conn: sqlite3.Connection, interval: float):
+        data_version = None
+        while not self._stop.wait(interval):
+            try:
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    self.apply(self._read_versions(conn))
+            except sqlite3.Error:
+                # e.g. the database stayed locked past the timeout; next round reads it again
+                data_version = None
+        conn.close()
+
+    @staticmethod
+    def _read_versions(conn: sqlite3.Connection) -> Dict[str, int]:
+        try:
+            return dict(conn.execute("SELECT name, version FROM table_versions").fetchall())
+        except sqlite3.OperationalError:
+            return {}  # No table_versions yet (brand new database)
+
+    # === APPLYING CHANGES ===
+
+    def apply(self, current: Dict[str, int]):
+        """Drop the caches of every table whose version moved past what we've seen."""
+        with self._lock:
+            changed = {name for name, version in current.items() if version > self._seen.get(name, 0)}
+            self._seen.update((name, current[name]) for name in changed)
+        if changed:
+            self._invalidate(changed)
+
+    def note_commit(self, committed: Dict[str, int]):
+        """
+        This process committed these table versions, and has already
+        updated its caches. If each is exactly one past what we'd seen, no
+        other process wrote in between, so the poll needn't drop anything.
+        """
+        with self._lock:
+            for name, version in committed.items():
+                if self._seen.get(name, 0) == version - 1:
+                    self._seen[name] = version
+
+    def _invalidate(self, tables: Iterable[str]):
+        tables = set(tables)
+        for depends_on, invalidate in self._caches:
+            if tables.intersection(depends_on):
+                invalidate()
+
+
+# One per process
+cache_sync = CacheSync(CACHES)
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_versions(session):
+    committed = session.info.pop(versions.BUMPED_KEY, None)
+    if not committed:
+        return
+    pending = session.info.get(PENDING_KEY)
+    if pending is not None:
+        pending.append(committed)  # Not in the database until the outer transaction commits
+    else:
+        cache_sync.note_commit(committed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_versions(session):
+    session.info.pop(versions.BUMPED_KEY, None)
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+The change log (the change_log table): what changed, in commit order, for
+clients keeping their own copy of the atlas in step.
+
+Each entry names a country, story or tag that changed or went away (a
+tombstone). It doesn't carry the new data: a client re-fetches the
+entity's own URL (GET /api/countries/{code}, /api/stories/{slug}, or the
+tag list), several at a time with POST /api/batch if it likes. So an
+entry is written for every entity whose response changed, not just the
+row a route wrote: a new baked good changes its country's response, and
+renaming a country changes the regions listed on each of its stories.
+
+Write routes call record() and record_query() before db.commit(). The
+entries are queued on the session and written just before it commits,
+one INSERT for all of them (plus one per query), so they're saved
+together with the change or not at all.
+
+ChangeFeed wakes the open event streams (GET /api/changes/stream) when
+new entries appear, whichever process wrote them.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+POLL_INTERVAL = float(os.environ.get("CHANGE_FEED_INTERVAL", "0.25"))
+
+# Where record() and record_query() queue entries in session.info
+PENDING_KEY = "pending_changes"
+PENDING_QUERIES_KEY = "pending_change_queries"
+
+ENTRY_COLUMNS = ["entity", "entity_id", "ref", "deleted", "changed_at"]
+
+
+def record(db: Session, entity: str, entity_id: int, ref: Optional[str], deleted: bool = False):
+    """Note that an entity changed (or, with deleted=True, is gone). Call before db.commit()."""
+    pending = db.info.setdefault(PENDING_KEY, {})
+    key = (entity, entity_id)
+    # Once gone, a later mention in the same transaction doesn't bring it back
+    deleted = deleted or pending.get(key, (None, False))[1]
+    pending[key] = (ref, deleted)
+
+
+def record_query(db: Session, entity: str, query):
+    """
+    Note that every entity a query finds changed. The query selects two
+    columns, the entity's id and its ref, and runs as part of an
+    INSERT ... SELECT when the session commits, so it sees the change.
+    """
+    db.info.setdefault(PENDING_QUERIES_KEY, []).append((entity, query))
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_changes(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    queries = session.info.pop(PENDING_QUERIES_KEY, None)
+    if not pending and not queries:
+        return
+    now = datetime.utcnow()
+    if pending:
+        session.execute(insert(models.ChangeLogEntry), [
+            {"entity": entity, "entity_id": entity_id, "ref": ref, "deleted": deleted, "changed_at": now}
+            for (entity, entity_id), (ref, deleted) in pending.items()
+        ])
+    for entity, query in queries or ():
+        found = query.subquery()
+        session.execute(insert(models.ChangeLogEntry).from_select(ENTRY_COLUMNS, select(
+            literal(entity), *found.c, literal(False), literal(now, models.ChangeLogEntry.changed_at.type)
+        )))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_changes(session):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(PENDING_QUERIES_KEY, None)
+
+
+def read_changes(db: Session, since: int, limit: int) -> List[models.ChangeLogEntry]:
+    """Up to `limit` entries after cursor `since`, oldest first."""
+    return db.query(models.ChangeLogEntry).filter(
+        models.ChangeLogEntry.id > since
+    ).order_by(models.ChangeLogEntry.id).limit(limit).all()
+
+
+def latest_id(db) -> int:
+    """The newest entry's id (0 if there are none): a cursor for "from now on"."""
+    return db.execute(select(func.max(models.ChangeLogEntry.id))).scalar() or 0
+
+
+class ChangeFeed:
+    """
+    Watches for new change log entries and wakes the event streams
+    waiting on them.
+
+    One background thread per process reads the newest id every
+    CHANGE_FEED_INTERVAL seconds (a lookup of the last row, so it costs
+    next to nothing), so entries written by other worker processes and
+    scripts are noticed as well as this process's own. The streams
+    themselves don't poll the database while nothing changes.
+    """
+
+    def __init__(self):
+        self.latest = 0
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, engine, interval: float = POLL_INTERVAL):
+        """Start watching (once per process). Call before serving requests."""
+        if self._thread is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(engine, interval), name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, engine, interval: float):
+        while True:
+            try:
+                with engine.connect() as conn:
+                    latest = latest_id(conn)
+                if latest != self.latest:
+                    self.publish(latest)
+            except SQLAlchemyError:
+                pass  # e.g. locked past the timeout; the next round tries again
+            if self._stop.wait(interval):
+                return
+
+    def publish(self, latest: int):
+        """Entries up to `latest` exist: wake every stream waiting for them."""
+        with self._lock:
+            self.latest = latest
+            waiters = list(self._waiters)
+        for loop, ready in waiters:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # That event loop has closed
+
+    async def wait(self, after: int, timeout: float):
+        """Wait until there are entries after cursor `after`, or `timeout` seconds pass."""
+        ready = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), ready)
+        with self._lock:
+            if self.latest > after:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+# One per process
+change_feed = ChangeFeed()
\ No newline at end of file
@@ -0,0 +1,474 @@
+"""
+The atlas's content as a folder of files, synced into the database (used
+by sync_content.py).
+
+    content/
+        tags.json              every tag: [{"name": "rice", "tag_type": "ingredient"}, ...]
+        countries/JP.json      a country, with its baked goods and ingredients
+        stories/<slug>.json    a story's fields, region codes and tag names...
+        stories/<slug>.md      ...and its body, in markdown
+
+sync() reads the folder and hashes every record in it (each country,
+baked good, ingredient, story and tag on its own), then compares the
+hashes with those content_hashes kept from the last sync. Only records
+whose hash changed are written: new ones inserted, changed ones updated,
+and ones synced before that have since gone from the folder deleted, all
+in one transaction. With nothing changed it reads the files and one
+table, and writes nothing.
+
+Records are matched to rows by key: country code, "<code>/<name>" for
+baked goods and ingredients, story slug and tag name. Renaming a key is a
+delete and an insert. Rows without a saved hash (added through the API,
+or before the first sync) are taken over when the folder has a record
+with the same key, and otherwise left alone.
+
+Each write does the same bookkeeping as the write routes (table versions,
+change log, story pins and revisions), so running servers pick the
+changes up through app/services/cache_sync.py.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, undefer_group
+
+from app.database import repository
+from app.models import models
+from app.routes.ingredients import get_or_create_canonical_ingredient
+from app.services import change_log, story_pins, story_revisions, story_sections, versions
+from app.services.region_tree import get_or_create_region_for_name
+from app.services.vector_tiles import tile_cache
+
+CONTENT_DIR = os.environ.get("CONTENT_DIR", "content")
+
+# In the order they're written (a story needs its countries and tags first)
+ENTITIES = ("country", "tag", "baked_good", "ingredient", "story")
+
+COUNTRY_FIELDS = ("name", "region", "overview", "extra_data")
+BAKED_GOOD_FIELDS = ("name", "description", "category", "extra_data")
+INGREDIENT_FIELDS = ("name", "description", "extra_data")
+STORY_FIELDS = ("title", "summary", "time_context", "author_name", "sources", "extra_data")
+
+# Tables a write to each kind of record changes (for versions.bump)
+TABLES = {
+    "country": ("countries", "regions"),
+    "tag": ("tags",),
+    "baked_good": ("baked_goods",),
+    "ingredient": ("ingredients", "canonical_ingredients"),
+    "story": ("stories", "tags"),
+}
+
+
+class ContentError(ValueError):
+    """A mistake in the content folder (the message names the file)."""
+
+
+class SyncResult(NamedTuple):
+    inserted: Dict[str, int]  # Per kind of record: new to the sync (including rows taken over)
+    updated: Dict[str, int]
+    deleted: Dict[str, int]
+    unchanged: int  # Records skipped because their hash matched
+
+    @property
+    def changed(self) -> int:
+        return sum(self.inserted.values()) + sum(self.updated.values()) + sum(self.deleted.values())
+
+
+# === READING THE FOLDER ===
+
+def _load_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError as e:
+        raise ContentError(f"{path}: not valid JSON ({e})")
+
+
+def _required(path: str, data: dict, field: str) -> str:
+    value = data.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ContentError(f"{path}: '{field}' is required")
+    return value
+
+
+def _add(records: Dict[str, dict], path: str, ref: str, record: dict):
+    if ref in records:
+        raise ContentError(f"{path}: '{ref}' is listed twice")
+    records[ref] = record
+
+
+def read_content(content_dir: str = CONTENT_DIR) -> Dict[str, Dict[str, dict]]:
+    """{kind: {key: record}} for everything in the content folder."""
+    if not os.path.isdir(content_dir):
+        raise ContentError(f"{content_dir}: no such folder")
+    records = {entity: {} for entity in ENTITIES}
+
+    tags_path = os.path.join(content_dir, "tags.json")
+    if os.path.exists(tags_path):
+        for tag in _load_json(tags_path):
+            name = _required(tags_path, tag, "name").lower()
+            _add(records["tag"], tags_path, name, {"name": name, "tag_type": tag.get("tag_type")})
+
+    for path in sorted(glob.glob(os.path.join(content_dir, "countries", "*.json"))):
+        data = _load_json(path)
+        code = _required(path, data, "code").upper()
+        if code != os.path.splitext(os.path.basename(path))[0].upper():
+            raise ContentError(f"{path}: the file name must be the country code ({code}.json)")
+        _required(path, data, "name")
+        records["country"][code] = {"code": code, **{field: data.get(field) for field in COUNTRY_FIELDS}}
+        for good in data.get("baked_goods", []):
+            name = _required(path, good, "name")
+            _add(records["baked_good"], path, f"{code}/{name}",
+                 {"country": code, **{field: good.get(field) for field in BAKED_GOOD_FIELDS}})
+        for ingredient in data.get("ingredients", []):
+            name = _required(path, ingredient, "name")
+            _add(records["ingredient"], path, f"{code}/{models.normalize_ingredient_name(name)}",
+                 {"country": code, **{field: ingredient.get(field) for field in INGREDIENT_FIELDS}})
+
+    for path in sorted(glob.glob(os.path.join(content_dir, "stories", "*.json"))):
+        data = _load_json(path)
+        slug = os.path.splitext(os.path.basename(path))[0]
+        _required(path, data, "title")
+        body_path = os.path.splitext(path)[0] + ".md"
+        if os.path.exists(body_path):
+            with open(body_path, encoding="utf-8") as f:
+                body = f.read()
+        elif isinstance(data.get("body"), str):
+            body = data["body"]
+        else:
+            raise ContentError(f"{path}: the body goes in {os.path.basename(body_path)}")
+        regions = [code.upper() for code in data.get("regions", [])]
+        for code in regions:
+            if code not in records["country"]:
+                raise ContentError(f"{path}: no country '{code}' in countries/")
+        tags = [name.lower() for name in data.get("tags", [])]
+        for name in tags:
+            # Tags only used by stories needn't be listed in tags.json
+            records["tag"].setdefault(name, {"name": name, "tag_type": None})
+        records["story"][slug] = {"slug": slug, "body": body, "regions": regions, "tags": tags,
+                                  **{field: data.get(field) for field in STORY_FIELDS}}
+    return records
+
+
+def record_hash(record: dict) -> str:
+    fields = {key: value for key, value in record.items() if key != "body"}
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    if "body" in record:
+        # Hashed as is: putting a long body through json.dumps takes several times longer
+        digest.update(b"\0" + record["body"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+# === SYNCING ===
+
+def sync(db: Session, content_dir: str = CONTENT_DIR, dry_run: bool = False, full: bool = False) -> SyncResult:
+    """
+    Bring the database in line with the content folder, writing only the
+    records that changed since the last sync (every record with full=True).
+    Commits, unless dry_run, which only counts what would change.
+    """
+    content = read_content(content_dir)
+    stored: Dict[str, Dict[str, Tuple[int, str]]] = defaultdict(dict)
+    for entity, ref, entity_id, digest in db.execute(select(
+        models.ContentHash.entity, models.ContentHash.ref, models.ContentHash.entity_id, models.ContentHash.hash
+    )):
+        stored[entity][ref] = (entity_id, digest)
+
+    changed: Dict[str, List[Tuple[str, dict, str, Optional[int]]]] = {}
+    gone: Dict[str, List[Tuple[str, int]]] = {}
+    inserted, updated, unchanged = {}, {}, 0
+    for entity in ENTITIES:
+        changed[entity] = []
+        for ref, record in content[entity].items():
+            digest = record_hash(record)
+            entity_id, old_digest = stored[entity].get(ref, (None, None))
+            if digest == old_digest and not full:
+                unchanged += 1
+                continue
+            changed[entity].append((ref, record, digest, entity_id))
+        gone[entity] = [(ref, entity_id) for ref, (entity_id, _) in stored[entity].items()
+                        if ref not in content[entity]]
+        inserted[entity] = sum(1 for *_, entity_id in changed[entity] if entity_id is None)
+        updated[entity] = len(changed[entity]) - inserted[entity]
+    result = SyncResult(inserted, updated, {entity: len(gone[entity]) for entity in ENTITIES}, unchanged)
+
+    if dry_run or not result.changed:
+        return result
+    writer = _Writer(db)
+    writer.apply(changed, gone)
+    db.commit()
+    tile_cache.invalidate_countries(writer.tile_codes)
+    return result
+
+
+class _Writer:
+    """Writes one sync's changes, with the write routes' bookkeeping."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.now = datetime.utcnow()
+        self.tables = set()  # For versions.bump
+        self.changed_countries = set()  # Ids whose responses changed (their baked goods, ingredients...)
+        self.deleted_countries = set()
+        self.tile_codes = set()  # Countries whose map tiles show something new
+        self.hashes = []  # (entity, ref, entity_id, hash) to save
+        self.country_ids = dict(db.execute(select(models.Country.code, models.Country.id)).all())
+
+    def apply(self, changed, gone):
+        save = {"country": self.save_country, "tag": self.save_tag, "baked_good": self.save_baked_good,
+                "ingredient": self.save_ingredient, "story": self.save_story}
+        remove = {"country": self.delete_countries, "tag": self.delete_tags, "baked_good": self.delete_baked_goods,
+                  "ingredient": self.delete_ingredients, "story": self.delete_stories}
+        # Deletes first (children before parents), so a record whose key moved can be inserted again
+        for entity in reversed(ENTITIES):
+            if gone[entity]:
+                remove[entity]([entity_id for _, entity_id in gone[entity]])
+                self.tables.update(TABLES[entity])
+        for entity in ENTITIES:
+            for ref, record, digest, entity_id in changed[entity]:
+                entity_id = save[entity](ref, record, entity_id)
+                self.hashes.append({"entity": entity, "ref": ref, "entity_id": entity_id, "hash": digest})
+                self.tables.update(TABLES[entity])
+
+        for country_id in self.changed_countries - self.deleted_countries:
+            change_log.record_query(self.db, "country", select(models.Country.id, models.Country.code)
+                                    .where(models.Country.id == country_id))
+        for entity in ENTITIES:
+            if gone[entity]:
+                self.db.execute(delete(models.ContentHash).where(
+                    models.ContentHash.entity == entity,
+                    models.ContentHash.ref.in_([ref for ref, _ in gone[entity]]),
+                ))
+        if self.hashes:
+            upsert = sqlite_insert(models.ContentHash)
+            self.db.execute(upsert.on_conflict_do_update(
+                index_elements=["entity", "ref"],
+                set_={"entity_id": upsert.excluded.entity_id, "hash": upsert.excluded.hash},
+            ), self.hashes)
+        versions.bump(self.db, *sorted(self.tables))
+
+    def _upsert(self, model, entity_id: Optional[int], values: dict) -> int:
+        if entity_id is None:
+            return self.db.execute(insert(model).values(**values)).inserted_primary_key[0]
+        self.db.execute(update(model).where(model.id == entity_id).values(**values))
+        return entity_id
+
+    # --- countries ---
+
+    def save_country(self, code: str, record: dict, entity_id: Optional[int]) -> int:
+        entity_id = entity_id or self.country_ids.get(code)
+        old_name = None
+        if entity_id is not None:
+            old_name = self.db.scalar(select(models.Country.name).where(models.Country.id == entity_id))
+        values = {field: record[field] for field in COUNTRY_FIELDS}
+        values["region_id"] = get_or_create_region_for_name(self.db, record["region"])
+        entity_id = self._upsert(models.Country, entity_id, {"code": code, **values})
+        self.country_ids[code] = entity_id
+        change_log.record(self.db, "country", entity_id, code)
+        if old_name is not None and old_name != record["name"]:
+            # Its stories list it among their regions, by name
+            change_log.record_query(self.db, "story", select(models.Story.id, models.Story.slug).join(
+                models.story_regions, models.story_regions.c.story_id == models.Story.id
+            ).where(models.story_regions.c.country_id == entity_id))
+        self.tile_codes.add(code)
+        return entity_id
+
+    def delete_countries(self, ids: List[int]):
+        linked_stories = self.db.execute(
+            select(models.Story.id, models.Story.slug).distinct()
+            .join(models.story_regions, models.story_regions.c.story_id == models.Story.id)
+            .where(models.story_regions.c.country_id.in_(ids))
+        ).all()
+        deleted = self.db.execute(
+            delete(models.Country).where(models.Country.id.in_(ids)).returning(models.Country.id, models.Country.code),
+            execution_options={"synchronize_session": False},
+        ).all()
+        for country_id, code in deleted:
+            change_log.record(self.db, "country", country_id, code, deleted=True)
+            self.deleted_countries.add(country_id)
+            self.country_ids.pop(code, None)
+            self.tile_codes.add(code)
+        for story_id, slug in linked_stories:
+            change_log.record(self.db, "story", story_id, slug)
+        # SQLite removes their baked goods, ingredients and story links (ON DELETE CASCADE)
+        self.tables.update(("baked_goods", "ingredients", "stories"))
+
+    # --- tags ---
+
+    def save_tag(self, name: str, record: dict, entity_id: Optional[int]) -> int:
+        if entity_id is None:
+            tag = repository.tag_by_name(self.db, name)
+            entity_id = tag.id if tag else None
+        entity_id = self._upsert(models.Tag, entity_id, record)
+        change_log.record(self.db, "tag", entity_id, name)
+        return entity_id
+
+    def delete_tags(self, ids: List[int]):
+        tagged_stories = self.db.execute(
+            select(models.Story.id, models.Story.slug).distinct()
+            .join(models.story_tags, models.story_tags.c.story_id == models.Story.id)
+            .where(models.story_tags.c.tag_id.in_(ids))
+        ).all()
+        deleted = self.db.execute(
+            delete(models.Tag).where(models.Tag.id.in_(ids)).returning(models.Tag.id, models.Tag.name),
+            execution_options={"synchronize_session": False},
+        ).all()
+        for tag_id, name in deleted:
+            change_log.record(self.db, "tag", tag_id, name, deleted=True)
+        for story_id, slug in tagged_stories:
+            change_log.record(self.db, "story", story_id, slug)
+        self.tables.add("stories")
+
+    # --- baked goods and ingredients (part of their country's response) ---
+
+    def save_baked_good(self, ref: str, record: dict, entity_id: Optional[int]) -> int:
+        country_id = self.country_ids[record["country"]]
+        if entity_id is None:
+            entity_id = self.db.scalar(select(models.BakedGood.id).where(
+                models.BakedGood.country_id == country_id, models.BakedGood.name == record["name"]
+            ).limit(1))
+        values = {field: record[field] for field in BAKED_GOOD_FIELDS}
+        self.changed_countries.add(country_id)
+        return self._upsert(models.BakedGood, entity_id, {"country_id": country_id, **values})
+
+    def delete_baked_goods(self, ids: List[int]):
+        self.changed_countries.update(self.db.scalars(
+            delete(models.BakedGood).where(models.BakedGood.id.in_(ids)).returning(models.BakedGood.country_id),
+            execution_options={"synchronize_session": False},
+        ).all())
+
+    def save_ingredient(self, ref: str, record: dict, entity_id: Optional[int]) -> int:
+        country_id = self.country_ids[record["country"]]
+        canonical = get_or_create_canonical_ingredient(self.db, record["name"])
+        if entity_id is None:
+            entity_id = self.db.scalar(select(models.Ingredient.id).where(
+                models.Ingredient.country_id == country_id, models.Ingredient.canonical_id == canonical.id
+            ))
+        values = {"country_id": country_id, "canonical_id": canonical.id,
+                  "description": record["description"], "extra_data": record["extra_data"]}
+        self.changed_countries.add(country_id)
+        return self._upsert(models.Ingredient, entity_id, values)
+
+    def delete_ingredients(self, ids: List[int]):
+        # The catalogue entries stay, like when the API deletes an ingredient
+        self.changed_countries.update(self.db.scalars(
+            delete(models.Ingredient).where(models.Ingredient.id.in_(ids)).returning(models.Ingredient.country_id),
+            execution_options={"synchronize_session": False},
+        ).all())
+
+    # --- stories ---
+
+    def save_story(self, slug: str, record: dict, entity_id: Optional[int]) -> int:
+        db = self.db
+        entity_id = entity_id or repository.story_id_by_slug(db, slug)
+        values = {field: record[field] for field in STORY_FIELDS}
+        values.update(slug=slug, body=record["body"], updated_at=self.now)
+        region_ids = {self.country_ids[code] for code in record["regions"]}
+        tag_ids = set(db.scalars(select(models.Tag.id).where(models.Tag.name.in_(record["tags"]))))
+
+        if entity_id is None:
+            entity_id = self._upsert(models.Story, None, {**values, "published_at": self.now})
+            story_pins.set_pin(db, entity_id, record["extra_data"], new=True)
+            story_revisions.record(db, entity_id, "", record["title"], record["body"])
+            story_sections.write_sections(db, entity_id, record["body"], new=True)
+            old_region_ids, old_tag_ids, ref_changed = set(), set(), True
+        else:
+            old = db.execute(select(
+                models.Story.title, models.Story.body, models.Story.summary,
+                models.Story.time_context, models.Story.extra_data,
+            ).where(models.Story.id == entity_id)).one()
+            old_region_ids = set(db.scalars(select(models.story_regions.c.country_id)
+                                            .where(models.story_regions.c.story_id == entity_id)))
+            old_tag_ids = set(db.scalars(select(models.story_tags.c.tag_id)
+                                         .where(models.story_tags.c.story_id == entity_id)))
+            self._upsert(models.Story, entity_id, values)
+            if old.extra_data != record["extra_data"]:
+                story_pins.set_pin(db, entity_id, record["extra_data"])
+            # Edits to the title or body are kept in the revision history
+            if (old.title, old.body) != (record["title"], record["body"]):
+                story_revisions.record(db, entity_id, old.body, record["title"], record["body"])
+            if old.body != record["body"]:
+                story_sections.write_sections(db, entity_id, record["body"])
+            ref_changed = (old.title, old.summary, old.time_context) != (
+                record["title"], record["summary"], record["time_context"])
+
+        self._relink(models.story_regions, "country_id", entity_id, old_region_ids, region_ids)
+        self._relink(models.story_tags, "tag_id", entity_id, old_tag_ids, tag_ids)
+        change_log.record(db, "story", entity_id, slug)
+        # The countries it's in (or was in) list it by title, slug, summary and time context
+        moved = old_region_ids ^ region_ids
+        self.changed_countries.update((old_region_ids | region_ids) if ref_changed else moved)
+        codes = {code for code, country_id in self.country_ids.items() if country_id in moved}
+        self.tile_codes.update(codes)  # The map shows story counts per country
+        return entity_id
+
+    def _relink(self, table, column: str, story_id: int, old: set, new: set):
+        """Change a story's rows in a link table from `old` ids to `new` ones."""
+        if old - new:
+            self.db.execute(delete(table).where(table.c.story_id == story_id, table.c[column].in_(old - new)))
+        if new - old:
+            self.db.execute(insert(table), [{"story_id": story_id, column: other_id} for other_id in new - old])
+
+    def delete_stories(self, ids: List[int]):
+        story_pins.remove_pins(self.db, ids)
+        countries = self.db.execute(
+            select(models.Country.id, models.Country.code).distinct()
+            .join(models.story_regions, models.story_regions.c.country_id == models.Country.id)
+            .where(models.story_regions.c.story_id.in_(ids))
+        ).all()
+        deleted = self.db.execute(
+            delete(models.Story).where(models.Story.id.in_(ids)).returning(models.Story.id, models.Story.slug),
+            execution_options={"synchronize_session": False},
+        ).all()
+        for story_id, slug in deleted:
+            change_log.record(self.db, "story", story_id, slug, deleted=True)
+        self.changed_countries.update(country_id for country_id, _ in countries)
+        self.tile_codes.update(code for _, code in countries)
+
+
+# === EXPORTING ===
+
+def _write_json(path: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def export(db: Session, content_dir: str = CONTENT_DIR) -> int:
+    """
+    Write the database's countries, stories and tags into the content
+    folder, as a starting point for editing it. Returns the files written.
+    """
+    written = 0
+    tags = db.query(models.Tag).order_by(models.Tag.name).all()
+    _write_json(os.path.join(content_dir, "tags.json"),
+                [{"name": tag.name, "tag_type": tag.tag_type} for tag in tags])
+    written += 1
+
+    for country in db.query(models.Country).options(undefer_group("text")).order_by(models.Country.code):
+        data = {"code": country.code, **{field: getattr(country, field) for field in COUNTRY_FIELDS}}
+        data["baked_goods"] = [{field: getattr(good, field) for field in BAKED_GOOD_FIELDS}
+                               for good in sorted(country.baked_goods, key=lambda good: good.id)]
+        data["ingredients"] = [{field: getattr(ingredient, field) for field in INGREDIENT_FIELDS}
+                               for ingredient in sorted(country.ingredients, key=lambda ingredient: ingredient.id)]
+        _write_json(os.path.join(content_dir, "countries", f"{country.code}.json"), data)
+        written += 1
+
+    for story in db.query(models.Story).options(undefer_group("text")).order_by(models.Story.slug):
+        data = {field: getattr(story, field) for field in STORY_FIELDS}
+        data["regions"] = sorted(country.code for country in story.regions)
+        data["tags"] = sorted(tag.name for tag in story.tags)
+        base = os.path.join(content_dir, "stories", story.slug)
+        _write_json(base + ".json", data)
+        with open(base + ".md", "w", encoding="utf-8") as f:
+            f.write(story.body)
+        written += 2
+    return written
\ No newline at end of file
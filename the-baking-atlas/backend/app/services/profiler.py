@@ -0,0 +1,141 @@
+"""
+A sampling profiler for one request at a time (used by
+app/routes/profiling.py), with speedscope output.
+
+cProfile only sees the thread it was started in, but one FastAPI request
+runs in several: the route function and the validation of its return
+value in the thread pool (for sync routes), everything else, including
+serializing the response, on the event loop thread in between other
+requests. So instead a background thread looks at every thread's Python
+stack every SAMPLE_INTERVAL seconds (sys._current_frames()) and keeps the
+stacks that belong to the request:
+
+- on the event loop thread, those passing through the request's own
+  coroutine frame (so other requests' turns on the loop don't count);
+- on other threads, those running one of the route's functions (the
+  route itself, its dependencies) or FastAPI's validation of its result.
+  Another request for the same route at the same moment would be counted
+  too, so profile on a quiet server where you can.
+
+While it runs, the interpreter switches threads more often (see
+sys.setswitchinterval), or a busy request thread would hold the GIL and
+leave the sampler few chances to look.
+
+The result opens in https://www.speedscope.app (one profile per thread,
+in "time order" or "left heavy" view).
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+# Sampling stops after this long (e.g. an event stream that never ends)
+MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "30"))
+
+FrameKey = Tuple[str, str, int]  # (function, file, line)
+
+
+class SamplingProfiler:
+    """Samples the stacks working on one request; see the module docstring."""
+
+    def __init__(self, request_frame, codes: Set, interval: float = SAMPLE_INTERVAL,
+                 max_seconds: float = MAX_SECONDS):
+        self.request_frame = request_frame  # The request's coroutine frame, on the event loop thread
+        self.loop_thread = threading.get_ident()
+        self.codes = codes  # Code objects that mark another thread as working on the request
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.truncated = False  # Stopped sampling at max_seconds
+        self.elapsed = 0.0
+        self._frames: Dict[FrameKey, int] = {}
+        self._samples: Dict[int, List[Tuple[List[int], float]]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._switch_interval = None
+
+    def start(self):
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    @property
+    def sample_count(self) -> int:
+        return sum(len(samples) for samples in self._samples.values())
+
+    def _run(self):
+        own = threading.get_ident()
+        started = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = self._request_stack(thread_id, frame)
+                if stack:
+                    self._samples.setdefault(thread_id, []).append((stack, weight))
+            if now - started > self.max_seconds:
+                self.truncated = True
+                break
+        self.elapsed = time.perf_counter() - started
+        self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+    def _request_stack(self, thread_id: int, frame) -> Optional[List[int]]:
+        """The part of a thread's stack working on the request (root first), or None."""
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        on_loop = thread_id == self.loop_thread
+        for start, frame in enumerate(frames):
+            if on_loop:
+                found = frame is self.request_frame
+            else:
+                found = frame.f_code in self.codes
+            if found:
+                return [self._frame_index(frame.f_code) for frame in frames[start:]]
+        return None
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def speedscope(self, name: str) -> dict:
+        """The samples in speedscope's file format, one profile per thread."""
+        profiles = []
+        for thread_id, samples in self._samples.items():
+            thread_name = "event loop" if thread_id == self.loop_thread else self._thread_names.get(thread_id, str(thread_id))
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} ({thread_name})",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weight for _, weight in samples) * 1000, 3),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(weight * 1000, 3) for _, weight in samples],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "the-baking-atlas",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [
+                {"name": function, "file": file, "line": line} for function, file, line in self._frames
+            ]},
+            "profiles": profiles,
+        }
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+The region tree and its closure table.
+
+region_closure holds one row for every (ancestor, descendant) pair, so
+"all countries under Asia" is one indexed query at any depth. The helpers
+here keep it correct when regions are added or moved.
+
+They only use Core statements, so they work both with an ORM session
+(from the routes) and with a plain connection (from migrations).
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, true
+
+from app.models.models import Country, Region, region_closure
+
+# Where the free-text regions used by countries sit in the tree
+# (roughly the UN geoscheme). Anything not listed becomes a top-level subregion.
+DEFAULT_PARENTS = {
+    "North Africa": "Africa",
+    "East Africa": "Africa",
+    "West Africa": "Africa",
+    "Central Africa": "Africa",
+    "Southern Africa": "Africa",
+    "North America": "Americas",
+    "Central America": "Americas",
+    "Caribbean": "Americas",
+    "South America": "Americas",
+    "East Asia": "Asia",
+    "Southeast Asia": "Asia",
+    "South Asia": "Asia",
+    "Central Asia": "Asia",
+    "West Asia": "Asia",
+    "Middle East": "Asia",
+    "Northern Europe": "Europe",
+    "Western Europe": "Europe",
+    "Central Europe": "Europe",
+    "Eastern Europe": "Europe",
+    "Southern Europe": "Europe",
+    "Southwestern Europe": "Europe",
+    "Southeastern Europe": "Europe",
+    "Australia and New Zealand": "Oceania",
+    "Pacific Islands": "Oceania",
+}
+TOP_LEVEL_REGIONS = set(DEFAULT_PARENTS.values())
+
+
+def slugify(name: str) -> str:
+    """Turn a region name into its URL slug, e.g. "East Asia" -> "east-asia"."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def add_region(db, name: str, type: str, parent_id: Optional[int] = None) -> int:
+    """Insert a region and its closure rows. Returns the new region's id."""
+    region_id = db.execute(
+        insert(Region).values(name=name, slug=slugify(name), type=type, parent_region_id=parent_id)
+    ).inserted_primary_key[0]
+
+    # The region is its own ancestor at depth 0...
+    db.execute(insert(region_closure).values(ancestor_id=region_id, descendant_id=region_id, depth=0))
+    # ...and a descendant of everything above its parent, one level deeper
+    if parent_id is not None:
+        ancestors = select(
+            region_closure.c.ancestor_id, region_id, region_closure.c.depth + 1
+        ).where(region_closure.c.descendant_id == parent_id)
+        db.execute(insert(region_closure).from_select(["ancestor_id", "descendant_id", "depth"], ancestors))
+    return region_id
+
+
+def is_descendant(db, region_id: int, ancestor_id: int) -> bool:
+    return db.execute(
+        select(region_closure.c.depth).where(
+            region_closure.c.ancestor_id == ancestor_id,
+            region_closure.c.descendant_id == region_id,
+        )
+    ).first() is not None
+
+
+def move_region(db, region_id: int, new_parent_id: Optional[int]):
+    """
+    Re-attach a region (and everything under it) to a new parent.
+
+    The caller must check that new_parent_id isn't inside the region itself.
+    """
+    inside = region_closure.alias("inside")
+    subtree = select(inside.c.descendant_id).where(inside.c.ancestor_id == region_id)
+
+    # Forget every ancestor the subtree had above the moved region
+    db.execute(
+        delete(region_closure).where(
+            region_closure.c.descendant_id.in_(subtree),
+            region_closure.c.ancestor_id.not_in(subtree),
+        )
+    )
+
+    # Every ancestor of the new parent becomes an ancestor of every node in the subtree
+    if new_parent_id is not None:
+        above = region_closure.alias("above")
+        below = region_closure.alias("below")
+        # Every (ancestor, subtree node) pair: a cross join, on purpose
+        links = select(
+            above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1
+        ).select_from(above.join(below, true())).where(
+            above.c.descendant_id == new_parent_id, below.c.ancestor_id == region_id
+        )
+        db.execute(insert(region_closure).from_select(["ancestor_id", "descendant_id", "depth"], links))
+
+    db.execute(Region.__table__.update().where(Region.id == region_id).values(parent_region_id=new_parent_id))
+
+
+def get_or_create_region_for_name(db, name: Optional[str]) -> Optional[int]:
+    """
+    Find the tree node for a country's free-text region (e.g. "East Asia").
+
+    Unknown names are added under their DEFAULT_PARENTS entry, creating
+    the parent as well if needed.
+    """
+    if not name or not name.strip():
+        return None
+    name = " ".join(name.split())
+
+    region_id = db.execute(select(Region.id).where(Region.slug == slugify(name))).scalar()
+    if region_id is not None:
+        return region_id
+
+    if name in TOP_LEVEL_REGIONS:
+        return add_region(db, name, "region")
+
+    parent_name = DEFAULT_PARENTS.get(name)
+    parent_id = get_or_create_region_for_name(db, parent_name) if parent_name else None
+    return add_region(db, name, "subregion", parent_id)
+
+
+def region_country_ids(region_id: int):
+    """Subquery: ids of every country anywhere under a region (one indexed lookup)."""
+    return select(Country.id).join(
+        region_closure, Country.region_id == region_closure.c.descendant_id
+    ).where(region_closure.c.ancestor_id == region_id)
+
+
+def region_country_codes(db, region_id: int):
+    """Codes of every country anywhere under a region."""
+    return [code for code, in db.execute(
+        select(Country.code).join(
+            region_closure, Country.region_id == region_closure.c.descendant_id
+        ).where(region_closure.c.ancestor_id == region_id)
+    )]
+
+
+def find_region_id(db, value: str) -> Optional[int]:
+    """The id of the region with this slug (e.g. "east-asia"), if there is one."""
+    return db.execute(select(Region.id).where(Region.slug == value.lower())).scalar()
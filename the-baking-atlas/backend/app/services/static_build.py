@@ -0,0 +1,257 @@
+"""
+Prebuilt JSON files for the read-only public site (used by build_static.py).
+
+Every public GET the site needs is rendered ahead of time into a folder
+of plain files that any static host or CDN can serve, with no API server
+behind it:
+
+    /api/countries/                 -> api/countries/index.json
+    /api/countries/JP               -> api/countries/JP.json
+    /api/stories/                   -> api/stories/index.json
+    /api/stories/?region=east-asia  -> api/stories/region/east-asia.json
+    /api/stories/?tag=rice          -> api/stories/tag/rice.json
+    /api/stories/?time_context=...  -> api/stories/time_context/....json
+    /api/stories/{slug}             -> api/stories/{slug}.json
+    /api/stories/tags/              -> api/stories/tags/index.json
+
+Each file sits next to .gz and (when the brotli package is installed) .br
+copies, for hosts that serve precompressed files. manifest.json lists
+every URL with its file and a SHA-256 of the JSON, which makes a good
+ETag. Story lists get one file per filter value; combinations (region=JP
+with tag=rice) are left to the site, which can intersect the lists.
+
+The pages are rendered by the API's own routes, called in-process, so the
+files match the API's responses byte for byte.
+
+Rebuilds are incremental. Each page remembers what it was built from: the
+versions of the tables its route reads (see app/services/versions.py), and
+for a story page that story's updated_at. Pages whose sources haven't
+moved on are skipped, and a page that is rendered again is only written
+(and compressed) when its JSON actually changed. Files for pages that no
+longer exist (a deleted story) are removed.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import quote
+
+from fastapi import FastAPI
+from sqlalchemy.orm import Session
+
+from app.database.database import get_db
+from app.models import models
+from app.routes import countries, stories
+from app.routes.batch import call_get
+from app.services import versions
+
+try:
+    import brotli
+except ImportError:  # Optional: only .gz copies without it
+    brotli = None
+
+MANIFEST = "manifest.json"
+
+# Tables each kind of page is built from: those its route's ETag covers
+COUNTRY_LIST_TABLES = ("countries",)
+COUNTRY_TABLES = ("countries", "baked_goods", "ingredients", "canonical_ingredients", "stories")
+STORY_LIST_TABLES = ("stories", "tags", "countries", "regions")
+STORY_TABLES = ("countries", "tags")
+TAG_TABLES = ("tags",)
+
+
+class Page(NamedTuple):
+    url: str  # As the API serves it
+    path: str  # File it's written to, relative to the output folder
+    source: str  # What it's built from; the page is rendered again when this changes
+
+
+class BuildResult(NamedTuple):
+    rendered: int  # Pages whose sources had changed
+    written: int  # ... of which the JSON had actually changed
+    unchanged: int  # Pages skipped without rendering
+    removed: int  # Pages that no longer exist
+    bytes_written: int  # Plain JSON written this build
+
+
+def file_name(value: str) -> str:
+    """A URL value as a safe file name (tag names may hold spaces or slashes)."""
+    return quote(value, safe="")
+
+
+def list_pages(db: Session) -> Dict[str, Page]:
+    """Every page of the public site, by URL."""
+    def table_source(tables):
+        table_versions, _ = versions.current(db, tables)
+        return ",".join(f"{name}={version}" for name, version in sorted(table_versions.items()))
+
+    country_list_source = table_source(COUNTRY_LIST_TABLES)
+    country_source = table_source(COUNTRY_TABLES)
+    story_list_source = table_source(STORY_LIST_TABLES)
+    story_source = table_source(STORY_TABLES)
+
+    pages = [
+        Page("/api/countries/", "api/countries/index.json", country_list_source),
+        Page("/api/stories/", "api/stories/index.json", story_list_source),
+        Page("/api/stories/tags/", "api/stories/tags/index.json", table_source(TAG_TABLES)),
+    ]
+
+    codes = [code for code, in db.query(models.Country.code).order_by(models.Country.code)]
+    for code in codes:
+        pages.append(Page(f"/api/countries/{code}", f"api/countries/{file_name(code)}.json", country_source))
+
+    # One story list per filter value: every country and region, tag and time context
+    filters = [("region", value) for value in codes]
+    filters += [("region", slug) for slug, in db.query(models.Region.slug).order_by(models.Region.slug)]
+    filters += [("tag", name) for name, in db.query(models.Tag.name).order_by(models.Tag.name)]
+    filters += [("time_context", value) for value, in db.query(models.Story.time_context).filter(
+        models.Story.time_context.isnot(None)
+    ).distinct().order_by(models.Story.time_context)]
+    for name, value in filters:
+        pages.append(Page(f"/api/stories/?{name}={quote(value)}",
+                          f"api/stories/{name}/{file_name(value)}.json", story_list_source))
+
+    for story_id, slug, updated_at in db.query(models.Story.id, models.Story.slug, models.Story.updated_at):
+        pages.append(Page(f"/api/stories/{quote(slug)}", f"api/stories/{file_name(slug)}.json",
+                          f"{story_id}:{updated_at}|{story_source}"))
+
+    return {page.url: page for page in pages}
+
+
+def read_manifest(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+
+
+def _write_file(path: str, data: bytes):
+    """Write via a temporary file, so a half-written file is never served."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _remove_file(path: str):
+    for suffix in ("", ".gz", ".br"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _files_present(path: str) -> bool:
+    return all(os.path.exists(path + suffix) for suffix in ("", ".gz") + ((".br",) if brotli else ()))
+
+
+def write_page(path: str, body: bytes) -> dict:
+    """Write a page and its compressed copies; return its manifest entry (without source)."""
+    _write_file(path, body)
+    # mtime=0 keeps the .gz identical from build to build
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    _write_file(path + ".gz", gzipped)
+    entry = {"bytes": len(body), "gzip_bytes": len(gzipped), "br_bytes": None}
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        _write_file(path + ".br", compressed)
+        entry["br_bytes"] = len(compressed)
+    return entry
+
+
+def static_app(get_session) -> FastAPI:
+    """The public read routes alone, on the given session dependency."""
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = get_session
+    return app
+
+
+async def render(app: FastAPI, url: str) -> bytes:
+    """Call GET `url` on the app in-process and return the response body."""
+    status, _, body = await call_get(app, url)
+    if status != 200:
+        raise RuntimeError(f"GET {url} answered {status}: {body[:200].decode(errors='replace')}")
+    return body
+
+
+def build(session_factory, out_dir: str, full: bool = False, progress=None) -> BuildResult:
+    """
+    Bring the static files in `out_dir` up to date with the database.
+
+    `full` renders every page again, for when the data was changed in a
+    way that didn't bump the table versions (raw SQL, a restored backup).
+    `progress(done, total)` is called now and then while rendering.
+    """
+    db = session_factory()
+    try:
+        pages = list_pages(db)
+    finally:
+        db.close()
+
+    old = read_manifest(out_dir)["files"]
+    entries = {}
+    to_render = []
+    for url, page in pages.items():
+        previous = old.get(url)
+        if (not full and previous and previous["source"] == page.source and previous["path"] == page.path
+                and _files_present(os.path.join(out_dir, page.path))):
+            entries[url] = previous
+        else:
+            to_render.append(page)
+
+    def get_session():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = static_app(get_session)
+    written = 0
+    bytes_written = 0
+
+    async def render_all():
+        nonlocal written, bytes_written
+        for done, page in enumerate(to_render, start=1):
+            body = await render(app, page.url)
+            digest = hashlib.sha256(body).hexdigest()
+            previous = old.get(page.url)
+            path = os.path.join(out_dir, page.path)
+            if previous and previous["sha256"] == digest and previous["path"] == page.path and _files_present(path):
+                entry = dict(previous)
+            else:
+                entry = write_page(path, body)
+                entry["sha256"] = digest
+                written += 1
+                bytes_written += len(body)
+            entries[page.url] = {"path": page.path, **entry, "source": page.source}
+            if progress and done % 200 == 0:
+                progress(done, len(to_render))
+
+    asyncio.run(render_all())
+
+    removed = 0
+    for url, entry in old.items():
+        if url not in pages:
+            _remove_file(os.path.join(out_dir, entry["path"]))
+            removed += 1
+
+    # The manifest goes last: an interrupted build just gets redone
+    manifest = {"generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "files": dict(sorted(entries.items()))}
+    _write_file(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=1).encode("utf-8"))
+
+    return BuildResult(len(to_render), written, len(pages) - len(to_render), removed, bytes_written)
+
+
+def compressed_size(entries: Dict[str, dict], key: str) -> Optional[int]:
+    sizes = [entry[key] for entry in entries.values()]
+    return None if any(size is None for size in sizes) else sum(sizes)
\ No newline at end of file
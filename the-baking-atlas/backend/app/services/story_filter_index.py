@@ -0,0 +1,252 @@
+"""
+In-memory index for filtering stories by tag, region and time context.
+
+For every tag name, country code and time context we keep the set of story
+ids that carry it, plus one list of all story ids in display order (newest
+first). A filter like `tag=rice&tag=steaming&region=JP,KR` becomes a couple
+of set intersections/unions, and only the ids on the requested page are
+then loaded from SQLite.
+
+The index is built lazily from the database on first use and then kept
+current by the write routes. Changes made while load() is reading the
+database are applied again once it's done, so they aren't lost.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _sort_key(story_id: int, published_at: Optional[datetime]) -> Tuple[float, int]:
+    # Stories without a publish date sort last, like NULLs in ORDER BY ... DESC
+    return (-(published_at.timestamp() if published_at else float("-inf")), -story_id)
+
+
+class StoryFilterIndex:
+    """Story id sets per tag / region / time context, plus the display order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.loaded = False
+        self._loading = 0  # load()s running right now
+        self._pending: List[tuple] = []  # (method, args) called while they run
+
+    def _reset(self):
+        self._tags: Dict[str, Set[int]] = {}
+        self._regions: Dict[str, Set[int]] = {}
+        self._time_contexts: Dict[str, Set[int]] = {}
+        self._order: List[Tuple[float, int]] = []  # sorted _sort_key()s
+        self._keys: Dict[int, Tuple[float, int]] = {}  # story id -> its sort key
+        self._memberships: Dict[int, Tuple[List[str], List[str], Optional[str]]] = {}
+
+    # === BUILDING ===
+
+    def load(self, db):
+        """(Re)build the whole index from the database."""
+        with self._lock:
+            self._loading += 1
+        try:
+            tags, regions, stories = self._read(db)
+        except BaseException:
+            with self._lock:
+                self._finish_load()
+            raise
+
+        with self._lock:
+            self._reset()
+            for story_id, time_context, published_at in stories:
+                self._add(story_id, tags.get(story_id, []), regions.get(story_id, []),
+                          time_context, published_at, keep_sorted=False)
+            self._order.sort()
+            self.loaded = True
+            # Writes that committed while we were reading may be missing from
+            # the rows; applying them again is harmless if they aren't
+            for method, args in self._finish_load():
+                method(*args)
+
+    def _finish_load(self) -> List[tuple]:
+        """The changes made since the earliest running load() started (lock held)."""
+        self._loading -= 1
+        pending = self._pending
+        if not self._loading:
+            self._pending = []
+        return pending
+
+    def _read(self, db):
+        from app.models import models
+
+        tags: Dict[int, List[str]] = {}
+        for story_id, name in db.query(models.story_tags.c.story_id, models.Tag.name).join(
+            models.Tag, models.Tag.id == models.story_tags.c.tag_id
+        ):
+            tags.setdefault(story_id, []).append(name)
+
+        regions: Dict[int, List[str]] = {}
+        for story_id, code in db.query(models.story_regions.c.story_id, models.Country.code).join(
+            models.Country, models.Country.id == models.story_regions.c.country_id
+        ):
+            regions.setdefault(story_id, []).append(code)
+
+        stories = db.query(models.Story.id, models.Story.time_context, models.Story.published_at).all()
+        return tags, regions, stories
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            self.load(db)
+
+    def invalidate(self):
+        """Drop everything; the next ensure_loaded() rebuilds from the database."""
+        with self._lock:
+            self._reset()
+            self.loaded = False
+
+    # === INCREMENTAL UPDATES (called from the write routes) ===
+
+    def set_story(self, story):
+        """Add or replace a story (a models.Story with its tags and regions loaded)."""
+        self._update(self._set, story.id, [tag.name for tag in story.tags],
+                     [country.code for country in story.regions], story.time_context, story.published_at)
+
+    def remove_story(self, story_id: int):
+        self._update(self._remove, story_id)
+
+    def remove_tag(self, name: str):
+        self._update(self._remove_tag, name)
+
+    def remove_region(self, code: str):
+        self._update(self._remove_region, code)
+
+    def rename_region(self, old_code: str, new_code: str):
+        """A country's code changed; move its stories over to the new code."""
+        if old_code != new_code:
+            self._update(self._rename_region, old_code, new_code)
+
+    def _update(self, method, *args):
+        with self._lock:
+            if self._loading:
+                # A load() is reading the database and may not see this change
+                self._pending.append((method, args))
+            if self.loaded:
+                method(*args)
+
+    # The methods below expect the lock to be held
+
+    def _set(self, story_id, tag_names, region_codes, time_context, published_at):
+        self._remove(story_id)
+        self._add(story_id, tag_names, region_codes, time_context, published_at)
+
+    def _remove_tag(self, name):
+        for story_id in self._tags.pop(name, ()):
+            self._memberships[story_id][0].remove(name)
+
+    def _remove_region(self, code):
+        for story_id in self._regions.pop(code, ()):
+            self._memberships[story_id][1].remove(code)
+
+    def _rename_region(self, old_code, new_code):
+        story_ids = self._regions.pop(old_code, set())
+        if story_ids:
+            self._regions.setdefault(new_code, set()).update(story_ids)
+        for story_id in story_ids:
+            codes = self._memberships[story_id][1]
+            codes[codes.index(old_code)] = new_code
+
+    def _add(self, story_id, tag_names, region_codes, time_context, published_at, keep_sorted=True):
+        for name in tag_names:
+            self._tags.setdefault(name, set()).add(story_id)
+        for code in region_codes:
+            self._regions.setdefault(code, set()).add(story_id)
+        if time_context:
+            self._time_contexts.setdefault(time_context, set()).add(story_id)
+        self._memberships[story_id] = (list(tag_names), list(region_codes), time_context)
+
+        key = _sort_key(story_id, published_at)
+        self._keys[story_id] = key
+        if keep_sorted:
+            insort(self._order, key)
+        else:
+            self._order.append(key)
+
+    def _remove(self, story_id):
+        membership = self._memberships.pop(story_id, None)
+        if membership is None:
+            return
+        tag_names, region_codes, time_context = membership
+        for values, index in ((tag_names, self._tags), (region_codes, self._regions),
+                              ([time_context] if time_context else [], self._time_contexts)):
+            for value in values:
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(story_id)
+                    if not ids:
+                        del index[value]
+        key = self._keys.pop(story_id)
+        del self._order[bisect_left(self._order, key)]
+
+    # === QUERYING ===
+
+    def query(
+        self,
+        tags: Iterable[str] = (),
+        regions: Iterable[Iterable[str]] = (),
+        time_contexts: Iterable[str] = (),
+        match_all: bool = True,
+        within: Optional[Set[int]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[int], int]:
+        """
+        Return (story ids for the requested page, newest first; total matches).
+
+        Different filters are always combined with AND. Within tags or
+        regions, several values must all match (match_all) or any may match.
+        Each region value is a group of country codes (one country, or every
+        country in a region) and matches stories in any country of the group.
+        A story has a single time context, so several time contexts always
+        mean "any of these". `within` restricts the results to a set of ids
+        found some other way (e.g. by an SQL filter).
+        """
+        with self._lock:
+            # Stories written elsewhere (another worker, sync_content) aren't
+            # in the index until cache_sync notices; leave them out
+            result: Optional[Set[int]] = None if within is None else self._keys.keys() & set(within)
+            region_sets = [set().union(*(self._regions.get(code, ()) for code in group))
+                           for group in regions]
+            for sets, all_of in (([self._tags.get(name, set()) for name in tags], match_all),
+                                 (region_sets, match_all),
+                                 ([self._time_contexts.get(value, set()) for value in time_contexts], False)):
+                if not sets:
+                    continue
+                combined = set.intersection(*sets) if all_of else set().union(*sets)
+                result = combined if result is None else result & combined
+
+            end = None if limit is None else offset + limit
+            if result is None:
+                return [-key[1] for key in self._order[offset:end]], len(self._order)
+
+            if len(result) * 8 < len(self._order):
+                # Few matches: just sort them
+                keys = self._keys
+                ordered = sorted(keys[story_id] for story_id in result)
+                return [-key[1] for key in ordered[offset:end]], len(result)
+
+            # Lots of matches: walk the display order until the page is full
+            page = []
+            skipped = 0
+            for key in self._order:
+                story_id = -key[1]
+                if story_id not in result:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                page.append(story_id)
+                if limit is not None and len(page) >= limit:
+                    break
+            return page, len(result)
+
+
+# One shared index per process
+story_filter_index = StoryFilterIndex()
@@ -0,0 +1,306 @@
+"""
+Map pins for stories, in an SQLite R*Tree.
+
+A story gets a pin when its extra_data has coordinates:
+    {"lat": 35.68, "lng": 139.69}   ("lon" works too)
+
+story_pins is an R*Tree virtual table, so "every pin in this viewport" is
+a tree lookup instead of a scan of every story. For zoomed-out maps,
+story_pin_clusters keeps a running count (and average position) of pins
+per grid cell at each zoom level, so a world view reads a few hundred
+cells rather than a million pins.
+
+Both tables are written in the same transaction as the story itself.
+They only use text() statements, so they work with an ORM session (from
+the routes) and with a plain connection (from migrations).
+"""
+
+import json
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+# Zoom levels up to this one get clusters; above it, individual pins
+CLUSTER_MAX_ZOOM = 12
+
+# Grid cells per 256px map tile (so each cell is about 64px across)
+CELLS_PER_TILE = 4
+
+# Most pins returned one by one for a zoomed-in viewport; a viewport
+# holding more gets clusters instead (see the pins route)
+MAX_PINS = 1000
+
+# remove_pins() rebuilds the clusters when removing more than 1/8 of all
+# pins: taking one pin out of its cells costs about 8x more than counting it
+REBUILD_RATIO = 8
+
+# Story ids per statement in remove_pins() (SQLite caps the number of values)
+ID_BATCH_SIZE = 5000
+
+CREATE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS story_pins USING rtree(id, min_lon, max_lon, min_lat, max_lat)",
+    "CREATE TABLE IF NOT EXISTS story_pin_clusters ("
+    "  zoom INTEGER NOT NULL, cell_x INTEGER NOT NULL, cell_y INTEGER NOT NULL,"
+    "  count INTEGER NOT NULL, sum_lon REAL NOT NULL, sum_lat REAL NOT NULL,"
+    "  PRIMARY KEY (zoom, cell_x, cell_y)"
+    ") WITHOUT ROWID",
+]
+
+
+def pin_for(extra_data) -> Optional[Tuple[float, float]]:
+    """The (lon, lat) pin stored in a story's extra_data, if it has a valid one."""
+    if not isinstance(extra_data, dict):
+        return None
+    lat = extra_data.get("lat")
+    lon = extra_data.get("lng", extra_data.get("lon"))
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lon, lat
+
+
+def cell_size(zoom: int) -> float:
+    """Width (and height) of a cluster cell at this zoom, in degrees."""
+    return 360.0 / ((1 << zoom) * CELLS_PER_TILE)
+
+
+# A stored pin's cell (x, y) at the cell size bound to :size, in SQL.
+# Same arithmetic as _cell() and _REMOVED_CELLS so all agree on edge cases.
+_CELL_SQL = (
+    "MAX(0, CAST((min_lon + 180) / :size AS INTEGER)) AS x, "
+    "MAX(0, CAST((min_lat + 90) / :size AS INTEGER)) AS y"
+)
+
+
+# The cells of the pins with ids in :ids at every zoom level, as a CTE
+# called "removed" with their pin count and coordinate sums
+_REMOVED_CELLS = (
+    "WITH pins AS MATERIALIZED (SELECT min_lon, min_lat FROM story_pins WHERE id IN :ids), "
+    "zooms(zoom, size) AS (VALUES "
+    + ", ".join(f"({zoom}, {cell_size(zoom)!r})" for zoom in range(CLUSTER_MAX_ZOOM + 1)) + "), "
+    "removed AS ("
+    "  SELECT zoom, MAX(0, CAST((min_lon + 180) / size AS INTEGER)) AS x, "
+    "         MAX(0, CAST((min_lat + 90) / size AS INTEGER)) AS y, "
+    "         COUNT(*) AS n, SUM(min_lon) AS lon, SUM(min_lat) AS lat "
+    "  FROM pins, zooms GROUP BY 1, 2, 3) "
+)
+
+
+def _cell(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    # Same arithmetic as _CELL_SQL
+    size = cell_size(zoom)
+    return max(0, int((lon + 180) / size)), max(0, int((lat + 90) / size))
+
+
+# === SETUP ===
+
+def create_tables(db):
+    for statement in CREATE_STATEMENTS:
+        db.execute(text(statement))
+
+
+def rebuild(db):
+    """Refill both tables from the stories' extra_data (used by the migration)."""
+    create_tables(db)
+    db.execute(text("DELETE FROM story_pins"))
+    rows = db.execute(text("SELECT id, extra_data FROM stories")).fetchall()
+    for story_id, extra_data in rows:
+        pin = pin_for(json.loads(extra_data) if isinstance(extra_data, str) else extra_data)
+        if pin:
+            db.execute(text("INSERT INTO story_pins VALUES (:id, :lon, :lon, :lat, :lat)"),
+                       {"id": story_id, "lon": pin[0], "lat": pin[1]})
+    rebuild_clusters(db)
+
+
+def rebuild_clusters(db):
+    """Recount every cluster cell from story_pins, one GROUP BY per zoom level."""
+    db.execute(text("DELETE FROM story_pin_clusters"))
+    for zoom in range(CLUSTER_MAX_ZOOM + 1):
+        db.execute(text(
+            f"INSERT INTO story_pin_clusters SELECT :zoom, {_CELL_SQL}, COUNT(*), SUM(min_lon), SUM(min_lat) "
+            "FROM story_pins GROUP BY 2, 3"
+        ), {"zoom": zoom, "size": cell_size(zoom)})
+
+
+# === KEEPING PINS CURRENT (called from the write routes, before commit) ===
+
+def set_pin(db, story_id: int, extra_data, new: bool = False):
+    """
+    Add, move or remove a story's pin to match its extra_data.
+    Pass new=True for a story that was just created (it can't have a pin yet).
+    """
+    if not new:
+        remove_pin(db, story_id)
+    pin = pin_for(extra_data)
+    if pin is None:
+        return
+    # RETURNING gives back the pin as the R*Tree actually stored it (it rounds
+    # to 32-bit floats), so it's counted in the cells rebuild_clusters() would use
+    stored = db.execute(text(
+        "INSERT INTO story_pins VALUES (:id, :lon, :lon, :lat, :lat) RETURNING min_lon, min_lat"
+    ), {"id": story_id, "lon": pin[0], "lat": pin[1]}).first()
+    _update_clusters(db, stored[0], stored[1], +1)
+
+
+def remove_pin(db, story_id: int):
+    row = db.execute(text("SELECT min_lon, min_lat FROM story_pins WHERE id = :id"), {"id": story_id}).first()
+    if row is None:
+        return
+    db.execute(text("DELETE FROM story_pins WHERE id = :id"), {"id": story_id})
+    _update_clusters(db, row[0], row[1], -1)
+
+
+def remove_pins(db, story_ids: List[int]):
+    """
+    remove_pin() for many stories at once.
+
+    Cluster counts go down in one grouped UPDATE per batch of pins. Past
+    1/REBUILD_RATIO of all pins, recounting the rest from scratch is
+    cheaper, so the clusters are rebuilt instead.
+    """
+    total = db.execute(text("SELECT COALESCE(SUM(count), 0) FROM story_pin_clusters WHERE zoom = 0")).scalar()
+    rebuild_after = len(story_ids) * REBUILD_RATIO > total
+    ids = bindparam("ids", expanding=True)
+    for start in range(0, len(story_ids), ID_BATCH_SIZE):
+        params = {"ids": list(story_ids[start:start + ID_BATCH_SIZE])}
+        if not rebuild_after:
+            db.execute(text(_REMOVED_CELLS + (
+                "UPDATE story_pin_clusters SET count = count - removed.n, "
+                "sum_lon = sum_lon - removed.lon, sum_lat = sum_lat - removed.lat "
+                "FROM removed WHERE story_pin_clusters.zoom = removed.zoom "
+                "AND cell_x = removed.x AND cell_y = removed.y"
+            )).bindparams(ids), params)
+            db.execute(text(_REMOVED_CELLS + (
+                "DELETE FROM story_pin_clusters WHERE count <= 0 "
+                "AND (zoom, cell_x, cell_y) IN (SELECT zoom, x, y FROM removed)"
+            )).bindparams(ids), params)
+        db.execute(text("DELETE FROM story_pins WHERE id IN :ids").bindparams(ids), params)
+    if rebuild_after:
+        rebuild_clusters(db)
+
+
+def _update_clusters(db, lon: float, lat: float, delta: int):
+    # One multi-row upsert covers the pin's cell at every zoom level
+    params = {"n": delta, "lon": lon * delta, "lat": lat * delta}
+    cells = []
+    for zoom in range(CLUSTER_MAX_ZOOM + 1):
+        params[f"x{zoom}"], params[f"y{zoom}"] = _cell(lon, lat, zoom)
+        cells.append(f"{zoom}, :x{zoom}, :y{zoom}")
+    db.execute(text(
+        "INSERT INTO story_pin_clusters VALUES "
+        + ", ".join(f"({cell}, :n, :lon, :lat)" for cell in cells)
+        + " ON CONFLICT (zoom, cell_x, cell_y) DO UPDATE SET "
+        "count = count + excluded.count, sum_lon = sum_lon + excluded.sum_lon, "
+        "sum_lat = sum_lat + excluded.sum_lat"
+    ), params)
+    if delta < 0:
+        db.execute(text(
+            "DELETE FROM story_pin_clusters WHERE count <= 0 AND (zoom, cell_x, cell_y) IN (VALUES "
+            + ", ".join(f"({cell})" for cell in cells) + ")"
+        ), params)
+
+
+# === QUERYING ===
+
+def _boxes(bbox: Tuple[float, float, float, float]):
+    """Split a viewport that crosses the antimeridian (west > east) into two boxes."""
+    west, south, east, north = bbox
+    if west <= east:
+        return [(west, south, east, north)]
+    return [(west, south, 180.0, north), (-180.0, south, east, north)]
+
+
+def story_ids_in_bbox(db, bbox) -> set:
+    ids = set()
+    for west, south, east, north in _boxes(bbox):
+        ids.update(story_id for story_id, in db.execute(text(
+            "SELECT id FROM story_pins WHERE max_lon >= :w AND min_lon <= :e "
+            "AND max_lat >= :s AND min_lat <= :n"
+        ), {"w": west, "e": east, "s": south, "n": north}))
+    return ids
+
+
+def pins_in_bbox(db, bbox, limit: int = MAX_PINS) -> List[Tuple[int, float, float]]:
+    """(story id, lon, lat) of the pins in a viewport."""
+    pins = []
+    for west, south, east, north in _boxes(bbox):
+        pins += db.execute(text(
+            "SELECT id, min_lon, min_lat FROM story_pins WHERE max_lon >= :w AND min_lon <= :e "
+            "AND max_lat >= :s AND min_lat <= :n LIMIT :limit"
+        ), {"w": west, "e": east, "s": south, "n": north, "limit": limit - len(pins)}).fetchall()
+    return [tuple(pin) for pin in pins]
+
+
+def clusters_in_bbox(db, bbox, zoom: int) -> List[Tuple[int, float, float, Optional[int]]]:
+    """
+    (pin count, average lon, average lat, story id) per non-empty grid cell
+    in a viewport. The story id is only filled in for cells with a single pin.
+    """
+    zoom = min(zoom, CLUSTER_MAX_ZOOM)
+    clusters = []
+    for west, south, east, north in _boxes(bbox):
+        min_x, min_y = _cell(west, south, zoom)
+        max_x, max_y = _cell(east, north, zoom)
+        clusters += db.execute(text(
+            "SELECT cell_x, cell_y, count, sum_lon / count, sum_lat / count FROM story_pin_clusters "
+            "WHERE zoom = :zoom AND cell_x BETWEEN :x0 AND :x1 AND cell_y BETWEEN :y0 AND :y1"
+        ), {"zoom": zoom, "x0": min_x, "x1": max_x, "y0": min_y, "y1": max_y}).fetchall()
+
+    # A lone pin is shown as itself; find which stories those are
+    singles = _single_pins(db, [(cell_x, cell_y) for cell_x, cell_y, count, _, _ in clusters if count == 1], zoom)
+    results = []
+    for cell_x, cell_y, count, lon, lat in clusters:
+        story_id = None
+        if count == 1 and (cell_x, cell_y) in singles:
+            story_id, lon, lat = singles[(cell_x, cell_y)]
+        results.append((count, lon, lat, story_id))
+    return results
+
+
+def _single_pins(db, cells: List[Tuple[int, int]], zoom: int) -> dict:
+    """
+    {(cell x, cell y): (story id, lon, lat)} for cells holding one pin.
+
+    One statement per ID_BATCH_SIZE cells: the cells are joined to the
+    R*Tree, so each is still a tree lookup of its own square.
+    """
+    size = cell_size(zoom)
+    found = {}
+    batch_size = ID_BATCH_SIZE // 2  # Two values per cell
+    for start in range(0, len(cells), batch_size):
+        batch = cells[start:start + batch_size]
+        params = {"size": size}
+        values = []
+        for i, (cell_x, cell_y) in enumerate(batch):
+            params[f"x{i}"], params[f"y{i}"] = cell_x, cell_y
+            values.append(f"(:x{i}, :y{i})")
+        rows = db.execute(text(
+            f"WITH cells(x, y) AS (VALUES {', '.join(values)}) "
+            "SELECT cells.x, cells.y, story_pins.id, min_lon, min_lat FROM cells, story_pins "
+            "WHERE max_lon >= cells.x * :size - 180 AND min_lon <= (cells.x + 1) * :size - 180 "
+            "AND max_lat >= cells.y * :size - 90 AND min_lat <= (cells.y + 1) * :size - 90"
+        ), params).fetchall()
+        matches = {}
+        for cell_x, cell_y, story_id, lon, lat in rows:
+            # A pin right on a cell's edge is found for both cells; keep it in its own
+            if _cell(lon, lat, zoom) == (cell_x, cell_y):
+                matches.setdefault((cell_x, cell_y), []).append((story_id, lon, lat))
+        found.update((cell, pins[0]) for cell, pins in matches.items() if len(pins) == 1)
+    return found
+
+
+def parse_bbox(value: str) -> Optional[Tuple[float, float, float, float]]:
+    """Parse "minLon,minLat,maxLon,maxLat"; None if it isn't a valid box."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError:
+        return None
+    if not all(map(math.isfinite, (west, south, east, north))):
+        return None
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        return None
+    return west, south, east, north
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Revision history for story bodies (the story_revisions table).
+
+Saving the whole markdown body on every edit would grow the database by a
+full copy per edit, so most revisions store a line-based delta against the
+previous revision instead:
+
+    [12, -1, "A rewritten sentence.\\n", 40]
+
+A positive number copies that many lines from the previous body, a
+negative one skips lines, and a string is a new line. A small edit to a
+long story costs a few dozen bytes.
+
+Every SNAPSHOT_EVERY revisions (and whenever a delta would be no smaller
+than the body itself) the full body is stored instead. Rebuilding any
+revision starts from the nearest snapshot at or before it, so it applies
+fewer than SNAPSHOT_EVERY deltas however long the history gets.
+"""
+
+import json
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+from sqlalchemy import func, insert, select
+
+from app.models import models
+
+# At most this many revisions in a row share one snapshot
+SNAPSHOT_EVERY = 25
+
+
+# === DELTAS ===
+
+def make_delta(old: str, new: str) -> str:
+    """The changes that turn `old` into `new`, as compact JSON."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(-(i2 - i1))
+        ops.extend(new_lines[j1:j2])
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(old: str, delta: str) -> str:
+    """Rebuild the newer body from `old` and make_delta(old, new)."""
+    return "".join(_apply(old.splitlines(keepends=True), delta))
+
+
+def _apply(old_lines: List[str], delta: str) -> List[str]:
+    # Works on lists of lines, so a chain of deltas doesn't re-split the body each time
+    new_lines = []
+    position = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            new_lines.append(op)
+        elif op > 0:
+            new_lines.extend(old_lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return new_lines
+
+
+# === WRITING (called from the story routes, before commit) ===
+
+def record_first(db, story: models.Story):
+    """Save a new story's title and body as revision 1."""
+    db.execute(insert(models.StoryRevision).values(
+        story_id=story.id, number=1, title=story.title, body=story.body,
+        created_at=story.published_at or datetime.utcnow(),
+    ))
+
+
+def record(db, story_id: int, previous_body: str, title: str, body: str, notes: Optional[str] = None):
+    """Save an edited title/body as the story's next revision."""
+    latest, latest_snapshot = db.execute(
+        select(func.max(models.StoryRevision.number),
+               func.max(models.StoryRevision.number).filter(models.StoryRevision.body.isnot(None)))
+        .where(models.StoryRevision.story_id == story_id)
+    ).one()
+    # Every story has a revision 1 (from create_story or the migration);
+    # without one, this revision is simply stored in full
+    number = (latest or 0) + 1
+
+    values = {"story_id": story_id, "number": number, "title": title, "revision_notes": notes}
+    delta = make_delta(previous_body, body) if latest else None
+    if delta is None or number - latest_snapshot >= SNAPSHOT_EVERY or len(delta) >= len(body):
+        values["body"] = body
+    else:
+        values["body_delta"] = delta
+    db.execute(insert(models.StoryRevision).values(**values))
+
+
+# === READING ===
+
+def list_revisions(db, story_id: int) -> List[dict]:
+    """Every revision of a story (without bodies), newest first."""
+    revision = models.StoryRevision
+    rows = db.execute(
+        select(revision.number, revision.title, revision.revision_notes, revision.created_at,
+               revision.body.isnot(None),
+               func.coalesce(func.length(revision.body), 0) + func.coalesce(func.length(revision.body_delta), 0))
+        .where(revision.story_id == story_id)
+        .order_by(revision.number.desc())
+    )
+    return [
+        {"number": number, "title": title, "revision_notes": notes, "created_at": created_at,
+         "is_snapshot": bool(is_snapshot), "stored_bytes": stored_bytes}
+        for number, title, notes, created_at, is_snapshot, stored_bytes in rows
+    ]
+
+
+def get_revision(db, story_id: int, number: int) -> Optional[dict]:
+    """
+    A revision with its full body, or None if the story has no such revision.
+
+    One query reads the nearest snapshot at or before the revision plus the
+    deltas after it, which are then applied in order.
+    """
+    revision = models.StoryRevision
+    snapshot = (
+        select(func.max(revision.number))
+        .where(revision.story_id == story_id, revision.number <= number, revision.body.isnot(None))
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(revision.number, revision.title, revision.revision_notes, revision.created_at,
+               revision.body, revision.body_delta)
+        .where(revision.story_id == story_id, revision.number.between(snapshot, number))
+        .order_by(revision.number)
+    ).all()
+    if not rows or rows[-1].number != number:
+        return None
+
+    lines = rows[0].body.splitlines(keepends=True)
+    for row in rows[1:]:
+        lines = _apply(lines, row.body_delta)
+    last = rows[-1]
+    return {"number": last.number, "title": last.title, "revision_notes": last.revision_notes,
+            "created_at": last.created_at, "body": "".join(lines)}
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Story bodies cut into sections, for a table of contents and loading one
+section at a time (the story_sections table).
+
+GET /api/stories/{slug} returns the whole markdown body, which for a long
+piece is hundreds of KB before the reader sees the first paragraph. A
+reader can instead fetch
+
+    GET /api/stories/{slug}/toc           every section's heading, size and word count
+    GET /api/stories/{slug}/sections/2    the markdown of section 2
+
+A section starts at each markdown heading ("# ..." down to "###### ...",
+ignoring lines inside ``` or ~~~ code blocks) and runs up to the next one.
+Any text before the first heading is section 1, with no heading. Offsets
+and lengths are in bytes of the UTF-8 encoded body, so section n is
+body.encode("utf-8")[offset:offset + length].
+
+The body is stored as one compressed value (app/database/compression.py),
+so reading a slice of it would mean reading and decompressing all of it.
+Each section is therefore also stored as its own compressed row, keyed
+by (story_id, number): serving a section reads and decompresses just that
+row, and the table of contents reads no text at all.
+
+Sections are cut again whenever a story's body is written, in the same
+transaction. Only Core statements are used, so this works with an ORM
+session (from the routes) and a plain connection (from the migration).
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, delete, insert, select
+
+from app.models import models
+
+# "## Heading", with optional closing #s ("## Heading ##")
+HEADING = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+
+
+class Section(NamedTuple):
+    number: int
+    heading: Optional[str]
+    level: int  # 1 for "#", 2 for "##"...; 0 for the text before the first heading
+    byte_offset: int
+    byte_length: int
+    word_count: int
+    body: str
+
+
+def _word_count(text: str) -> int:
+    # The heading's "#"s aren't words
+    return sum(1 for word in text.split() if word.strip("#"))
+
+
+def split_sections(body: str) -> List[Section]:
+    """A markdown body's sections, in order (none for an empty body)."""
+    sections = []
+    heading, level, start = None, 0, 0  # The section being read
+    offset = 0  # Byte offset of the current line
+    fence = None  # The ``` or ~~~ that opened the code block we're in
+
+    def close(end: int):
+        text = encoded[start:end].decode("utf-8")
+        sections.append(Section(len(sections) + 1, heading, level, start, end - start, _word_count(text), text))
+
+    encoded = body.encode("utf-8")
+    for line in body.splitlines(keepends=True):
+        stripped = line.rstrip("\r\n")
+        opening = None if fence else FENCE.match(stripped)
+        if fence:
+            # Closed by a line of at least as many of the same character
+            if stripped.strip().startswith(fence) and not stripped.strip().strip(fence[0]):
+                fence = None
+        elif opening:
+            fence = opening.group(1)
+        else:
+            match = HEADING.match(stripped)
+            if match:
+                # Empty text before the first heading isn't a section
+                if heading is not None or offset > start:
+                    close(offset)
+                heading, level, start = (match.group(2) or "").strip(), len(match.group(1)), offset
+        offset += len(line.encode("utf-8"))
+    if heading is not None or offset > start:
+        close(offset)
+    return sections
+
+
+# === WRITING (called with the story write, before commit) ===
+
+def write_sections(db, story_id: int, body: str, new: bool = False):
+    """
+    Replace a story's sections with those of its (new) body.
+    Pass new=True for a story that was just created (it has none yet).
+    """
+    if not new:
+        db.execute(delete(models.StorySection).where(models.StorySection.story_id == story_id))
+    rows = [{"story_id": story_id, **section._asdict()} for section in split_sections(body)]
+    if rows:
+        # render_nulls: without it an ORM session leaves NULL headings out
+        # of the INSERT, and sends rows with and without a heading separately
+        db.execute(insert(models.StorySection), rows, execution_options={"render_nulls": True})
+
+
+def rebuild(db):
+    """Cut every story's body into sections again (used by the migration)."""
+    db.execute(delete(models.StorySection))
+    for story_id, body in db.execute(select(models.Story.id, models.Story.body)).all():
+        write_sections(db, story_id, body, new=True)
+
+
+# === READING ===
+
+# Built once, like the lookups in app/database/repository.py
+_TOC = (
+    select(models.StorySection.number, models.StorySection.heading, models.StorySection.level,
+           models.StorySection.byte_offset, models.StorySection.byte_length, models.StorySection.word_count)
+    .where(models.StorySection.story_id == bindparam("story_id"))
+    .order_by(models.StorySection.number)
+)
+_SECTION = select(
+    models.StorySection.number, models.StorySection.heading, models.StorySection.level,
+    models.StorySection.byte_offset, models.StorySection.byte_length, models.StorySection.word_count,
+    models.StorySection.body,
+).where(models.StorySection.story_id == bindparam("story_id"), models.StorySection.number == bindparam("number"))
+
+
+def table_of_contents(db, story_id: int) -> List[dict]:
+    """Every section of a story, without its text."""
+    return [dict(row._mapping) for row in db.execute(_TOC, {"story_id": story_id})]
+
+
+def get_section(db, story_id: int, number: int) -> Optional[dict]:
+    """One section with its markdown, or None if the story has no such section."""
+    row = db.execute(_SECTION, {"story_id": story_id, "number": number}).first()
+    return dict(row._mapping) if row else None
\ No newline at end of file
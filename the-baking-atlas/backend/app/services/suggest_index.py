@@ -0,0 +1,362 @@
+"""
+In-memory typeahead index over everything a user might type into the search box.
+
+Two structures live side by side:
+- a prefix index: a sorted list of normalized tokens (each word, plus the whole
+  name with spaces removed) pointing at entries, so "melon pan" finds "Melonpan"
+- a trigram index: for fuzzy fallback when nothing matches by prefix,
+  so "castela" still finds "Castella"
+
+The index is built lazily from the database on first use and then kept
+current by the write routes calling add() / remove(). Changes made while
+load() is reading the database are applied again once it's done, so a
+write that commits halfway through a load isn't lost.
+"""
+
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Entry kinds, in the order they are loaded
+KINDS = ("country", "baked_good", "ingredient", "tag", "story")
+
+# Upper bound on trigram postings scanned per fuzzy query; the rarest
+# trigrams are scanned first, so very common ones are usually skipped
+MAX_TRIGRAM_POSTINGS = 2000
+
+# How many prefix candidates to consider per requested result, and how
+# many fuzzy candidates to score, before ranking
+PREFIX_CANDIDATES_PER_RESULT = 8
+MAX_FUZZY_CANDIDATES = 50
+
+# Minimum trigram similarity (0..1) for a fuzzy match to be returned
+MIN_FUZZY_SCORE = 0.3
+
+
+_NOT_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and turn punctuation into spaces."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NOT_ALNUM.sub(" ", text.lower()).strip()
+
+
+def tokens_for(normalized: str) -> List[str]:
+    """Prefix keys for a name: each word plus the whole name without spaces."""
+    words = normalized.split()
+    compact = "".join(words)
+    keys = set(words)
+    if compact:
+        keys.add(compact)
+    return list(keys)
+
+
+def trigrams_for(normalized: str) -> List[str]:
+    """Padded trigrams of the space-free name ("castella" -> "  c", " ca", ...)."""
+    compact = "".join(normalized.split())
+    if not compact:
+        return []
+    padded = f"  {compact} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class _State:
+    """Everything one version of the index needs, so rebuilds can swap it in atomically."""
+
+    def __init__(self):
+        # Each entry is (kind, id, name, ref, normalized name without spaces)
+        self.entries: List[Optional[Tuple[str, int, str, Optional[str], str]]] = []
+        self.positions: Dict[Tuple[str, int], int] = {}
+        self.tokens: List[str] = []  # sorted, distinct
+        self.postings: Dict[str, array] = {}
+        self.trigrams: Dict[str, array] = {}
+        self.tombstones = 0
+
+
+class SuggestIndex:
+    """
+    Prefix + trigram index of (kind, id) -> display name.
+
+    Entries are stored in a flat list and referenced by position. Removing or
+    renaming an entry leaves a tombstone (None) behind; the index rebuilds
+    itself once tombstones make up a quarter of the entries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _State()
+        self.loaded = False
+        self._loading = 0  # load()s running right now
+        self._pending: List[tuple] = []  # (method, args) called while they run
+
+    # === BUILDING ===
+
+    def load(self, db):
+        """(Re)build the whole index from the database."""
+        with self._lock:
+            self._loading += 1
+        try:
+            state = self._build(self._read(db))
+        except BaseException:
+            with self._lock:
+                self._finish_load()
+            raise
+        with self._lock:
+            self._state = state
+            self.loaded = True
+            # Writes that committed while we were reading may be missing from
+            # the rows; applying them again is harmless if they aren't
+            for method, args in self._finish_load():
+                method(*args)
+
+    def _finish_load(self) -> List[tuple]:
+        """The changes made since the earliest running load() started (lock held)."""
+        self._loading -= 1
+        pending = self._pending
+        if not self._loading:
+            self._pending = []
+        return pending
+
+    def _read(self, db) -> list:
+        """(kind, id, name, ref) for everything the index holds."""
+        # Imported here so the index can be used (and benchmarked) without the app
+        from app.models import models
+
+        rows = []
+        rows += [("country", id, name, code) for id, name, code in
+                 db.query(models.Country.id, models.Country.name, models.Country.code)]
+        rows += [("baked_good", id, name, None) for id, name in
+                 db.query(models.BakedGood.id, models.BakedGood.name)]
+        rows += [("ingredient", id, name, name) for id, name in
+                 db.query(models.CanonicalIngredient.id, models.CanonicalIngredient.name)]
+        rows += [("tag", id, name, name) for id, name in
+                 db.query(models.Tag.id, models.Tag.name)]
+        rows += [("story", id, title, slug) for id, title, slug in
+                 db.query(models.Story.id, models.Story.title, models.Story.slug)]
+        return rows
+
+    def build(self, rows):
+        """Build the index from (kind, id, name, ref) rows in one pass."""
+        with self._lock:
+            self._state = self._build(rows)
+            self.loaded = True
+
+    def _build(self, rows) -> _State:
+        state = _State()
+        postings: Dict[str, List[int]] = {}
+        trigrams: Dict[str, List[int]] = {}
+        for kind, id, name, ref in rows:
+            position = len(state.entries)
+            normalized = normalize(name)
+            state.entries.append((kind, id, name, ref, normalized.replace(" ", "")))
+            state.positions[(kind, id)] = position
+            for token in tokens_for(normalized):
+                postings.setdefault(token, []).append(position)
+            for trigram in trigrams_for(normalized):
+                trigrams.setdefault(trigram, []).append(position)
+        state.postings = {k: array("I", v) for k, v in postings.items()}
+        state.trigrams = {k: array("I", v) for k, v in trigrams.items()}
+        state.tokens = sorted(state.postings)
+        return state
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            self.load(db)
+
+    def invalidate(self):
+        """Drop everything; the next ensure_loaded() rebuilds from the database."""
+        with self._lock:
+            self._state = _State()
+            self.loaded = False
+
+    # === INCREMENTAL UPDATES (called from the write routes) ===
+
+    def add(self, kind: str, id: int, name: str, ref: Optional[str] = None):
+        """
+        Add or replace an entry. Before the index is loaded this only matters
+        to a load() already running, which applies it once it's done.
+        """
+        self._update(self._add, kind, id, name, ref)
+
+    def remove(self, kind: str, id: int):
+        """Remove an entry if present."""
+        self._update(self._remove, kind, id)
+
+    def _update(self, method, *args):
+        with self._lock:
+            if self._loading:
+                # A load() is reading the database and may not see this change
+                self._pending.append((method, args))
+            if self.loaded:
+                method(*args)
+
+    # The methods below expect the lock to be held
+
+    def _add(self, kind: str, id: int, name: str, ref: Optional[str]):
+        state = self._state
+        position = state.positions.get((kind, id))
+        if position is not None:
+            entry = state.entries[position]
+            if entry[2] == name and entry[3] == ref:
+                return
+            self._remove_at(state, position)
+
+        # Postings are appended before the entry itself so that readers
+        # never see a position they can't look up yet
+        position = len(state.entries)
+        normalized = normalize(name)
+        for token in tokens_for(normalized):
+            if token not in state.postings:
+                state.postings[token] = array("I")
+                insort(state.tokens, token)
+            state.postings[token].append(position)
+        for trigram in trigrams_for(normalized):
+            state.trigrams.setdefault(trigram, array("I")).append(position)
+        state.entries.append((kind, id, name, ref, normalized.replace(" ", "")))
+        state.positions[(kind, id)] = position
+        self._maybe_compact(state)
+
+    def _remove(self, kind: str, id: int):
+        state = self._state
+        position = state.positions.get((kind, id))
+        if position is not None:
+            self._remove_at(state, position)
+            self._maybe_compact(state)
+
+    def _remove_at(self, state: _State, position: int):
+        kind, id = state.entries[position][:2]
+        state.entries[position] = None
+        del state.positions[(kind, id)]
+        state.tombstones += 1
+
+    def _maybe_compact(self, state: _State):
+        if state.tombstones * 4 > len(state.entries) + 16:
+            live = [entry[:4] for entry in state.entries if entry is not None]
+            self._state = self._build(live)
+
+    # === QUERYING ===
+
+    def __len__(self):
+        return len(self._state.positions)
+
+    def suggest(self, query: str, limit: int = 10, kinds: Optional[List[str]] = None) -> List[dict]:
+        """
+        Return up to `limit` ranked suggestions for what the user has typed.
+
+        Prefix matches come first; fuzzy (trigram) matching only runs when
+        nothing matches by prefix, i.e. when the user has probably made a typo.
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        state = self._state
+        wanted = set(kinds) if kinds else None
+        words = normalized.split()
+        compact = "".join(words)
+        candidates = limit * PREFIX_CANDIDATES_PER_RESULT
+
+        scored: Dict[int, Tuple[float, tuple]] = {}
+        for prefix in {compact, words[-1]}:
+            for position, entry in self._prefix_candidates(state, prefix, candidates, wanted):
+                entry_compact = entry[4]
+                if entry_compact == compact:
+                    score = 3.0
+                elif entry_compact.startswith(compact):
+                    score = 2.0
+                elif prefix == compact or all(word in entry_compact for word in words):
+                    score = 1.0
+                else:
+                    continue
+                # Shorter names are closer to what was typed
+                score += 1.0 / (1 + len(entry_compact))
+                if position not in scored or score > scored[position][0]:
+                    scored[position] = (score, entry)
+
+        if not scored:
+            for position, entry, similarity in self._fuzzy_candidates(state, normalized, wanted):
+                scored[position] = (similarity, entry)
+
+        ranked = sorted(scored.values(), key=lambda item: (-item[0], item[1][2]))
+        results = []
+        for score, (kind, id, name, ref, _) in ranked[:limit]:
+            results.append({"type": kind, "id": id, "name": name, "ref": ref, "score": round(score, 3)})
+        return results
+
+    @staticmethod
+    def _entry(state: _State, position: int, wanted: Optional[set]):
+        """
+        The entry at a position, or None if it's gone or not of a wanted kind.
+
+        Readers don't take the lock, so a concurrent remove() can turn an
+        entry into a tombstone at any moment: callers keep the entry as read.
+        """
+        entries = state.entries
+        entry = entries[position] if position < len(entries) else None
+        if entry is None or (wanted and entry[0] not in wanted):
+            return None
+        return entry
+
+    def _prefix_candidates(self, state: _State, prefix: str, limit: int, wanted: Optional[set]):
+        """(position, entry) for up to `limit` entries of the wanted kinds with a token starting with prefix."""
+        tokens = state.tokens
+        postings = state.postings
+        found = 0
+        i = bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            for position in postings.get(tokens[i], ()):
+                # Other kinds don't take up candidate slots
+                entry = self._entry(state, position, wanted)
+                if entry is None:
+                    continue
+                yield position, entry
+                found += 1
+                if found >= limit:
+                    return
+            i += 1
+
+    def _fuzzy_candidates(self, state: _State, normalized: str, wanted: Optional[set]):
+        """(position, entry, similarity) for the entries of the wanted kinds sharing the most trigrams."""
+        query_trigrams = trigrams_for(normalized)
+        if not query_trigrams:
+            return []
+        lists = sorted(
+            (state.trigrams[t] for t in query_trigrams if t in state.trigrams),
+            key=len,
+        )
+        # Count shared trigrams using the rarest lists first, and stop before
+        # the very common ones once we have something to work with
+        counts = Counter()
+        budget = MAX_TRIGRAM_POSTINGS
+        for postings in lists:
+            if counts and len(postings) > budget:
+                break
+            counts.update(postings[:budget])
+            budget -= len(postings)
+
+        query_set = set(query_trigrams)
+        results = []
+        considered = 0
+        for position, _ in counts.most_common():
+            entry = self._entry(state, position, wanted)
+            if entry is None:
+                continue
+            candidate = set(trigrams_for(entry[4]))
+            shared = len(query_set & candidate)
+            similarity = shared / len(query_set | candidate)
+            if similarity >= MIN_FUZZY_SCORE:
+                results.append((position, entry, similarity))
+            considered += 1
+            if considered >= MAX_FUZZY_CANDIDATES:
+                break
+        return results
+
+
+# One shared index per process
+suggest_index = SuggestIndex()
\ No newline at end of file
@@ -0,0 +1,592 @@
+"""
+Country boundary vector tiles for the world map, served by the API itself.
+
+The pipeline:
+1. build_tiles.py reads a local GeoJSON file of country boundaries and stores
+   each country's geometry (projected to Web Mercator) in an MBTiles file.
+2. Tiles are cut from that geometry per zoom level: simplified to about half
+   a pixel, clipped to the tile, and encoded as Mapbox Vector Tiles.
+   Each country feature carries `hasData` and `storyCount` from our database.
+3. Encoded tiles are cached in the same MBTiles file. When a country (or a
+   story about it) changes, only the tiles containing that country are
+   dropped; they are re-cut the next time they're requested. Every drop
+   also bumps a counter in the file, and a tile is only stored if the
+   counter hasn't moved since it started being cut, so a tile cut from
+   story counts read just before a write commits isn't cached.
+
+The layer is called "administrative" and carries `iso_a2` and `level`, like
+the MapTiler countries tiles the frontend used before, so the existing map
+layers work unchanged.
+"""
+
+import gzip
+import json
+import math
+import os
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+
+from app.models import models
+
+EXTENT = 4096  # Tile coordinate space
+BUFFER = 64  # Extra tile units drawn around each tile so borders don't show seams
+LAYER_NAME = "administrative"
+DEFAULT_MAX_ZOOM = 6
+SIMPLIFY_PIXELS = 0.5  # Simplification tolerance, in 256px-tile pixels
+MAX_LATITUDE = 85.0511287798
+
+MBTILES_PATH = os.getenv("TILES_MBTILES_PATH", "./tiles.mbtiles")
+
+# Open connections to the file kept for reuse between uses
+MAX_IDLE_CONNECTIONS = 8
+
+
+# === PROJECTION AND TILE MATH ===
+# "World" coordinates are Web Mercator scaled to 0..1, with y pointing down.
+
+def lnglat_to_world(lon: float, lat: float) -> Tuple[float, float]:
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return x, y
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: float = 0.0) -> Tuple[float, float, float, float]:
+    """World bounds of a tile, optionally grown by `buffer` tile units on each side."""
+    n = 1 << z
+    pad = buffer / EXTENT / n
+    return x / n - pad, y / n - pad, (x + 1) / n + pad, (y + 1) / n + pad
+
+
+def tiles_for_bbox(bbox: Tuple[float, float, float, float], z: int) -> Iterable[Tuple[int, int]]:
+    """Every tile at zoom z that touches a world bounding box."""
+    n = 1 << z
+    min_x, min_y, max_x, max_y = bbox
+    for x in range(max(0, int(min_x * n)), min(n - 1, int(max_x * n)) + 1):
+        for y in range(max(0, int(min_y * n)), min(n - 1, int(max_y * n)) + 1):
+            yield x, y
+
+
+# === GEOMETRY ===
+
+def simplify_ring(ring: List[Tuple[float, float]], tolerance: float) -> List[Tuple[float, float]]:
+    """Douglas-Peucker simplification of a closed ring (first point == last point)."""
+    if len(ring) <= 4:
+        return ring
+    sq_tolerance = tolerance * tolerance
+
+    # Cheap first pass: drop points closer than the tolerance to the last kept
+    # one, so Douglas-Peucker has far fewer points to work on at low zooms
+    last_x, last_y = ring[0]
+    nearby_removed = [ring[0]]
+    for point in ring[1:-1]:
+        dx, dy = point[0] - last_x, point[1] - last_y
+        if dx * dx + dy * dy > sq_tolerance:
+            nearby_removed.append(point)
+            last_x, last_y = point
+    nearby_removed.append(ring[-1])
+    ring = nearby_removed
+    if len(ring) <= 4:
+        return ring
+
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, 0
+        a, b = ring[first], ring[last]
+        ax, ay = a
+        dx, dy = b[0] - ax, b[1] - ay
+        length = dx * dx + dy * dy
+        for i in range(first + 1, last):
+            px, py = ring[i]
+            if length:
+                # Distance to the segment a-b (inlined: this loop is the hot path)
+                t = ((px - ax) * dx + (py - ay) * dy) / length
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                ex, ey = px - ax - dx * t, py - ay - dy * t
+            else:
+                ex, ey = px - ax, py - ay
+            distance = ex * ex + ey * ey
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if max_distance > sq_tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(ring, keep) if kept]
+
+
+def clip_ring(ring: List[Tuple[float, float]], bounds) -> List[Tuple[float, float]]:
+    """Sutherland-Hodgman clip of a ring to a rectangle. Returns an open ring."""
+    min_x, min_y, max_x, max_y = bounds
+    points = ring[:-1] if len(ring) > 1 and ring[0] == ring[-1] else ring
+    edges = (
+        (lambda p: p[0] >= min_x, lambda a, b: (min_x, a[1] + (b[1] - a[1]) * (min_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[0] <= max_x, lambda a, b: (max_x, a[1] + (b[1] - a[1]) * (max_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[1] >= min_y, lambda a, b: (a[0] + (b[0] - a[0]) * (min_y - a[1]) / (b[1] - a[1]), min_y)),
+        (lambda p: p[1] <= max_y, lambda a, b: (a[0] + (b[0] - a[0]) * (max_y - a[1]) / (b[1] - a[1]), max_y)),
+    )
+    for inside, intersect in edges:
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        previous_inside = inside(previous)
+        for point in points:
+            point_inside = inside(point)
+            if point_inside != previous_inside:
+                clipped.append(intersect(previous, point))
+            if point_inside:
+                clipped.append(point)
+            previous, previous_inside = point, point_inside
+        points = clipped
+    return points
+
+
+def _ring_area(ring) -> float:
+    """Signed area via the surveyor's formula (positive = clockwise with y down)."""
+    area = 0
+    for i in range(len(ring)):
+        x1, y1 = ring[i - 1]
+        x2, y2 = ring[i]
+        area += x1 * y2 - x2 * y1
+    return area / 2
+
+
+def _to_tile_ring(ring, z: int, x: int, y: int, exterior: bool) -> Optional[List[Tuple[int, int]]]:
+    """Quantize an open ring to tile coordinates and give it the winding MVT expects."""
+    n = 1 << z
+    points = []
+    for wx, wy in ring:
+        point = (round((wx * n - x) * EXTENT), round((wy * n - y) * EXTENT))
+        if not points or point != points[-1]:
+            points.append(point)
+    while len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        return None
+    area = _ring_area(points)
+    if area == 0:
+        return None
+    if (area > 0) != exterior:
+        points.reverse()
+    return points
+
+
+# === MVT (PROTOBUF) ENCODING ===
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 31)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _varint((field << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int) and value >= 0:
+        return _varint_field(5, value)
+    if isinstance(value, float):
+        return _varint((3 << 3) | 1) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def _encode_geometry(rings: List[List[Tuple[int, int]]]) -> List[int]:
+    geometry = []
+    cursor_x = cursor_y = 0
+    for ring in rings:
+        x, y = ring[0]
+        geometry += [(1 << 3) | 1, _zigzag(x - cursor_x), _zigzag(y - cursor_y)]  # MoveTo
+        cursor_x, cursor_y = x, y
+        geometry.append(((len(ring) - 1) << 3) | 2)  # LineTo
+        for x, y in ring[1:]:
+            geometry += [_zigzag(x - cursor_x), _zigzag(y - cursor_y)]
+            cursor_x, cursor_y = x, y
+        geometry.append((1 << 3) | 7)  # ClosePath
+    return geometry
+
+
+def encode_tile(features: List[Tuple[dict, List[List[Tuple[int, int]]]]]) -> bytes:
+    """Encode (properties, polygon rings) pairs as a one-layer vector tile."""
+    keys: Dict[str, int] = {}
+    values: Dict[object, int] = {}
+    encoded_features = []
+    for properties, rings in features:
+        tags = []
+        for key, value in properties.items():
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        feature = (
+            _bytes_field(2, b"".join(_varint(tag) for tag in tags))
+            + _varint_field(3, 3)  # POLYGON
+            + _bytes_field(4, b"".join(_varint(n) for n in _encode_geometry(rings)))
+        )
+        encoded_features.append(_bytes_field(2, feature))
+
+    layer = (
+        _varint_field(15, 2)  # version
+        + _bytes_field(1, LAYER_NAME.encode("utf-8"))
+        + b"".join(encoded_features)
+        + b"".join(_bytes_field(3, key.encode("utf-8")) for key in keys)
+        + b"".join(_bytes_field(4, _encode_value(value)) for _, value in values)
+        + _varint_field(5, EXTENT)
+    )
+    return _bytes_field(3, layer)
+
+
+# === SOURCE GEOMETRY ===
+
+def _feature_code(properties: dict) -> Optional[str]:
+    # Natural Earth uses -99 in ISO_A2 for a few countries (e.g. France) and
+    # puts the usable code in ISO_A2_EH
+    for key in ("iso_a2", "ISO_A2", "ISO_A2_EH", "iso_a2_eh"):
+        code = properties.get(key)
+        if code and code != "-99":
+            return str(code).upper()
+    return None
+
+
+def read_geojson(path: str) -> List[dict]:
+    """Country features from a GeoJSON file, projected to world coordinates."""
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+
+    features = []
+    for feature in collection.get("features", []):
+        properties = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        code = _feature_code(properties)
+        if not code or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        projected = [[[lnglat_to_world(lon, lat) for lon, lat, *_ in ring] for ring in polygon]
+                     for polygon in polygons]
+        xs = [x for polygon in projected for x, _ in polygon[0]]
+        ys = [y for polygon in projected for _, y in polygon[0]]
+        features.append({
+            "code": code,
+            "name": properties.get("name") or properties.get("NAME") or properties.get("ADMIN") or code,
+            "bbox": (min(xs), min(ys), max(xs), max(ys)),
+            "polygons": projected,
+        })
+    return features
+
+
+# === MBTILES CACHE ===
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+-- Country geometry the tiles are cut from (world coordinates, as JSON)
+CREATE TABLE IF NOT EXISTS source_features (
+    code TEXT PRIMARY KEY, name TEXT,
+    min_x REAL, min_y REAL, max_x REAL, max_y REAL, polygons TEXT
+);
+-- Which countries each cached tile contains, so changes only drop those tiles
+CREATE TABLE IF NOT EXISTS tile_countries (
+    code TEXT, zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER,
+    PRIMARY KEY (code, zoom_level, tile_column, tile_row)
+);
+"""
+
+
+def _read_generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM metadata WHERE name = 'generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def _bump_generation(conn: sqlite3.Connection):
+    conn.execute(
+        "INSERT INTO metadata VALUES ('generation', '1') "
+        "ON CONFLICT (name) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+    )
+
+
+def _tms_row(z: int, y: int) -> int:
+    # MBTiles stores rows bottom-up (TMS), XYZ URLs count top-down
+    return (1 << z) - 1 - y
+
+
+class TileCache:
+    """An MBTiles file holding both the source country geometry and the cut tiles."""
+
+    def __init__(self, path: str = MBTILES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._features: Optional[List[dict]] = None
+        self._simplified: Dict[Tuple[str, int], list] = {}
+        self._max_zoom: Optional[int] = None
+        # Connections not in use right now, all to _idle_path
+        self._pool_lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_path: Optional[str] = None
+        self._schema_ready: Set[str] = set()
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        A connection to the file, for the length of a `with` block, which is
+        one transaction. Connections are reused, and closed when the path
+        changes or there are MAX_IDLE_CONNECTIONS idle already.
+        """
+        path = self.path
+        conn = None
+        with self._pool_lock:
+            if self._idle_path != path:
+                self._close_idle()
+                self._idle_path = path
+            if self._idle:
+                conn = self._idle.pop()
+        if conn is None:
+            # Only one thread uses it at a time, but not always the same one
+            conn = sqlite3.connect(path, check_same_thread=False)
+            if path not in self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready.add(path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            with self._pool_lock:
+                if self._idle_path == path and len(self._idle) < MAX_IDLE_CONNECTIONS:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """Close the connections not in use (those in use are closed when they're done, if the path changed)."""
+        with self._pool_lock:
+            self._close_idle()
+
+    def _close_idle(self):
+        # With _pool_lock held
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+    @property
+    def available(self) -> bool:
+        """True once build_tiles.py has imported boundaries."""
+        return os.path.exists(self.path) and self.max_zoom is not None
+
+    @property
+    def max_zoom(self) -> Optional[int]:
+        """The highest zoom imported (read once, then kept until forget_geometry())."""
+        if self._max_zoom is None and os.path.exists(self.path):
+            with self.connect() as conn:
+                row = conn.execute("SELECT value FROM metadata WHERE name = 'maxzoom'").fetchone()
+            self._max_zoom = int(row[0]) if row else None
+        return self._max_zoom
+
+    def generation(self) -> int:
+        """How many times tiles have been dropped (see invalidate_countries)."""
+        with self.connect() as conn:
+            return _read_generation(conn)
+
+    # --- building ---
+
+    def import_features(self, features: List[dict], max_zoom: int = DEFAULT_MAX_ZOOM):
+        """Replace the source geometry (and so every cached tile)."""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM tiles")
+            conn.execute("DELETE FROM tile_countries")
+            conn.execute("DELETE FROM source_features")
+            _bump_generation(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO source_features VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(f["code"], f["name"], *f["bbox"], json.dumps(f["polygons"])) for f in features],
+            )
+            conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", [
+                ("name", "The Baking Atlas countries"),
+                ("format", "pbf"),
+                ("minzoom", "0"),
+                ("maxzoom", str(max_zoom)),
+                ("json", json.dumps({"vector_layers": [{
+                    "id": LAYER_NAME,
+                    "fields": {"iso_a2": "String", "name": "String", "level": "Number",
+                               "hasData": "Boolean", "storyCount": "Number"},
+                }]})),
+            ])
+        self.forget_geometry()
+
+    def forget_geometry(self):
+        """Drop the geometry held in memory (and idle connections); it's read from the file again on next use."""
+        with self._lock:
+            self._features = None
+            self._simplified.clear()
+            self._max_zoom = None
+        self.close()
+
+    def all_tiles(self, max_zoom: int) -> List[Tuple[int, int, int]]:
+        """Every tile up to max_zoom that contains part of some country."""
+        tiles = set()
+        for feature in self._load_features():
+            for z in range(max_zoom + 1):
+                for x, y in tiles_for_bbox(feature["bbox"], z):
+                    tiles.add((z, x, y))
+        return sorted(tiles)
+
+    # --- serving ---
+
+    def get_tile(self, db, z: int, x: int, y: int) -> bytes:
+        """The gzipped tile, cut and cached first if needed. b"" means an empty tile."""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, _tms_row(z, y)),
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        # Read before the story counts: a write that commits after this
+        # point moves the generation, and the tile won't be stored
+        generation = self.generation()
+        return self.render_and_store(z, x, y, country_stats(db), generation)
+
+    def render_and_store(self, z: int, x: int, y: int, stats: Dict[str, int],
+                         generation: Optional[int] = None) -> bytes:
+        """
+        Cut a tile and cache it, unless tiles were dropped since `generation`
+        (read before `stats`), in which case it's returned but not stored.
+        """
+        tile, codes = self.render(z, x, y, stats)
+        data = gzip.compress(tile) if codes else b""
+        row = _tms_row(z, y)
+        with self.connect() as conn:
+            # Take the write lock first, so no drop can slip in between the check and the insert
+            conn.execute("BEGIN IMMEDIATE")
+            if generation is not None and _read_generation(conn) != generation:
+                return data
+            conn.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (z, x, row, data))
+            conn.executemany(
+                "INSERT OR REPLACE INTO tile_countries VALUES (?, ?, ?, ?)",
+                [(code, z, x, row) for code in codes],
+            )
+        return data
+
+    def render(self, z: int, x: int, y: int, stats: Dict[str, int]) -> Tuple[bytes, List[str]]:
+        """Cut one tile. `stats` maps the country codes we have content for to their story counts."""
+        clip_bounds = tile_bounds(z, x, y, BUFFER)
+        features = []
+        for feature in self._load_features():
+            min_x, min_y, max_x, max_y = feature["bbox"]
+            if max_x < clip_bounds[0] or min_x > clip_bounds[2] or max_y < clip_bounds[1] or min_y > clip_bounds[3]:
+                continue
+            # Countries that fit inside the tile don't need clipping at all
+            inside = (min_x >= clip_bounds[0] and max_x <= clip_bounds[2]
+                      and min_y >= clip_bounds[1] and max_y <= clip_bounds[3])
+            rings = []
+            for polygon in self._simplified_polygons(feature, z):
+                for i, ring in enumerate(polygon):
+                    clipped = ring[:-1] if inside else clip_ring(ring, clip_bounds)
+                    tile_ring = _to_tile_ring(clipped, z, x, y, exterior=(i == 0))
+                    if tile_ring is None:
+                        if i == 0:
+                            break  # No exterior, so skip the holes too
+                        continue
+                    rings.append(tile_ring)
+            if not rings:
+                continue
+            code = feature["code"]
+            features.append(({
+                "iso_a2": code,
+                "name": feature["name"],
+                "level": 0,
+                "hasData": code in stats,
+                "storyCount": stats.get(code, 0),
+            }, rings))
+        return encode_tile(features), [properties["iso_a2"] for properties, _ in features]
+
+    # --- invalidation ---
+
+    def invalidate_countries(self, codes: Iterable[Optional[str]]):
+        """Drop every cached tile that shows one of these countries."""
+        codes = sorted({code.upper() for code in codes if code})
+        if not codes or not os.path.exists(self.path):
+            return
+        placeholders = ", ".join("?" for _ in codes)
+        with self.connect() as conn:
+            affected = conn.execute(
+                f"SELECT DISTINCT zoom_level, tile_column, tile_row FROM tile_countries "
+                f"WHERE code IN ({placeholders})", codes,
+            ).fetchall()
+            conn.executemany(
+                "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", affected
+            )
+            conn.executemany(
+                "DELETE FROM tile_countries WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", affected
+            )
+            _bump_generation(conn)
+        return len(affected)
+
+    # --- source geometry, loaded once and simplified once per zoom ---
+
+    def _load_features(self) -> List[dict]:
+        if self._features is None:
+            with self._lock:
+                if self._features is None:
+                    with self.connect() as conn:
+                        rows = conn.execute("SELECT * FROM source_features").fetchall()
+                    self._features = [{
+                        "code": code, "name": name, "bbox": (min_x, min_y, max_x, max_y),
+                        "polygons": json.loads(polygons),
+                    } for code, name, min_x, min_y, max_x, max_y, polygons in rows]
+        return self._features
+
+    def _simplified_polygons(self, feature: dict, z: int) -> list:
+        key = (feature["code"], z)
+        polygons = self._simplified.get(key)
+        if polygons is None:
+            # Simplify every zoom at once, from the most detailed down, each
+            # zoom starting from the one above it (which is far fewer points)
+            polygons = [[[tuple(point) for point in ring] for ring in polygon]
+                        for polygon in feature["polygons"]]
+            for zoom in range(max(z, self.max_zoom or 0), -1, -1):
+                tolerance = SIMPLIFY_PIXELS / (256 * (1 << zoom))
+                simplified = []
+                for polygon in polygons:
+                    rings = [simplify_ring(ring, tolerance) for ring in polygon]
+                    if len(rings[0]) >= 4:
+                        simplified.append([ring for ring in rings if len(ring) >= 4])
+                polygons = simplified
+                self._simplified[(feature["code"], zoom)] = polygons
+            polygons = self._simplified[key]
+        return polygons
+
+
+def country_stats(db) -> Dict[str, int]:
+    """Story count per country code, for every country we have content for."""
+    rows = db.query(models.Country.code, func.count(models.story_regions.c.story_id)).outerjoin(
+        models.story_regions, models.story_regions.c.country_id == models.Country.id
+    ).group_by(models.Country.code)
+    return {code.upper(): count for code, count in rows}
+
+
+# One shared cache per process
+tile_cache = TileCache()
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Per-table version counters (the table_versions table).
+
+Write routes call bump() before committing, so the new version is saved
+together with the change. GET routes read the versions of the tables they
+depend on to decide whether a client's cached copy is still current.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+# Where bump() leaves the new versions in session.info, so that
+# app/services/cache_sync.py can tell its own commits from other processes'
+BUMPED_KEY = "bumped_table_versions"
+
+
+def bump(db, *tables: str):
+    """Mark tables as changed (one statement however many tables). Call before db.commit()."""
+    if not tables:
+        return
+    params = {"now": datetime.utcnow()}
+    rows = []
+    for i, name in enumerate(tables):
+        params[f"name{i}"] = name
+        rows.append(f"(:name{i}, 1, :now)")
+    bumped = db.execute(text(
+        f"INSERT INTO table_versions (name, version, updated_at) VALUES {', '.join(rows)} "
+        "ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at "
+        "RETURNING name, version"
+    ), params).all()
+    db.info.setdefault(BUMPED_KEY, {}).update(bumped)
+
+
+def current(db, tables: Iterable[str]) -> Tuple[Dict[str, int], Optional[datetime]]:
+    """({table: version}, when any of them last changed) for a set of tables."""
+    tables = sorted(set(tables))
+    versions = {name: 0 for name in tables}
+    last_modified = None
+    if not tables:
+        return versions, last_modified
+    rows = db.execute(
+        text("SELECT name, version, updated_at FROM table_versions WHERE name IN :names").bindparams(
+            bindparam("names", expanding=True)
+        ),
+        {"names": tables},
+    )
+    for name, version, updated_at in rows:
+        versions[name] = version
+        if isinstance(updated_at, str):
+            updated_at = datetime.fromisoformat(updated_at)
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return versions, last_modified
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+One writer per process: write requests take turns on a single thread.
+
+SQLite lets only one connection write at a time. When several write
+requests arrive together, each on its own pooled connection, they queue
+up inside SQLite's busy timeout and the unlucky ones fail with "database
+is locked". Instead, write routes (see app/routes/writes.py) hand their
+work to this queue, and one background thread runs it:
+
+- Writes that queue up while one runs join its batch (up to
+  WRITE_BATCH_SIZE operations or MAX_BATCH_SECONDS), and the whole batch
+  is one transaction with one commit. Each operation gets its own
+  SAVEPOINT, so one that fails (a 400, a 404...) is rolled back without
+  touching the others, and the route code's own db.commit() just
+  releases it.
+- The queue holds at most WRITE_QUEUE_SIZE operations. When it's full,
+  new writes are turned away straight away (503 with Retry-After)
+  instead of piling up.
+- Each write waits at most WRITE_DEADLINE seconds for its turn. One that
+  hasn't started by then is dropped (503 again); one that has started is
+  always finished.
+
+Several server processes (serve.py) still each have their own writer;
+SQLite's busy timeout sorts those out, between a handful of writers
+instead of every request. WRITE_QUEUE=0 turns the queue off (each write
+request then writes on its own connection, as before).
+"""
+
+import asyncio
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.services.cache_sync import CACHES, PENDING_KEY, cache_sync
+
+ENABLED = os.environ.get("WRITE_QUEUE", "1") != "0"
+MAX_QUEUE = int(os.environ.get("WRITE_QUEUE_SIZE", "64"))
+MAX_BATCH = int(os.environ.get("WRITE_BATCH_SIZE", "32"))
+DEADLINE = float(os.environ.get("WRITE_DEADLINE", "10"))
+
+# A batch stops taking on more writes after this long, so writers in other
+# processes (scripts, other workers) get their turn at SQLite's write lock
+MAX_BATCH_SECONDS = 0.1
+
+# Operations whose wait times the stats are taken from
+RECENT = 1000
+
+
+class WriteQueueFull(Exception):
+    """The queue is full; try again in `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"write queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class WriteTimedOut(Exception):
+    """The write waited past its deadline without starting, and was dropped."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"write not started in time, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    """One queued write: a function to call with a Session, and where its result goes."""
+
+    def __init__(self, engine, session_options: dict, work: Callable[[Session], object]):
+        self.engine = engine
+        self.session_options = session_options
+        self.work = work
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class WriteQueue:
+    """Runs writes one at a time on a background thread, batching them into transactions."""
+
+    def __init__(self, max_queue: int = MAX_QUEUE, max_batch: int = MAX_BATCH, deadline: float = DEADLINE):
+        self.enabled = ENABLED
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._held: Optional[_Job] = None  # Next batch's first job (it needed another database)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self.batches = 0
+            self.operations = 0
+            self.largest_batch = 0
+            self.peak_depth = 0
+            self.rejected = 0
+            self.timed_out = 0
+            self.failed_commits = 0
+            self._waits = deque(maxlen=RECENT)  # Seconds from queued to started
+            self._operation_time = 0.005  # Moving average, seconds per operation
+
+    # === SUBMITTING (request side) ===
+
+    async def run(self, db: Session, work: Callable[[Session], object]):
+        """
+        Run work(session) on the writer thread and return its result.
+
+        `db` is the request's own session; the work gets a session on the
+        writer's connection instead, set up the same way.
+        """
+        job = self.submit(db.get_bind(), {"autoflush": db.autoflush, "expire_on_commit": db.expire_on_commit}, work)
+        db.close()
+        waiting = asyncio.wrap_future(job.future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiting), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            # cancel() only succeeds if the writer hasn't started it
+            if job.future.cancel():
+                with self._stats_lock:
+                    self.timed_out += 1
+                raise WriteTimedOut(self.retry_after())
+            return await waiting
+
+    def submit(self, engine, session_options: dict, work: Callable[[Session], object]) -> _Job:
+        self._ensure_started()
+        job = _Job(engine, session_options, work)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise WriteQueueFull(self.retry_after())
+        with self._stats_lock:
+            self.peak_depth = max(self.peak_depth, self._queue.qsize())
+        return job
+
+    def retry_after(self) -> int:
+        """Whole seconds the queued work should take to clear (at least 1)."""
+        return max(1, math.ceil(self._queue.qsize() * self._operation_time))
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+
+    # === WRITING (writer thread) ===
+
+    def _run(self):
+        while True:
+            first, self._held = self._held or self._queue.get(), None
+            self._run_batch(first)
+
+    def _join_batch(self, batch: List[_Job], started: float) -> Optional[_Job]:
+        """The next queued job, if it can still join this batch (same database, batch not full)."""
+        if len(batch) >= self.max_batch or time.perf_counter() - started > MAX_BATCH_SECONDS:
+            return None
+        try:
+            job = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if job.engine is not batch[0].engine:
+            self._held = job  # Starts the next batch
+            return None
+        return job
+
+    def _run_batch(self, first: _Job):
+        """Run `first` and whatever queues up meanwhile, in one transaction."""
+        started = time.perf_counter()
+        batch = [first]
+        finished = []
+        committed = []  # Table versions the jobs bumped, noted once the batch commits
+        try:
+            with first.engine.connect() as conn:
+                transaction = conn.begin()
+                # pysqlite only starts transactions before INSERT/UPDATE/DELETE,
+                # and releasing a SAVEPOINT outside one would commit it. Begin
+                # explicitly, taking the write lock for the whole batch up front.
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                job = first
+                while job is not None:
+                    self._run_job(conn, job, finished, committed)
+                    job = self._join_batch(batch, started)
+                    if job is not None:
+                        batch.append(job)
+                transaction.commit()
+            for versions in committed:
+                cache_sync.note_commit(versions)
+        except Exception as error:
+            # Nothing in the batch was saved, but the routes already updated
+            # the in-memory indexes as if it had been: rebuild those
+            with self._stats_lock:
+                self.failed_commits += 1
+            for _, invalidate in CACHES:
+                invalidate()
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(error)
+            return
+        finally:
+            self._record_batch(len(batch), time.perf_counter() - started)
+
+        for job, result in finished:
+            job.future.set_result(result)
+
+    def _run_job(self, conn, job: _Job, finished: list, committed: list):
+        # False if the request gave up waiting (see run())
+        if not job.future.set_running_or_notify_cancel():
+            return
+        with self._stats_lock:
+            self._waits.append(time.perf_counter() - job.queued_at)
+        # The route's commit() releases the SAVEPOINT, and a failure rolls back to it
+        session = Session(bind=conn, join_transaction_mode="create_savepoint",
+                          info={PENDING_KEY: committed}, **job.session_options)
+        try:
+            finished.append((job, job.work(session)))
+        except Exception as error:
+            job.future.set_exception(error)
+        finally:
+            session.close()
+
+    def _record_batch(self, size: int, elapsed: float):
+        with self._stats_lock:
+            self.batches += 1
+            self.operations += size
+            self.largest_batch = max(self.largest_batch, size)
+            self._operation_time = 0.9 * self._operation_time + 0.1 * (elapsed / size)
+
+    # === STATS ===
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue,
+                "peak_queue_depth": self.peak_depth,
+                "batches": self.batches,
+                "operations": self.operations,
+                "average_batch_size": round(self.operations / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "failed_commits": self.failed_commits,
+                "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                "wait_ms_p99": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 2) if waits else 0.0,
+            }
+
+
+# One per process
+write_queue = WriteQueue()
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Back up the database while the API keeps running (see app/services/backups.py).
+
+Usage (from the backend folder):
+    python backup_database.py                     # into backups/, keeping the newest 7
+    python backup_database.py --dir /mnt/backups --keep 30
+    python backup_database.py --pages 1000 --sleep 0   # as fast as possible
+
+Each backup is a single baking_atlas-<date>-<time>-<pid>.db file, checked with
+PRAGMA integrity_check. To restore one, stop the API and copy it over
+baking_atlas.db (deleting any baking_atlas.db-wal and -shm files).
+The API can also start one: POST /api/admin/backups with ADMIN_TOKEN set.
+"""
+
+import argparse
+import os
+import time
+
+from app.database.database import file_engine
+from app.services import backups
+
+
+def backup_database(backup_dir: str, keep: int, pages: int, sleep: float):
+    source = file_engine.url.database
+    print("=" * 60)
+    print(f"Backing up {source} into {backup_dir}/...")
+    print("=" * 60)
+
+    reported = [0]
+
+    def progress(done, total):
+        # About every 10%
+        if total and done * 10 // total > reported[0]:
+            reported[0] = done * 10 // total
+            print(f"  {done}/{total} pages")
+
+    started = time.perf_counter()
+    try:
+        path = backups.backup(source, backup_dir, keep, pages, sleep, progress)
+    except backups.BackupFailed as error:
+        print(f"✗ {error}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    print(f"✓ {path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB in {elapsed:.1f}s, integrity check ok")
+    print(f"  {len(backups.list_backups(backup_dir))} backups kept")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up the database while the API keeps running")
+    parser.add_argument("--dir", default=backups.BACKUP_DIR, help=f"backup folder (default: {backups.BACKUP_DIR})")
+    parser.add_argument("--keep", type=int, default=backups.KEEP, help=f"backups to keep (default: {backups.KEEP})")
+    parser.add_argument("--pages", type=int, default=backups.PAGES_PER_STEP,
+                        help=f"pages copied per step (default: {backups.PAGES_PER_STEP})")
+    parser.add_argument("--sleep", type=float, default=backups.STEP_SLEEP,
+                        help=f"seconds to pause between steps (default: {backups.STEP_SLEEP})")
+    args = parser.parse_args()
+    backup_database(args.dir, args.keep, args.pages, args.sleep)
\ No newline at end of file
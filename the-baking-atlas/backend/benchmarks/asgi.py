@@ -0,0 +1,36 @@
+"""
+A tiny in-process HTTP client for the benchmarks.
+
+Calls an ASGI app directly (no server, no extra packages) and returns
+(status, headers, body).
+"""
+
+import json
+
+
+async def request(app, method, url, headers=None, body=None):
+    path, _, query = url.partition("?")
+    headers = dict(headers or {})
+    payload = b""
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers["content-type"] = "application/json"
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("bench", 0), "server": ("bench", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    response_body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], response_headers, response_body
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Benchmark for online backups (app/services/backups.py): how much they slow
+down the API while they run.
+
+Generates a scratch database in WAL mode (as serve.py runs it), then runs
+a mix of public read requests with 16 concurrent clients while a writer
+thread keeps inserting rows, three times:
+
+- with no backup running,
+- during a throttled backup (the defaults: BACKUP_PAGES_PER_STEP pages per
+  step, BACKUP_STEP_SLEEP seconds between steps),
+- during an unthrottled backup (the whole file in one step).
+
+It prints read throughput and latency, the writer's throughput and lock
+errors, how long each backup took, and how many of the writer's rows each
+backup holds: as many as there were when it started, since it copies
+one snapshot.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_backup            # 3000 generated stories
+    python -m benchmarks.bench_backup 10000
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.services import backups
+from benchmarks.bench_memory_snapshot import CONCURRENCY, make_app, percentile, run_requests
+from benchmarks.report_text_storage import populate, workload
+
+_tag_numbers = itertools.count()  # Unique tag names across all the writer's runs
+
+
+def writer(path, stop, counts):
+    """Inserts a tag at a time, like a stream of small edits."""
+    conn = sqlite3.connect(path, timeout=5)
+    while not stop.is_set():
+        try:
+            with conn:
+                conn.execute("INSERT INTO tags (name) VALUES (?)", (f"written-{next(_tag_numbers)}",))
+            counts["writes"] += 1
+        except sqlite3.OperationalError:
+            counts["locked"] += 1
+        time.sleep(0.002)
+    conn.close()
+
+
+def run_phase(app, path, urls, backup_options, backup_dir):
+    """Reads and writes for as long as a backup takes (or a fixed round, with no backup)."""
+    stop = threading.Event()
+    counts = {"writes": 0, "locked": 0}
+    write_thread = threading.Thread(target=writer, args=(path, stop, counts))
+    write_thread.start()
+    result = {}
+
+    async def run():
+        latencies = []
+        started = time.perf_counter()
+        if backup_options is None:
+            latencies.extend(sum((await run_requests(app, urls, CONCURRENCY)).values(), []))
+        else:
+            with sqlite3.connect(path) as conn:
+                result["tags_at_start"] = conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+            task = asyncio.create_task(asyncio.to_thread(backups.backup, path, backup_dir, 10, **backup_options))
+            while not task.done():
+                latencies.extend(sum((await run_requests(app, urls[:100], CONCURRENCY)).values(), []))
+            result["backup"] = await task
+            result["backup_seconds"] = time.perf_counter() - started
+            with sqlite3.connect(path) as conn:
+                result["tags_at_end"] = conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+        return latencies, time.perf_counter() - started
+
+    try:
+        latencies, elapsed = asyncio.run(run())
+    finally:
+        stop.set()
+        write_thread.join()
+
+    result.update({
+        "reads_per_second": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "writes_per_second": counts["writes"] / elapsed,
+        "locked": counts["locked"],
+    })
+    if "backup" in result:
+        with sqlite3.connect(result["backup"]) as conn:
+            result["tags_in_backup"] = conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        print(f"generating {n:,} stories ...")
+        populate(engine, n)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+        urls = workload(slugs, codes, random.Random(2))
+        print(f"database file {os.path.getsize(path) / 1024 / 1024:.1f} MB\n")
+
+        app = make_app(engine)
+        asyncio.run(run_requests(app, urls[:250], 1))  # Warm up
+        backup_dir = os.path.join(tmp, "backups")
+        phases = {
+            "no backup": run_phase(app, path, urls, None, backup_dir),
+            "throttled backup": run_phase(app, path, urls, {}, backup_dir),
+            "one-step backup": run_phase(app, path, urls, {"pages": -1, "sleep": 0}, backup_dir),
+        }
+        engine.dispose()
+
+    print(f"{CONCURRENCY} readers and a writer, during:")
+    print(f"  {'':<18} {'reads/s':>8} {'p50':>9} {'p99':>9} {'writes/s':>9} {'locked':>7} {'backup':>8}")
+    for name, r in phases.items():
+        took = f"{r['backup_seconds']:.1f}s" if "backup" in r else "-"
+        print(f"  {name:<18} {r['reads_per_second']:>8.0f} {r['p50']:>7.1f}ms {r['p99']:>7.1f}ms "
+              f"{r['writes_per_second']:>9.0f} {r['locked']:>7} {took:>8}")
+    print()
+    for name, r in phases.items():
+        if "backup" in r:
+            print(f"{name}: {r['tags_in_backup']} tags in the backup; the database had "
+                  f"{r['tags_at_start']} when it started and {r['tags_at_end']} when it finished")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
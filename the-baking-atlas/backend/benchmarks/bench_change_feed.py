@@ -0,0 +1,154 @@
+"""
+Benchmark for the change feed (app/services/change_log.py,
+app/routes/changes.py): what it costs a client to stay in step with the
+atlas, with and without it.
+
+Generates a scratch database, has a client fetch every story and country
+page, then edits a few stories and:
+
+- re-fetches everything, as a client without a change feed must, or
+- pulls GET /api/changes?since=<cursor> and re-fetches only what it names.
+
+It prints requests, bytes and time for each. Then, with an event stream
+open (GET /api/changes/stream), it edits one story at a time and prints
+how long each change took to arrive.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_change_feed          # 3000 generated stories, 20 edits
+    python -m benchmarks.bench_change_feed 10000 50
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.routes import changes
+from app.services.change_log import POLL_INTERVAL, change_feed
+from benchmarks.asgi import request
+from benchmarks.bench_memory_snapshot import make_app, percentile
+from benchmarks.report_text_storage import populate
+
+ENTITY_URLS = {"country": "/api/countries/{}", "story": "/api/stories/{}"}
+
+
+async def fetch_all(app, urls):
+    """(requests, bytes) for GETting every url."""
+    total = 0
+    for url in urls:
+        status, _, body = await request(app, "GET", url)
+        assert status == 200, (url, status)
+        total += len(body)
+    return len(urls), total
+
+
+async def pull_changes(app, cursor):
+    """(requests, bytes) for catching up from a cursor, re-fetching what changed."""
+    requests, total, refetch = 0, 0, {}
+    while True:
+        _, _, body = await request(app, "GET", f"/api/changes?since={cursor}")
+        requests, total = requests + 1, total + len(body)
+        page = json.loads(body)
+        for change in page["changes"]:
+            if change["entity"] in ENTITY_URLS:
+                refetch[(change["entity"], change["entity_id"])] = None if change["deleted"] else change["ref"]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    urls = [ENTITY_URLS[entity].format(ref) for (entity, _), ref in refetch.items() if ref is not None]
+    fetched, fetched_bytes = await fetch_all(app, urls)
+    return requests + fetched, total + fetched_bytes
+
+
+async def stream_latency(app, slugs, edits):
+    """Seconds from each edit's response to its event arriving on an open stream."""
+    arrived = asyncio.Queue()
+    disconnect = asyncio.Event()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/changes/stream", "raw_path": b"/api/changes/stream",
+        "query_string": b"", "root_path": "", "headers": [], "client": ("bench", 0), "server": ("bench", 80),
+    }
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if b"event: change" in message.get("body", b""):
+            arrived.put_nowait(time.perf_counter())
+
+    stream = asyncio.create_task(app(scope, receive, send))
+    await asyncio.sleep(0.5)  # Let it start
+    latencies = []
+    for i, slug in enumerate(slugs[:edits]):
+        await request(app, "PUT", f"/api/stories/{slug}", body={"sources": f"stream edit {i}"})
+        edited = time.perf_counter()
+        latencies.append(await asyncio.wait_for(arrived.get(), 10) - edited)
+        await asyncio.sleep(random.random() * 0.3)  # Edits don't line up with the feed's polls
+    disconnect.set()
+    await stream
+    return latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(4)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        print(f"generating {n:,} stories ...")
+        populate(engine, n)
+        with engine.connect() as conn:
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+        everything = [f"/api/stories/{slug}" for slug in slugs] + [f"/api/countries/{code}" for code in codes]
+
+        app = make_app(engine)
+        app.include_router(changes.router)
+
+        async def sync():
+            _, _, body = await request(app, "GET", "/api/changes")
+            cursor = json.loads(body)["cursor"]
+            await fetch_all(app, everything)  # The client's first full copy
+            for slug in rng.sample(slugs, edits):
+                status, _, _ = await request(app, "PUT", f"/api/stories/{slug}", body={"summary": "Edited"})
+                assert status == 200, status
+            results = {}
+            for name, catch_up in (("re-fetch everything", lambda: fetch_all(app, everything)),
+                                   ("change feed", lambda: pull_changes(app, cursor))):
+                started = time.perf_counter()
+                requests, size = await catch_up()
+                results[name] = (requests, size, time.perf_counter() - started)
+            return results
+
+        results = asyncio.run(sync())
+        change_feed.start(engine)
+        try:
+            latencies = asyncio.run(stream_latency(app, rng.sample(slugs, edits), edits))
+        finally:
+            change_feed.stop()
+        engine.dispose()
+
+    print(f"\ncatching up after {edits} story edits ({len(everything):,} stories and countries held):")
+    print(f"  {'':<20} {'requests':>9} {'bytes':>12} {'time':>9}")
+    for name, (requests, size, seconds) in results.items():
+        print(f"  {name:<20} {requests:>9,} {size:>12,} {seconds * 1000:>7.0f}ms")
+    print(f"\nevent stream, {edits} edits: change arrived after p50 {percentile(latencies, 0.5):.0f}ms, "
+          f"max {max(latencies) * 1000:.0f}ms (feed polls every {POLL_INTERVAL}s)")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
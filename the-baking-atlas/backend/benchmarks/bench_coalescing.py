@@ -0,0 +1,128 @@
+"""
+Benchmark for single-flight GET requests (app/routes/coalescing.py).
+
+Fires bursts of identical concurrent requests, like a story linked from
+somewhere busy, with and without the coalescing middleware:
+
+- GET /api/stories/{slug} for a long story (a sync route, run in the
+  thread pool)
+- GET /bench/async, an async route that awaits 20ms of "work"
+
+For each it prints how long the burst took, latency, how many SQL
+statements ran (or how many times the async route ran), and the
+middleware's counts.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_coalescing          # bursts of 200
+    python -m benchmarks.bench_coalescing 500
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.routes import stories
+from app.routes.coalescing import CoalescingMiddleware, CoalescingStats
+from benchmarks.asgi import request
+from benchmarks.report_text_storage import populate
+
+
+def make_app(engine, coalesce, stats, async_runs):
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+
+    @app.get("/bench/async")
+    async def slow_async():
+        async_runs[0] += 1
+        await asyncio.sleep(0.02)
+        return {"runs": async_runs[0]}
+
+    if coalesce:
+        app.add_middleware(CoalescingMiddleware, stats=stats)
+    return app
+
+
+async def burst(app, url, clients):
+    latencies = []
+
+    async def client():
+        start = time.perf_counter()
+        status, _, _ = await request(app, "GET", url)
+        latencies.append(time.perf_counter() - start)
+        assert status == 200, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed * 1000, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                               pool_size=clients, max_overflow=0)
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate(engine, 200)
+        with engine.connect() as conn:
+            # The longest story: the most work per request
+            slug, size = conn.exec_driver_sql(
+                "SELECT slug, length(body) FROM stories ORDER BY length(body) DESC LIMIT 1"
+            ).one()
+
+        statements = [0]
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+        rows = []
+        for coalesce in (False, True):
+            stats = CoalescingStats()
+            async_runs = [0]
+            app = make_app(engine, coalesce, stats, async_runs)
+            asyncio.run(burst(app, f"/api/stories/{slug}", 5))  # Warm up
+
+            statements[0] = 0
+            sync_result = asyncio.run(burst(app, f"/api/stories/{slug}", clients))
+            sync_statements = statements[0]
+            async_runs[0] = 0
+            async_result = asyncio.run(burst(app, "/bench/async", clients))
+            rows.append((coalesce, sync_result, sync_statements, async_result, async_runs[0], stats.as_dict()))
+        engine.dispose()
+
+    print(f"bursts of {clients} identical requests (story body {size / 1024:.0f} KB)\n")
+    print(f"{'':<22} {'burst':>9} {'p50':>9} {'p99':>9}  work done")
+    for coalesce, sync_result, sync_statements, async_result, async_count, stats in rows:
+        mode = "coalesced" if coalesce else "each on its own"
+        print(f"{'story, ' + mode:<22} " + " ".join(f"{value:>7.0f}ms" for value in sync_result)
+              + f"  {sync_statements} SQL statements")
+        print(f"{'async, ' + mode:<22} " + " ".join(f"{value:>7.0f}ms" for value in async_result)
+              + f"  {async_count} route runs")
+        if coalesce:
+            print(f"\nmiddleware counts: {stats}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Benchmark for conditional GETs (app/routes/conditional.py).
+
+Fills a scratch database with N countries (with baked goods and
+ingredients) and stories, then requests a few typical URLs twice: once
+cold (200 with the full body) and once revalidating with If-None-Match
+(304). Prints bytes on the wire and latency for both.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_conditional          # 200 countries, 2000 stories
+    python -m benchmarks.bench_conditional 50 500
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.models import models
+from app.routes import countries, stories
+from app.routes.ingredients import get_or_create_canonical_ingredient
+from benchmarks.asgi import request
+
+ROUNDS = 200
+
+
+def populate(engine, country_count, story_count):
+    rng = random.Random(7)
+    session = sessionmaker(bind=engine)()
+    canonical_ids = [get_or_create_canonical_ingredient(session, f"Ingredient {i}").id for i in range(300)]
+    session.commit()
+    session.close()
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Country), [
+            {"id": i, "name": f"Country {i}", "code": f"C{i}", "region": "Testland",
+             "overview": "Baking culture. " * 40}
+            for i in range(1, country_count + 1)
+        ])
+        conn.execute(insert(models.BakedGood), [
+            {"country_id": i, "name": f"Bake {i}-{j}", "category": "bread", "description": "A bake. " * 20}
+            for i in range(1, country_count + 1) for j in range(30)
+        ])
+        conn.execute(insert(models.Ingredient), [
+            {"country_id": i, "canonical_id": canonical_id, "description": "Used a lot."}
+            for i in range(1, country_count + 1) for canonical_id in rng.sample(canonical_ids, 20)
+        ])
+        conn.execute(insert(models.Story), [
+            {"id": i, "title": f"Story {i}", "slug": f"story-{i}", "summary": "Summary. " * 10,
+             "body": "Paragraph of story text. " * 200, "time_context": "modern"}
+            for i in range(1, story_count + 1)
+        ])
+        conn.execute(insert(models.story_regions), [
+            {"story_id": i, "country_id": rng.randint(1, country_count)} for i in range(1, story_count + 1)
+        ])
+
+
+def wire_size(headers, body):
+    # Status line + headers + body, roughly as sent over HTTP/1.1
+    return 17 + sum(len(k) + len(v) + 4 for k, v in headers.items()) + 2 + len(body)
+
+
+async def run(app, urls):
+    print(f"{'url':<34} {'200 bytes':>10} {'304 bytes':>10} {'200 p50':>9} {'304 p50':>9}")
+    for url in urls:
+        full, revalidated = [], []
+        status, headers, body = await request(app, "GET", url)
+        assert status == 200, (url, status)
+        etag = headers["etag"]
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            status, headers, body = await request(app, "GET", url)
+            full.append(time.perf_counter() - started)
+            full_size = wire_size(headers, body)
+
+            started = time.perf_counter()
+            status, not_modified_headers, empty = await request(app, "GET", url, {"If-None-Match": etag})
+            revalidated.append(time.perf_counter() - started)
+            assert status == 304, (url, status)
+            not_modified_size = wire_size(not_modified_headers, empty)
+        print(f"{url:<34} {full_size:>10,} {not_modified_size:>10,} "
+              f"{statistics.median(full) * 1000:>7.2f}ms {statistics.median(revalidated) * 1000:>7.2f}ms")
+
+
+def main(country_count=200, story_count=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate(engine, country_count, story_count)
+        Session = sessionmaker(bind=engine)
+
+        def bench_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        app.include_router(countries.router)
+        app.include_router(stories.router)
+        app.dependency_overrides[get_db] = bench_db
+
+        asyncio.run(run(app, [
+            "/api/countries/",
+            "/api/countries/C1",
+            "/api/stories/",
+            "/api/stories/?limit=20",
+            "/api/stories/story-1",
+        ]))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Benchmark for syncing the content folder (app/services/content_sync.py).
+
+Writes a generated content folder the size of a full atlas (200
+countries with 10 baked goods and 10 ingredients each, N stories with
+long bodies, 300 tags) and syncs it into a scratch database. Then it
+times:
+
+- the first sync, which inserts everything,
+- a sync with nothing changed (the usual case),
+- a sync after editing one story's body and one baked good,
+- a sync with --full, which rewrites every record the way reseeding the
+  whole database used to.
+
+For each one it prints how long it took and how many SQL statements it
+sent and rows it changed.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_content_sync          # 3000 stories
+    python -m benchmarks.bench_content_sync 10000
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.services import content_sync
+from benchmarks.report_text_storage import sentence, story_body
+
+
+def write_content(content_dir, n):
+    rng = random.Random(3)
+    codes = [f"{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(200)]
+    os.makedirs(os.path.join(content_dir, "countries"))
+    os.makedirs(os.path.join(content_dir, "stories"))
+    with open(os.path.join(content_dir, "tags.json"), "w") as f:
+        json.dump([{"name": f"tag-{i}", "tag_type": "theme"} for i in range(300)], f)
+    for code in codes:
+        country = {
+            "code": code, "name": f"Country {code}", "region": "Testland",
+            "overview": " ".join(sentence(rng) for _ in range(8)),
+            "baked_goods": [{"name": f"Loaf {k}", "description": sentence(rng), "category": "bread",
+                             "extra_data": {"texture": "crispy"}} for k in range(10)],
+            "ingredients": [{"name": f"Ingredient {code} {k}", "description": sentence(rng)} for k in range(10)],
+        }
+        with open(os.path.join(content_dir, "countries", f"{code}.json"), "w") as f:
+            json.dump(country, f, indent=2)
+    for i in range(n):
+        story = {"title": f"Story {i}", "summary": sentence(rng), "time_context": "modern",
+                 "regions": rng.sample(codes, 2), "tags": [f"tag-{rng.randrange(300)}" for _ in range(3)],
+                 "extra_data": {"lat": rng.uniform(-60, 70), "lng": rng.uniform(-170, 170)}}
+        with open(os.path.join(content_dir, "stories", f"story-{i}.json"), "w") as f:
+            json.dump(story, f, indent=2)
+        with open(os.path.join(content_dir, "stories", f"story-{i}.md"), "w") as f:
+            f.write(story_body(rng))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        print(f"writing a content folder with {n:,} stories ...")
+        write_content(content_dir, n)
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(content_dir) for name in names)
+        print(f"content folder: {size / 1024 / 1024:.1f} MB\n")
+
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        Session = sessionmaker(bind=engine)
+        counts = {"statements": 0, "rows": 0}
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            counts["statements"] += 1
+            if statement.split()[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+                counts["rows"] += max(cursor.rowcount, 0)
+
+        event.listen(engine, "after_cursor_execute", count)
+
+        def run(label, full=False):
+            counts.update(statements=0, rows=0)
+            with Session() as db:
+                started = time.perf_counter()
+                result = content_sync.sync(db, content_dir, full=full)
+                elapsed = time.perf_counter() - started
+            print(f"{label:<28} {elapsed * 1000:>9.1f}ms {result.changed:>9} {result.unchanged:>10} "
+                  f"{counts['statements']:>11} {counts['rows']:>13}")
+
+        print(f"{'sync':<28} {'time':>11} {'records':>9} {'unchanged':>10} {'statements':>11} {'rows written':>13}")
+        run("first sync (all new)")
+        run("nothing changed")
+        run("nothing changed, again")
+
+        with open(os.path.join(content_dir, "stories", "story-7.md"), "a") as f:
+            f.write("\n\nOne more paragraph.")
+        path = os.path.join(content_dir, "countries", "AB.json")
+        with open(path) as f:
+            country = json.load(f)
+        country["baked_goods"][3]["description"] = "Edited."
+        with open(path, "w") as f:
+            json.dump(country, f, indent=2)
+        run("one story, one baked good")
+        run("--full (like reseeding)", full=True)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+Benchmark for the set-based delete routes.
+
+Fills a scratch database with one country that has N baked goods and N
+ingredients (plus a second, small country), and N stories with map pins
+sharing a tag. Then deletes the big country, the tagged stories (by
+filter) and the tag, printing time and peak Python memory for each.
+Memory should stay flat as N grows: children are removed by SQLite's
+ON DELETE CASCADE, never loaded.
+
+Memory tracing slows Python down, so time and memory are measured in two
+separate runs, each on its own copy of the database.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_deletes            # 50,000 children
+    python -m benchmarks.bench_deletes 200000
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.models import models
+from app.routes import countries, stories
+from app.services import story_pins
+from app.services.story_filter_index import story_filter_index
+from benchmarks.asgi import request
+
+
+def populate(engine, n):
+    rng = random.Random(3)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Country), [
+            {"id": 1, "name": "Bigland", "code": "BG", "region": "Testland"},
+            {"id": 2, "name": "Smallland", "code": "SM", "region": "Testland"},
+        ])
+        conn.execute(insert(models.BakedGood), [
+            {"country_id": 1, "name": f"Bake {i}", "category": "bread", "description": "A bake. " * 10}
+            for i in range(n)
+        ])
+        conn.execute(insert(models.CanonicalIngredient), [
+            {"id": i, "name": f"Ingredient {i}", "normalized_name": f"ingredient {i}"} for i in range(1, n + 1)
+        ])
+        conn.execute(insert(models.Ingredient), [
+            {"country_id": 1, "canonical_id": i, "description": "Used a lot."} for i in range(1, n + 1)
+        ])
+        conn.execute(insert(models.Tag), [{"id": 1, "name": "doomed"}])
+        conn.execute(insert(models.Story), [
+            {"id": i, "title": f"Story {i}", "slug": f"story-{i}", "body": "Story text. " * 50,
+             "time_context": "modern"}
+            for i in range(1, n + 1)
+        ])
+        conn.execute(insert(models.story_regions), [{"story_id": i, "country_id": 2} for i in range(1, n + 1)])
+        conn.execute(insert(models.story_tags), [{"story_id": i, "tag_id": 1} for i in range(1, n + 1)])
+        conn.execute(text("INSERT INTO story_pins VALUES (:id, :lon, :lon, :lat, :lat)"), [
+            {"id": i, "lon": rng.uniform(-180, 180), "lat": rng.uniform(-85, 85)} for i in range(1, n + 1)
+        ])
+        story_pins.rebuild_clusters(conn)
+
+
+DELETES = [
+    ("country with {children:,} children", "/api/countries/BG"),
+    ("{n:,} stories by tag filter", "/api/stories/?tag=doomed"),
+    ("tag (links already gone)", "/api/stories/tags/doomed"),
+]
+
+
+def make_app(engine):
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+    return app
+
+
+async def run_deletes(app, trace_memory):
+    """Each delete's time in seconds, or its peak traced memory in bytes."""
+    # Load the story filter index first (fresh for this database), as a
+    # running server would have
+    story_filter_index.invalidate()
+    await request(app, "GET", "/api/stories/?limit=1")
+    results = []
+    for _, url in DELETES:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        status, _, body = await request(app, "DELETE", url)
+        elapsed = time.perf_counter() - start
+        assert status == 200, (url, status, body)
+        if trace_memory:
+            results.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        else:
+            results.append(elapsed)
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{source}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        print(f"populating: 1 country with {n:,} baked goods and {n:,} ingredients, {n:,} stories ...")
+        populate(engine, n)
+        engine.dispose()
+
+        results = []
+        for trace_memory in (False, True):
+            path = os.path.join(tmp, f"run-{trace_memory}.db")
+            shutil.copy(source, path)
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+            results.append(asyncio.run(run_deletes(make_app(engine), trace_memory)))
+
+            with engine.connect() as conn:
+                left = [conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                        for table in ("baked_goods", "ingredients", "stories", "story_regions", "story_pins")]
+            assert left == [0, 0, 0, 0, 0], left
+            engine.dispose()
+
+        print(f"{'delete':<40} {'time':>10} {'peak memory':>12}")
+        for (description, _), elapsed, peak in zip(DELETES, *results):
+            description = description.format(n=n, children=2 * n)
+            print(f"{description:<40} {elapsed * 1000:>8.1f}ms {peak / 1024:>9.0f} KiB")
+        print("\nall children gone")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Benchmark for extra_data filters (app/routes/filters.py).
+
+Fills a scratch database with N baked goods, then compares an indexed
+attribute (texture) with an unindexed one (flavor), printing the
+SQLite query plan and timings for each.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_extra_filters          # 500,000 baked goods
+    python -m benchmarks.bench_extra_filters 50000
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.database.database import Base
+from app.models import models
+from app.routes.filters import filter_by_extra
+
+TEXTURES = ["crispy", "soft", "flaky", "chewy", "crumbly", "dense", "airy", "gooey"]
+FLAVORS = ["sweet", "savory", "nutty", "buttery", "tangy", "spiced"]
+CATEGORIES = ["bread", "cake", "pastry", "cookie", "bar", "dessert"]
+
+
+def populate(engine, count):
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Country), [{"id": 1, "name": "Testland", "code": "TL"}])
+        batch = []
+        for i in range(count):
+            batch.append({
+                "country_id": 1,
+                "name": f"Baked good {i}",
+                "category": rng.choice(CATEGORIES),
+                "extra_data": {
+                    # Most rows get a unique texture so the indexed lookup is selective
+                    "texture": rng.choice(TEXTURES) if i % 100 == 0 else f"texture {i}",
+                    "flavor": rng.choice(FLAVORS) if i % 100 == 0 else f"flavor {i}",
+                },
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(models.BakedGood), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.BakedGood), batch)
+
+
+def explain(db, query):
+    compiled = query.statement.compile(db.get_bind())
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def time_query(query, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = query.all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2], len(rows)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    path = os.path.join(tempfile.mkdtemp(), "bench_extra_filters.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    start = time.perf_counter()
+    populate(engine, count)
+    print(f"Inserted {count:,} baked goods in {time.perf_counter() - start:.1f}s\n")
+
+    with Session(engine) as db:
+        cases = {
+            "indexed   extra.texture=crispy": {"texture": "crispy"},
+            "unindexed extra.flavor=nutty": {"flavor": "nutty"},
+        }
+        for label, filters in cases.items():
+            query = filter_by_extra(
+                db.query(models.BakedGood).filter(models.BakedGood.category == "bread"),
+                models.BakedGood, filters,
+            )
+            median_ms, found = time_query(query)
+            print(label)
+            print(f"  plan:   {explain(db, query)}")
+            print(f"  median: {median_ms:.2f} ms ({found} rows)\n")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
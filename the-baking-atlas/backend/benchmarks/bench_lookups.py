@@ -0,0 +1,110 @@
+"""
+Microbenchmark for the prebuilt lookups in app/database/repository.py.
+
+Times each lookup three ways, in microseconds per call:
+
+- "query": built on every call with db.query(...).filter(...), the way the
+  routes used to write it,
+- "repository": the prebuilt statement in app/database/repository.py,
+- "sqlite3": the same SQL on a plain sqlite3 connection, the floor for
+  what a lookup can cost.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_lookups           # 3000 generated stories
+    python -m benchmarks.bench_lookups 10000
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer_group
+
+from app.database import repository
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.models import models
+from benchmarks.report_text_storage import populate
+
+CALLS = 5000
+
+
+def per_call(function, values):
+    """Microseconds per call of function(value), over CALLS calls."""
+    for value in values[:200]:
+        function(value)  # Warm up
+    started = time.perf_counter()
+    for i in range(CALLS):
+        function(values[i % len(values)])
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rng = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate(engine, n)
+        with engine.begin() as conn:
+            # Generated stories have no tags
+            conn.exec_driver_sql("INSERT INTO tags (name) VALUES " + ", ".join(f"('tag-{i}')" for i in range(200)))
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+            tags = [name for name, in conn.exec_driver_sql("SELECT name FROM tags")]
+        rng.shuffle(slugs)
+
+        db = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+        raw = sqlite3.connect(path)
+
+        # (lookup, values, query version, repository version, plain SQL)
+        lookups = [
+            ("country by code", codes,
+             lambda code: db.query(models.Country).filter(models.Country.code == code.upper()).first(),
+             lambda code: repository.country_by_code(db, code),
+             "SELECT id, name, code, region, region_id, extra_data FROM countries WHERE code = ?"),
+            ("country id by code", codes,
+             lambda code: db.query(models.Country.id).filter(models.Country.code == code.upper()).first(),
+             lambda code: repository.country_id_by_code(db, code),
+             "SELECT id FROM countries WHERE code = ?"),
+            ("story by slug", slugs,
+             lambda slug: db.query(models.Story).filter(models.Story.slug == slug).options(undefer_group("text")).first(),
+             lambda slug: repository.story_by_slug(db, slug),
+             "SELECT * FROM stories WHERE slug = ?"),
+            ("story id by slug", slugs,
+             lambda slug: db.query(models.Story.id).filter(models.Story.slug == slug).first(),
+             lambda slug: repository.story_id_by_slug(db, slug),
+             "SELECT id FROM stories WHERE slug = ?"),
+            ("tag by name", tags,
+             lambda name: db.query(models.Tag).filter(models.Tag.name == name.lower()).first(),
+             lambda name: repository.tag_by_name(db, name),
+             "SELECT id, name, tag_type FROM tags WHERE name = ?"),
+        ]
+
+        rows = []
+        for name, values, query, prebuilt, sql in lookups:
+            rows.append((
+                name,
+                per_call(query, values),
+                per_call(prebuilt, values),
+                per_call(lambda value: raw.execute(sql, (value,)).fetchone(), values),
+            ))
+        db.close()
+        raw.close()
+        engine.dispose()
+
+    print(f"microseconds per lookup ({CALLS:,} calls each, {n:,} stories)\n")
+    print(f"{'':<20} {'query':>8} {'repository':>11} {'sqlite3':>8}  saved")
+    for name, query, prebuilt, floor in rows:
+        print(f"{name:<20} {query:>8.0f} {prebuilt:>11.0f} {floor:>8.0f}  {1 - prebuilt / query:.0%}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
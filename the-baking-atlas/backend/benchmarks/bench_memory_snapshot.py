@@ -0,0 +1,209 @@
+"""
+Benchmark for serving from an in-memory copy of the database
+(app/database/snapshot.py) against the usual file-backed engine.
+
+Generates a scratch database (or copies one given as a path), then runs
+the same mix of public read requests (story lists and pages, country
+lists and pages) through both engines, one client at a time and with 16
+concurrent clients, printing latency per kind of request. Finally it
+times loading a copy, and the worst request latency while a story is
+edited in the file and a new copy swapped in, once a second, under load.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py). The file is
+in the OS's file cache throughout, so the difference is SQLite's own
+reading work (page cache misses, file locking), not disk speed.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_memory_snapshot                 # 3000 generated stories
+    python -m benchmarks.bench_memory_snapshot 10000
+    python -m benchmarks.bench_memory_snapshot baking_atlas.db
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.database.snapshot import Snapshot
+from app.models import models
+from app.routes import countries, stories
+from app.services import versions
+from app.services.cache_sync import CACHES, CacheSync
+from benchmarks.asgi import request
+from benchmarks.report_text_storage import populate, workload
+
+CONCURRENCY = 16
+
+
+def make_app(engine):
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+    return app
+
+
+def kind(url):
+    path = url.split("?")[0]
+    if path == "/api/stories/":
+        return "story list"
+    if path == "/api/countries/":
+        return "country list"
+    return "country page" if path.startswith("/api/countries/") else "story page"
+
+
+async def run_requests(app, urls, clients):
+    """{kind: [seconds]} for the requests, shared out between `clients` concurrent clients."""
+    latencies = {}
+
+    async def client(number):
+        for url in urls[number::clients]:
+            start = time.perf_counter()
+            status, _, _ = await request(app, "GET", url)
+            latencies.setdefault(kind(url), []).append(time.perf_counter() - start)
+            assert status == 200, url
+
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return latencies
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def measure(engine, urls):
+    app = make_app(engine)
+    for _, invalidate in CACHES:
+        invalidate()
+    asyncio.run(run_requests(app, urls[:len(urls) // 4], 1))  # Warm up
+    results = {}
+    for clients in (1, CONCURRENCY):
+        start = time.perf_counter()
+        latencies = asyncio.run(run_requests(app, urls, clients))
+        results[clients] = (latencies, len(urls) / (time.perf_counter() - start))
+    return results
+
+
+def swap_under_load(path, urls):
+    """
+    (seconds per load, steady p99 ms, worst ms while swapping): one story is
+    edited in the file and a new copy loaded once a second, 5 times, under load.
+    """
+    snapshot = Snapshot(path)
+    engine = create_engine("sqlite://", creator=snapshot.connect, poolclass=QueuePool)
+    cache_sync = CacheSync(CACHES)
+
+    def swapped():
+        # As app/main.py does
+        engine.dispose()
+        with engine.connect() as conn:
+            cache_sync.apply(dict(conn.exec_driver_sql("SELECT name, version FROM table_versions").all()))
+
+    snapshot.on_swap(swapped)
+    app = make_app(engine)
+    writer = create_engine(f"sqlite:///{path}")
+    Session = sessionmaker(bind=writer)
+    load_times = []
+
+    def edit_and_reload(number):
+        db = Session()
+        db.execute(update(models.Story).where(models.Story.id == 1).values(title=f"Edited {number}"))
+        versions.bump(db, "stories")
+        db.commit()
+        db.close()
+        start = time.perf_counter()
+        snapshot.load()
+        load_times.append(time.perf_counter() - start)
+
+    async def run():
+        await run_requests(app, urls[:len(urls) // 4], 1)  # Warm up
+        steady = sum((await run_requests(app, urls, CONCURRENCY)).values(), [])
+
+        async def reload_repeatedly():
+            for number in range(5):
+                await asyncio.sleep(1)
+                await asyncio.to_thread(edit_and_reload, number)
+
+        reloads = asyncio.create_task(reload_repeatedly())
+        swapping = []
+        while not reloads.done():
+            swapping.extend(sum((await run_requests(app, urls[:200], CONCURRENCY)).values(), []))
+        await reloads
+        return steady, swapping
+
+    steady, swapping = asyncio.run(run())
+    engine.dispose()
+    writer.dispose()
+    return sum(load_times) / len(load_times), percentile(steady, 0.99), max(swapping) * 1000
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else "3000"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        if argument.isdigit():
+            engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+            print(f"generating {int(argument):,} stories ...")
+            populate(engine, int(argument))
+        else:
+            shutil.copy(argument, path)
+            engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+        with engine.connect() as conn:
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+        engine.dispose()
+        urls = workload(slugs, codes, random.Random(2))
+        print(f"database file {os.path.getsize(path) / 1024 / 1024:.1f} MB, {len(urls):,} requests\n")
+
+        file_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        snapshot = Snapshot(path)
+        memory_engine = create_engine("sqlite://", creator=snapshot.connect, poolclass=QueuePool)
+        results = {"file": measure(file_engine, urls), "memory": measure(memory_engine, urls)}
+        file_engine.dispose()
+        memory_engine.dispose()
+        load_time, steady_p99, worst_during_swap = swap_under_load(path, urls)
+
+    for clients in (1, CONCURRENCY):
+        print(f"{clients} client{'s' if clients > 1 else ''}: "
+              + ", ".join(f"{mode} {results[mode][clients][1]:.0f} requests/s" for mode in results))
+        print(f"  {'':<14} {'file p50':>9} {'p99':>8} {'memory p50':>11} {'p99':>8}")
+        for name in sorted(results["file"][clients][0]):
+            row = []
+            for mode in ("file", "memory"):
+                latencies = results[mode][clients][0][name]
+                row.append(f"{percentile(latencies, 0.5):>7.2f}ms {percentile(latencies, 0.99):>6.2f}ms")
+            print(f"  {name:<14} {row[0]}  {row[1]:>19}")
+        print()
+
+    print(f"loading a copy: {load_time * 1000:.0f}ms")
+    print(f"{CONCURRENCY} clients, p99 without swaps: {steady_p99:.1f}ms; "
+          f"worst request while a story edit is swapped in once a second: {worst_during_swap:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
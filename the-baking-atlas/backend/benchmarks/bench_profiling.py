@@ -0,0 +1,127 @@
+"""
+Benchmark for on-demand request profiling (app/routes/profiling.py).
+
+Generates a scratch database, then:
+
+- times GET /api/countries/{code} and GET /api/stories/{slug} without the
+  profiling middleware and with it installed (requests not asking to be
+  profiled), to show what it costs everyone else;
+- profiles one slow request, the whole story list, and prints how long it
+  took, how much of it the samples cover per thread and the functions
+  seen most; then profiles it again with memory tracing and prints the
+  memory report's peak.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_profiling           # 3000 generated stories
+    python -m benchmarks.bench_profiling 10000
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine
+
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.routes.profiling import ProfilingMiddleware
+from benchmarks.asgi import request
+from benchmarks.bench_memory_snapshot import make_app, percentile
+from benchmarks.report_text_storage import populate
+
+TOKEN = "bench-token"
+ROUNDS = 2000
+
+
+async def time_requests(app, urls):
+    """Seconds each request took, one at a time."""
+    latencies = []
+    for url in urls:
+        started = time.perf_counter()
+        status, _, _ = await request(app, "GET", url)
+        latencies.append(time.perf_counter() - started)
+        assert status == 200, (url, status)
+    return latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rng = random.Random(6)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate(engine, n)
+        with engine.connect() as conn:
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+        country_urls = [f"/api/countries/{rng.choice(codes)}" for _ in range(ROUNDS)]
+        story_urls = [f"/api/stories/{rng.choice(slugs)}" for _ in range(ROUNDS)]
+
+        plain = make_app(engine)
+        profiled = make_app(engine)
+        profiled.add_middleware(ProfilingMiddleware, token=TOKEN, profile_dir=os.path.join(tmp, "profiles"))
+
+        asyncio.run(time_requests(plain, country_urls[:200]))  # Warm up
+        # Alternate between the two apps in rounds, so drift over the run affects both alike
+        latencies = {"no middleware": ([], []), "middleware, no header": ([], [])}
+        for start in range(0, ROUNDS, 100):
+            for name, app in (("no middleware", plain), ("middleware, no header", profiled)):
+                for urls, into in zip((country_urls, story_urls), latencies[name]):
+                    into.extend(asyncio.run(time_requests(app, urls[start:start + 100])))
+        timings = {
+            name: [(percentile(values, 0.5), percentile(values, 0.99)) for values in kinds]
+            for name, kinds in latencies.items()
+        }
+
+        async def profile_one():
+            url = "/api/stories/"
+            await time_requests(plain, [url] * 3)
+            unprofiled, = await time_requests(plain, [url])
+            started = time.perf_counter()
+            status, headers, body = await request(profiled, "GET", url, headers={
+                "X-Profile-Token": TOKEN, "X-Profile-Options": "download"
+            })
+            took = time.perf_counter() - started
+            # Memory tracing slows everything down, so it gets a request of its own
+            _, memory_headers, _ = await request(profiled, "GET", url, headers={
+                "X-Profile-Token": TOKEN, "X-Profile-Options": "memory"
+            })
+            return url, unprofiled, took, headers, json.loads(body), memory_headers["x-profile-memory-file"]
+
+        url, unprofiled, took, headers, profile, memory_file = asyncio.run(profile_one())
+        with open(os.path.join(tmp, "profiles", memory_file)) as f:
+            memory = json.load(f)
+        engine.dispose()
+
+    print(f"p50 / p99 per request ({ROUNDS:,} requests each, one client):")
+    print(f"  {'':<24} {'country page':>20} {'story page':>20}")
+    for name, (country, story) in timings.items():
+        print(f"  {name:<24} {country[0]:>8.2f} / {country[1]:>6.2f}ms {story[0]:>8.2f} / {story[1]:>6.2f}ms")
+
+    print(f"\nprofiled GET {url}: {took * 1000:.1f}ms (unprofiled {unprofiled * 1000:.1f}ms), "
+          f"original status {headers['x-profiled-status']}")
+    frames = profile["shared"]["frames"]
+    for thread in profile["profiles"]:
+        print(f"  {thread['name']}: {len(thread['samples'])} samples covering {thread['endValue']:.1f}ms")
+        seen = Counter()
+        for stack, weight in zip(thread["samples"], thread["weights"]):
+            for index in set(stack):
+                seen[index] += weight
+        for index, ms in seen.most_common(8):
+            frame = frames[index]
+            print(f"    {ms:>7.1f}ms  {frame['name']}  ({os.path.basename(frame['file'])}:{frame['line']})")
+    print(f"  memory: peak {memory['peak_bytes'] / 1024:.0f} KB traced, "
+          f"{memory['net_bytes'] / 1024:.0f} KB still held at the end")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
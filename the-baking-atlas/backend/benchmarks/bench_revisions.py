@@ -0,0 +1,154 @@
+"""
+Benchmark for the story revision history (app/services/story_revisions.py).
+
+Creates a long markdown story in a scratch database and edits it N times
+through PUT /api/stories/{slug}, each edit changing, adding or removing a
+few lines the way a writer would. Then prints how much the history takes
+up compared with keeping a full copy per revision, and how long it takes
+to fetch revisions, and checks that every revision comes back exactly as
+it was saved.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_revisions          # 500 edits
+    python -m benchmarks.bench_revisions 2000
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.models import models
+from app.routes import countries, stories
+from app.services import story_revisions
+from benchmarks.asgi import request
+
+WORDS = ("flour butter sugar oven dough rise crumb crust knead proof bake "
+         "market village festival grandmother recipe morning loaf steam").split()
+
+
+def sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+
+def first_body(rng):
+    """About 30 KB of markdown: headings and paragraphs, one per line."""
+    lines = []
+    for section in range(12):
+        lines.append(f"## Part {section + 1}")
+        lines.extend(" ".join(sentence(rng) for _ in range(3)) for _ in range(12))
+    return "\n".join(lines)
+
+
+def edit(rng, body):
+    """Change, add or remove a line or two."""
+    lines = body.split("\n")
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(lines))
+        choice = rng.random()
+        if choice < 0.6:
+            lines[i] = lines[i] + " " + sentence(rng)
+        elif choice < 0.85 or len(lines) < 50:
+            lines.insert(i, sentence(rng))
+        else:
+            del lines[i]
+    return "\n".join(lines)
+
+
+def make_app(engine):
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+    return app
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(app, engine, edits):
+    rng = random.Random(5)
+    await request(app, "POST", "/api/countries/", {}, {"name": "Japan", "code": "JP", "region": "East Asia"})
+    bodies = [first_body(rng)]
+    status, _, body = await request(app, "POST", "/api/stories/", {},
+                                    {"title": "Castella", "slug": "castella", "body": bodies[0],
+                                     "region_codes": ["JP"]})
+    assert status == 200, body
+
+    start = time.perf_counter()
+    for number in range(2, edits + 2):
+        bodies.append(edit(rng, bodies[-1]))
+        status, _, body = await request(app, "PUT", "/api/stories/castella", {},
+                                        {"body": bodies[-1], "revision_notes": f"Edit {number}"})
+        assert status == 200, body
+    edit_time = (time.perf_counter() - start) / edits
+
+    with engine.connect() as conn:
+        revision = models.StoryRevision
+        stored, snapshots = conn.execute(select(
+            func.sum(func.coalesce(func.length(revision.body), 0) + func.coalesce(func.length(revision.body_delta), 0)),
+            func.count(revision.body),
+        )).one()
+    full_copies = sum(len(body) for body in bodies)
+
+    # Fetch every revision through the API, in a shuffled order
+    numbers = list(range(1, len(bodies) + 1))
+    rng.shuffle(numbers)
+    timings = []
+    for number in numbers:
+        start = time.perf_counter()
+        status, _, body = await request(app, "GET", f"/api/stories/castella/revisions/{number}")
+        timings.append(time.perf_counter() - start)
+        assert status == 200, body
+        assert json.loads(body)["body"] == bodies[number - 1], f"revision {number} differs"
+
+    status, _, body = await request(app, "GET", "/api/stories/castella/revisions")
+    assert status == 200 and len(json.loads(body)) == len(bodies)
+
+    print(f"revisions:               {len(bodies):,} ({snapshots} stored in full, "
+          f"one every {story_revisions.SNAPSHOT_EVERY} at most)")
+    print(f"latest body:             {len(bodies[-1]) / 1024:,.1f} KiB")
+    print(f"full copy per revision:  {full_copies / 1024:,.0f} KiB")
+    print(f"stored history:          {stored / 1024:,.0f} KiB ({full_copies / stored:.1f}x smaller)")
+    print(f"edit (PUT):              {edit_time * 1000:.2f}ms average")
+    print(f"fetch a revision (GET):  p50 {percentile(timings, 0.5) * 1000:.2f}ms, "
+          f"p99 {percentile(timings, 0.99) * 1000:.2f}ms, max {max(timings) * 1000:.2f}ms")
+    print(f"\nall {len(bodies):,} revisions rebuilt exactly")
+
+
+def main():
+    edits = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        asyncio.run(run(make_app(engine), engine, edits))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Benchmark for story map pins (app/services/story_pins.py).
+
+Fills a scratch database with N pins - clustered around a few hundred
+"cities" like real stories would be - then times viewport queries from a
+world view down to street level, plus the cost of moving one pin.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_story_pins           # 1,000,000 pins
+    python -m benchmarks.bench_story_pins 100000
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.services import story_pins
+
+# (zoom, viewport width in degrees): roughly a 1024px-wide map
+VIEWPORTS = [(1, 360), (3, 90), (5, 22.5), (8, 2.8), (11, 0.35), (14, 0.044)]
+
+
+def populate(conn, count):
+    rng = random.Random(7)
+    cities = [(rng.uniform(-170, 170), rng.uniform(-55, 65)) for _ in range(300)]
+    rows = []
+    for story_id in range(1, count + 1):
+        lon, lat = rng.choice(cities)
+        rows.append({"id": story_id, "lon": lon + rng.gauss(0, 1.5), "lat": max(-89, min(89, lat + rng.gauss(0, 1)))})
+        if len(rows) == 50000:
+            conn.execute(text("INSERT INTO story_pins VALUES (:id, :lon, :lon, :lat, :lat)"), rows)
+            rows = []
+    if rows:
+        conn.execute(text("INSERT INTO story_pins VALUES (:id, :lon, :lon, :lat, :lat)"), rows)
+    return cities
+
+
+def main(count=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        with engine.begin() as conn:
+            story_pins.create_tables(conn)
+            started = time.perf_counter()
+            cities = populate(conn, count)
+            loaded = time.perf_counter()
+            story_pins.rebuild_clusters(conn)
+            clustered = time.perf_counter()
+        print(f"{count:,} pins: R*Tree load {loaded - started:.1f}s, "
+              f"cluster counts {clustered - loaded:.1f}s")
+
+        rng = random.Random(1)
+        with engine.connect() as conn:
+            for zoom, width in VIEWPORTS:
+                timings = []
+                results = 0
+                for _ in range(50):
+                    lon, lat = rng.choice(cities)
+                    bbox = (max(-180, lon - width / 2), max(-85, lat - width / 4),
+                            min(180, lon + width / 2), min(85, lat + width / 4))
+                    started = time.perf_counter()
+                    if zoom <= story_pins.CLUSTER_MAX_ZOOM:
+                        results += len(story_pins.clusters_in_bbox(conn, bbox, zoom))
+                    else:
+                        results += len(story_pins.pins_in_bbox(conn, bbox))
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(f"zoom {zoom:>2}: p50 {timings[25]:6.2f} ms, p99 {timings[49]:6.2f} ms, "
+                      f"{results / 50:.0f} pins/clusters per viewport")
+
+        with engine.begin() as conn:
+            started = time.perf_counter()
+            for story_id in range(1, 101):
+                story_pins.set_pin(conn, story_id, {"lat": rng.uniform(-60, 60), "lng": rng.uniform(-180, 180)})
+            print(f"moving a pin: {(time.perf_counter() - started) * 10:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Benchmark for story tables of contents and sections (app/services/story_sections.py).
+
+Fills a scratch database with generated stories plus one long-form story
+(about 650 KB of markdown in 300+ sections), then compares what a reader
+waits for:
+
+- GET /api/stories/{slug}: the whole body at once
+- GET /api/stories/{slug}/toc: headings, sizes and word counts only
+- GET /api/stories/{slug}/sections/{n}: one section (the first, a middle
+  one, the last)
+
+For each it prints the response size and the median time per request.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_story_sections          # 200 requests each
+    python -m benchmarks.bench_story_sections 1000
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.models import models
+from app.routes import stories
+from app.services import story_sections
+from benchmarks.asgi import request
+from benchmarks.report_text_storage import populate, story_body
+
+
+def make_app(engine):
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+    return app
+
+
+async def measure(app, url, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        status, _, body = await request(app, "GET", url)
+        times.append(time.perf_counter() - start)
+        assert status == 200, (url, status)
+    times.sort()
+    return len(body), times[len(times) // 2] * 1000
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate(engine, 1000)
+
+        rng = random.Random(5)
+        body = "\n\n".join(story_body(rng) for _ in range(40))
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            story = models.Story(title="Long read", slug="long-read", body=body)
+            db.add(story)
+            db.flush()
+            story_sections.write_sections(db, story.id, body, new=True)
+            db.commit()
+        count = len(story_sections.split_sections(body))
+
+        app = make_app(engine)
+        urls = [
+            ("whole story", "/api/stories/long-read"),
+            ("table of contents", "/api/stories/long-read/toc"),
+            ("first section", "/api/stories/long-read/sections/1"),
+            ("middle section", f"/api/stories/long-read/sections/{count // 2}"),
+            ("last section", f"/api/stories/long-read/sections/{count}"),
+        ]
+        print(f"story body: {len(body.encode('utf-8')) / 1024:.0f} KB in {count} sections, "
+              f"{repeats} requests each\n")
+        print(f"{'':<20} {'response':>10} {'median':>9}")
+        for label, url in urls:
+            asyncio.run(measure(app, url, 5))  # Warm up
+            size, median = asyncio.run(measure(app, url, repeats))
+            print(f"{label:<20} {size / 1024:>8.1f}KB {median:>7.2f}ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
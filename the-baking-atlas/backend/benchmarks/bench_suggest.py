@@ -0,0 +1,89 @@
+"""
+Benchmark for the typeahead index (app/services/suggest_index.py).
+
+Builds the index over N synthetic names, then reports memory use and
+latency percentiles for prefix, multi-word and fuzzy (typo) queries.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_suggest            # 1,000,000 names
+    python -m benchmarks.bench_suggest 100000
+"""
+
+import random
+import sys
+import time
+import resource
+
+from app.services.suggest_index import KINDS, SuggestIndex
+
+SYLLABLES = ["an", "ba", "ca", "del", "el", "fo", "ga", "ka", "la", "lo", "ma", "mel",
+             "na", "on", "pan", "pa", "ra", "sa", "ste", "ta", "to", "va", "za", "chi"]
+WORDS = ["bread", "cake", "tart", "bun", "roll", "pie", "cookie", "flour", "sugar",
+         "butter", "rice", "honey", "cream", "sweet", "sour", "bean", "tea", "nut"]
+
+
+def fake_name(rng: random.Random) -> str:
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    if rng.random() < 0.6:
+        return f"{word} {rng.choice(WORDS)}"
+    return word
+
+
+def typo(rng: random.Random, name: str) -> str:
+    """Drop one character, like "castela" for "castella"."""
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_queries(index: SuggestIndex, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.suggest(query)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(42)
+    rows = [(KINDS[i % len(KINDS)], i, fake_name(rng), None) for i in range(count)]
+    names = [row[2] for row in rows]
+
+    index = SuggestIndex()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index.build(rows)
+    build_seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    memory_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+
+    print(f"Names indexed:  {count:,}")
+    print(f"Build time:     {build_seconds:.2f}s")
+    print(f"Index memory:   {memory_mb:.0f} MB (peak RSS growth while building)")
+
+    samples = rng.sample(names, 2000)
+    workloads = {
+        "prefix (3 chars)": [name[:3] for name in samples],
+        "prefix (6 chars)": [name[:6] for name in samples],
+        "multi-word": [name.lower() for name in samples],
+        "fuzzy (typo)": [typo(rng, name.split()[0]) for name in samples],
+    }
+    print(f"\n{'query type':<18} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+    for label, queries in workloads.items():
+        latencies = time_queries(index, queries)
+        print(f"{label:<18} {percentile(latencies, 50):>10.0f} {percentile(latencies, 99):>10.0f}")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add("baked_good", count + i, fake_name(rng))
+    print(f"\nIncremental add: {(time.perf_counter() - start) * 1000:.0f} µs per name")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for vector tile generation (app/services/vector_tiles.py).
+
+Builds N synthetic "countries" - jagged polygons with a few thousand
+vertices each, spread over the globe - into a scratch MBTiles file, then
+reports build throughput, cached and uncached tile latency, and how many
+tiles a single country edit invalidates.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_tiles            # 200 countries, zoom 0-5
+    python -m benchmarks.bench_tiles 50 4
+"""
+
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from app.services.vector_tiles import TileCache, lnglat_to_world
+
+
+def synthetic_countries(count, vertices=2000):
+    rng = random.Random(7)
+    features = []
+    for i in range(count):
+        lon, lat = rng.uniform(-170, 170), rng.uniform(-60, 70)
+        radius = rng.uniform(2, 12)
+        ring = []
+        for k in range(vertices):
+            angle = 2 * math.pi * k / vertices
+            r = radius * (0.8 + 0.2 * math.sin(angle * 13) + rng.uniform(-0.05, 0.05))
+            ring.append(lnglat_to_world(lon + r * math.cos(angle), max(-80, min(80, lat + r * math.sin(angle)))))
+        ring.append(ring[0])
+        xs, ys = [p[0] for p in ring], [p[1] for p in ring]
+        features.append({
+            "code": f"{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}",
+            "name": f"Country {i}",
+            "bbox": (min(xs), min(ys), max(xs), max(ys)),
+            "polygons": [[ring]],
+        })
+    return features
+
+
+def main(count=200, max_zoom=5):
+    stats = {f"{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}": i % 5 for i in range(0, count, 2)}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TileCache(os.path.join(tmp, "bench.mbtiles"))
+        cache.import_features(synthetic_countries(count), max_zoom)
+        tiles = cache.all_tiles(max_zoom)
+
+        started = time.perf_counter()
+        sizes = [len(cache.render_and_store(z, x, y, stats)) for z, x, y in tiles]
+        elapsed = time.perf_counter() - started
+        print(f"{count} countries, zoom 0-{max_zoom}: built {len(tiles)} tiles in {elapsed:.2f}s "
+              f"({len(tiles) / elapsed:.0f} tiles/s), median {statistics.median(sizes) / 1024:.1f} KB gzipped")
+
+        sample = random.Random(1).sample(tiles, min(200, len(tiles)))
+        timings = []
+        for z, x, y in sample:
+            started = time.perf_counter()
+            cache.get_tile(None, z, x, y)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"cached tile read: p50 {timings[len(timings) // 2]:.3f} ms, "
+              f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+        dropped = cache.invalidate_countries(["AA"])
+        print(f"editing one country invalidated {dropped} of {len(tiles)} tiles")
+
+        timings = []
+        for z, x, y in sample:
+            started = time.perf_counter()
+            cache.render_and_store(z, x, y, stats)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"uncached tile cut:  p50 {timings[len(timings) // 2]:.2f} ms, "
+              f"p99 {timings[int(len(timings) * 0.99)]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
\ No newline at end of file
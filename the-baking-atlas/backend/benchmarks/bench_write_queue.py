@@ -0,0 +1,212 @@
+"""
+Benchmark for the write queue (app/services/write_queue.py).
+
+Sends bursts of concurrent write requests (new stories, story edits, new
+baked goods) at a scratch database, with the write queue off (every
+request writes on its own connection, as before) and on. For each number
+of concurrent clients it prints writes per second, latency, and any
+failed requests. Meanwhile an "import job" on its own connection keeps
+writing too, as a script or another server process would.
+
+Then it overloads a small queue (WRITE_QUEUE_SIZE 8, WRITE_DEADLINE 0.5s)
+to show writes being turned away with 503 + Retry-After instead of
+piling up, and prints the queue's stats.
+
+Requests go straight to the ASGI app (benchmarks/asgi.py).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_write_queue            # 20 writes per client
+    python -m benchmarks.bench_write_queue 50
+"""
+
+import asyncio
+import collections
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.routes import admin, countries, stories
+from app.services.write_queue import WriteQueue, write_queue
+from benchmarks.asgi import request
+
+CLIENTS = (1, 8, 32, 64)
+
+
+def make_app(engine):
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.include_router(admin.router)
+    app.dependency_overrides[get_db] = bench_db
+    return app
+
+
+def writes_for(client, count):
+    """A client's writes: create a story, edit it, add a baked good, repeat."""
+    for i in range(count):
+        slug = f"story-{client}-{i // 3}"
+        if i % 3 == 0:
+            yield "POST", "/api/stories/", {"title": f"Story {slug}", "slug": slug, "body": "Flour. " * 200,
+                                            "region_codes": ["JP"], "tag_names": ["bread"]}
+        elif i % 3 == 1:
+            yield "PUT", f"/api/stories/{slug}", {"body": "Flour and water. " * 200}
+        else:
+            yield "POST", "/api/countries/JP/baked-goods", {"country_id": 1, "name": f"Bake {client}-{i}"}
+
+
+def import_job(path, stop, failures):
+    """Another writer on its own connection, like a script running alongside the API."""
+    conn = sqlite3.connect(path, timeout=5)
+    n = 0
+    while not stop.is_set():
+        try:
+            with conn:
+                conn.executemany("INSERT INTO tags (name) VALUES (?)", [(f"imported-{n}-{k}",) for k in range(50)])
+        except sqlite3.OperationalError:
+            failures.append(n)  # database is locked
+        n += 1
+        time.sleep(0.02)
+    conn.close()
+
+
+async def burst(app, clients, per_client):
+    latencies = []
+    failures = collections.Counter()
+
+    async def client(number):
+        for method, url, body in writes_for(number, per_client):
+            start = time.perf_counter()
+            try:
+                status, headers, response = await request(app, method, url, {}, body)
+            except Exception as error:
+                # An unhandled error: a server would answer 500
+                status, response = 500, str(error.__cause__ or error).encode()
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures[f"{status} {response[:60].decode(errors='replace')}"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rate": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "failures": failures,
+    }
+
+
+def run_mode(tmp, queued, per_client):
+    path = os.path.join(tmp, f"{'queued' if queued else 'direct'}.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           pool_size=64, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    app = make_app(engine)
+    write_queue.enabled = queued
+
+    async def run():
+        await request(app, "POST", "/api/countries/", {}, {"name": "Japan", "code": "JP", "region": "East Asia"})
+        results = {}
+        for clients in CLIENTS:
+            # Each burst writes new slugs
+            results[clients] = await burst(app, clients, per_client)
+            await request(app, "DELETE", "/api/stories/?region=JP")
+        return results
+
+    stop = threading.Event()
+    import_failures = []
+    importer = threading.Thread(target=import_job, args=(path, stop, import_failures))
+    importer.start()
+    try:
+        results = asyncio.run(run())
+    finally:
+        stop.set()
+        importer.join()
+        engine.dispose()
+    return results, len(import_failures)
+
+
+def overload(tmp):
+    """A small queue with a short deadline, hit by more writes than it can take."""
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'overload.db')}", connect_args={"check_same_thread": False},
+                           pool_size=64, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    app = make_app(engine)
+    small = WriteQueue(max_queue=8, deadline=0.5)
+
+    async def run():
+        await request(app, "POST", "/api/countries/", {}, {"name": "Japan", "code": "JP", "region": "East Asia"})
+        statuses = collections.Counter()
+        retry_after = set()
+
+        async def client(number):
+            for method, url, body in writes_for(number, 6):
+                status, headers, _ = await request(app, method, url, {}, body)
+                statuses[status] += 1
+                if status == 503:
+                    retry_after.add(headers.get("retry-after"))
+
+        await asyncio.gather(*(client(number) for number in range(64)))
+        _, _, stats = await request(app, "GET", "/api/admin/write-queue")
+        return statuses, retry_after, stats
+
+    import app.routes.writes as writes
+    writes.write_queue, original = small, writes.write_queue
+    admin.write_queue = small
+    try:
+        return asyncio.run(run())
+    finally:
+        writes.write_queue = admin.write_queue = original
+        engine.dispose()
+
+
+def main():
+    per_client = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {queued: run_mode(tmp, queued, per_client) for queued in (False, True)}
+        statuses, retry_after, stats = overload(tmp)
+    write_queue.enabled = True
+
+    print(f"{per_client} writes per client, with an import job writing alongside\n")
+    for queued in (False, True):
+        print(f"import job 'database is locked' errors, queue {'on' if queued else 'off'}: {results[queued][1]}")
+    print()
+    print(f"{'clients':>7}  {'mode':<7} {'writes/s':>9} {'p50':>9} {'p99':>9}  failed")
+    for clients in CLIENTS:
+        for queued in (False, True):
+            r = results[queued][0][clients]
+            failed = sum(r["failures"].values())
+            print(f"{clients:>7}  {'queued' if queued else 'direct':<7} {r['rate']:>9.0f} "
+                  f"{r['p50']:>7.1f}ms {r['p99']:>7.1f}ms  {failed}")
+            for failure, count in r["failures"].most_common(3):
+                print(f"{'':>18}{count} x {failure}")
+
+    print(f"\noverload (queue of 8, 0.5s deadline, 64 clients): "
+          f"{dict(sorted(statuses.items()))}, Retry-After {sorted(retry_after - {None})}")
+    print(f"queue stats: {stats.decode()}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Checks that writes reach every worker's in-memory indexes (app/services/cache_sync.py).
+
+Starts serve.py with several real worker processes on a copy of
+baking_atlas.db, gets every worker to load its indexes, then writes
+through one request and keeps asking (on new connections, so the requests
+spread over the workers) until every answer shows the change. Prints how
+long the stale answers lasted, and fails if that's longer than the bound.
+
+Usage (from the backend folder):
+    python -m benchmarks.check_multi_worker               # 4 workers
+    python -m benchmarks.check_multi_worker 8
+    python -m benchmarks.check_multi_worker 4 --no-sync   # shows the stale reads it prevents
+
+tests/test_multi_worker.py runs the same checks under pytest, on an empty database.
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INTERVAL = 0.25
+# Longest a worker may keep answering from stale indexes after a write
+BOUND = 4 * INTERVAL + 0.5
+
+# This many fresh answers in a row (spread over all workers) count as "everyone has it"
+CONSECUTIVE = 60
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def call(base, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json", "Connection": "close"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def staleness(base, path, is_fresh, timeout=10.0):
+    """Seconds until `path` answers freshly CONSECUTIVE times in a row (None if it never does)."""
+    start = time.perf_counter()
+    last_stale = 0.0
+    streak = 0
+    while streak < CONSECUTIVE:
+        elapsed = time.perf_counter() - start
+        if elapsed > timeout:
+            return None
+        if is_fresh(call(base, "GET", path)):
+            streak += 1
+        else:
+            streak = 0
+            last_stale = elapsed
+    return last_stale
+
+
+def measure(folder, workers=4, sync=True):
+    """
+    Runs serve.py in `folder` (on the baking_atlas.db there, created if
+    missing) and makes the writes in the checks below.
+    Returns [(description, seconds stale or None if it never caught up)].
+    """
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PYTHONPATH=BACKEND, CACHE_SYNC_INTERVAL=str(INTERVAL if sync else 0),
+               TILES_MBTILES_PATH=os.path.join(folder, "tiles.mbtiles"))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND, "serve.py"), "--workers", str(workers), "--port", str(port)],
+        cwd=folder, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                call(base, "GET", "/")
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        # Get every worker to load its suggest and story filter indexes
+        for _ in range(workers * 20):
+            call(base, "GET", "/api/suggest?q=ja")
+            call(base, "GET", "/api/stories/?tag=bread")
+
+        checks = [
+            ("new country in suggest", "POST", "/api/countries/",
+             {"name": "Zedland", "code": "ZD", "region": "Testland"},
+             "/api/suggest?q=zedland", lambda found: any(s["name"] == "Zedland" for s in found)),
+            ("new story in tag filter", "POST", "/api/stories/",
+             {"title": "Zed bread", "slug": "zed-bread", "body": "...", "region_codes": ["ZD"],
+              "tag_names": ["bread"]},
+             "/api/stories/?tag=bread", lambda found: any(s["slug"] == "zed-bread" for s in found)),
+            ("deleted story gone from filter", "DELETE", "/api/stories/zed-bread", None,
+             "/api/stories/?tag=bread", lambda found: all(s["slug"] != "zed-bread" for s in found)),
+            ("deleted country gone from suggest", "DELETE", "/api/countries/ZD", None,
+             "/api/suggest?q=zedland", lambda found: all(s["name"] != "Zedland" for s in found)),
+        ]
+        results = []
+        for description, method, path, body, check_path, is_fresh in checks:
+            call(base, method, path, body)
+            results.append((description, staleness(base, check_path, is_fresh)))
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    workers = int(args[0]) if args else 4
+    sync = "--no-sync" not in sys.argv
+
+    print(f"{workers} workers, cache sync {'every %.2fs' % INTERVAL if sync else 'off'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(BACKEND, "baking_atlas.db"), tmp)
+        results = measure(tmp, workers, sync)
+
+    failed = False
+    for description, stale_for in results:
+        if stale_for is None:
+            print(f"  {description:<36} still stale after 10s")
+            failed = True
+        else:
+            print(f"  {description:<36} stale for {stale_for * 1000:6.0f}ms")
+            failed |= stale_for > BOUND
+
+    if failed:
+        print(f"\nFAIL: some worker served stale data for more than {BOUND:.2f}s")
+        sys.exit(1)
+    print(f"\nOK: every worker caught up within {BOUND:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
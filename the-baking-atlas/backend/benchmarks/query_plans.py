@@ -0,0 +1,409 @@
+"""
+Checks the query plan of every SQL statement the routes run, and fails if
+one scans a large table or sorts in a temporary B-tree.
+
+Generates a database big enough for scans to matter (see populate()),
+sends requests to every route in app/routes/ (REQUESTS below), and
+captures the statements each route runs. Each one goes through SQLite's
+EXPLAIN QUERY PLAN, and the plan is flagged when it has
+
+- "SCAN <table>" for a table with at least LARGE_TABLE_ROWS rows (reading
+  the whole table, or a whole index of it, instead of searching), or
+- "USE TEMP B-TREE" (sorting or de-duplicating rows no index has in order).
+
+Plans that are fine on purpose are listed in ALLOWED, with the reason.
+It prints a report per route; --verbose also prints every statement and
+its whole plan.
+
+Run it after changing a route, a query or an index (from the backend folder):
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --verbose
+
+Exits with status 1 if a plan is flagged or a route has no request in
+REQUESTS. tests/test_query_plans.py runs the same audit under pytest.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from collections import defaultdict
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.routing import Match
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.routes import admin, baked_goods, batch, changes, countries, ingredients, regions, search, stories, tiles
+from app.services import region_tree, story_pins, story_sections
+from app.services.vector_tiles import tile_cache
+from benchmarks.asgi import request
+from benchmarks.bench_tiles import synthetic_countries
+from benchmarks.report_text_storage import populate
+
+ROUTERS = (countries, baked_goods, stories, ingredients, regions, search, tiles, batch, changes, admin)
+
+STORIES = 3000
+LARGE_TABLE_ROWS = 1000
+
+# (route, start of the plan line, why it's fine). Routes are written
+# "METHOD path" as declared, e.g. "GET /api/stories/{slug}".
+ALLOWED = [
+    ("GET /api/baked-goods/", "SCAN baked_goods_2 USING INDEX ix_baked_goods_extra_texture_lists",
+     "reads only the baked goods whose texture is a list (a partial index), to look inside them"),
+    ("GET /api/baked-goods/", "SCAN baked_goods",
+     "lists every baked good (paged with limit/offset, in id order)"),
+    ("GET /api/baked-goods/", "USE TEMP B-TREE FOR ORDER BY",
+     "puts one region's or country's baked goods, found through ix_baked_goods_country_id, in id order"),
+    ("GET /api/ingredients/", "SCAN ingredients",
+     "lists every ingredient"),
+    ("GET /api/ingredients/{name}/countries", "USE TEMP B-TREE FOR ORDER BY",
+     "sorts the countries using the ingredient by name"),
+    ("GET /api/regions/", "USE TEMP B-TREE FOR ORDER BY",
+     "sorts the region tree, a few dozen rows"),
+    ("GET /api/regions/{slug}/countries", "USE TEMP B-TREE FOR ORDER BY",
+     "sorts the region's countries by name"),
+    ("GET /api/stories/", "SCAN",
+     "loads the in-memory story filter index (once per process, app/services/story_filter_index.py)"),
+    ("GET /api/suggest", "SCAN",
+     "loads the in-memory suggestion index (once per process, app/services/suggest_index.py)"),
+    ("DELETE /api/countries/", "USE TEMP B-TREE FOR DISTINCT",
+     "the stories of the deleted countries, each once"),
+    ("DELETE /api/countries/{country_code}", "USE TEMP B-TREE FOR DISTINCT",
+     "the stories of the deleted country, each once"),
+    ("DELETE /api/stories/", "USE TEMP B-TREE",
+     "the deleted stories' countries, and their pins counted per cluster cell"),
+    ("DELETE /api/stories/{slug}", "USE TEMP B-TREE",
+     "the deleted story's countries, and its pin counted per cluster cell"),
+    ("DELETE /api/stories/tags/", "USE TEMP B-TREE FOR DISTINCT",
+     "the stories of the deleted tags, each once"),
+    ("DELETE /api/stories/tags/{tag_name}", "USE TEMP B-TREE FOR DISTINCT",
+     "the stories of the deleted tag, each once"),
+]
+
+# Routes with no request below, and why
+NOT_EXERCISED = {
+    "GET /api/admin/backups": "reads the backup folder, not the database",
+    "POST /api/admin/backups": "copies the file with sqlite3's backup API, outside SQLAlchemy",
+}
+
+# (method, url, body), in order: reads first, then writes, then deletes
+REQUESTS = [
+    ("GET", "/api/countries/", None),
+    ("GET", "/api/countries/AB", None),
+    ("GET", "/api/countries/?extra.climate=dry", None),
+    ("GET", "/api/baked-goods/", None),
+    ("GET", "/api/baked-goods/?category=bread&limit=20", None),
+    ("GET", "/api/baked-goods/?region=west-testland&limit=20", None),
+    ("GET", "/api/baked-goods/?region=AB", None),
+    ("GET", "/api/baked-goods/?extra.texture=crispy", None),
+    ("GET", "/api/stories/", None),
+    ("GET", "/api/stories/?limit=20&offset=100", None),
+    ("GET", "/api/stories/?region=AB,AC&tag=tag-1&match=any&limit=20", None),
+    ("GET", "/api/stories/?region=west-testland&time_context=historical", None),
+    ("GET", "/api/stories/?bbox=0,0,60,40&limit=20", None),
+    ("GET", "/api/stories/pins/?bbox=-180,-85,180,85&zoom=2", None),
+    ("GET", "/api/stories/pins/?bbox=10,10,12,12&zoom=14", None),
+    ("GET", "/api/stories/story-42", None),
+    ("GET", "/api/stories/story-42/revisions", None),
+    ("GET", "/api/stories/story-42/revisions/1", None),
+    ("GET", "/api/stories/story-42/toc", None),
+    ("GET", "/api/stories/story-42/sections/2", None),
+    ("GET", "/api/stories/tags/", None),
+    ("GET", "/api/stories/tags/?tag_type=technique", None),
+    ("GET", "/api/ingredients/", None),
+    ("GET", "/api/ingredients/ingredient 7/countries", None),
+    ("GET", "/api/regions/", None),
+    ("GET", "/api/regions/west-testland/countries", None),
+    ("GET", "/api/suggest?q=sto", None),
+    ("GET", "/api/suggest?q=country&type=country", None),
+    ("GET", "/api/tiles/tiles.json", None),
+    ("GET", "/api/tiles/1/1/0.pbf", None),
+    ("GET", "/api/changes", None),
+    ("GET", "/api/changes?since=1000&limit=100", None),
+    ("GET", "/api/changes/stream?since=2900", None),
+    ("GET", "/api/admin/write-queue", None),
+    ("GET", "/api/admin/coalescing", None),
+    ("POST", "/api/batch", {"requests": [{"url": "/api/countries/AB"}, {"url": "/api/stories/?region=AB"}]}),
+
+    ("POST", "/api/countries/", {"name": "Checkland", "code": "ZZ", "region": "West Testland"}),
+    ("POST", "/api/countries/ZZ/baked-goods", {"country_id": 201, "name": "Check loaf", "category": "bread"}),
+    ("POST", "/api/countries/ZZ/ingredients", {"country_id": 201, "name": "Ingredient 7"}),
+    ("PUT", "/api/countries/AB", {"name": "Country AB", "code": "AB", "region": "East Testland", "overview": "New"}),
+    ("PATCH", "/api/countries/AC", {"overview": "Patched"}),
+    ("PUT", "/api/countries/baked-goods/5", {"country_id": 1, "name": "Loaf 5", "category": "cake"}),
+    ("PATCH", "/api/countries/baked-goods/6", {"category": "pastry"}),
+    ("PUT", "/api/countries/ingredients/5", {"country_id": 1, "name": "Ingredient 9", "description": "Fine"}),
+    ("PATCH", "/api/countries/ingredients/6", {"description": "Very fine"}),
+    ("POST", "/api/stories/", {"title": "Check", "slug": "check", "body": "...", "region_codes": ["AB", "ZZ"],
+                               "tag_names": ["tag-1", "brand-new"], "extra_data": {"lat": 10.5, "lng": 11.5}}),
+    ("PUT", "/api/stories/story-42", {"body": "A new body.", "tag_names": ["tag-2"], "region_codes": ["AD"],
+                                      "extra_data": {"lat": 20.5, "lng": 21.5}}),
+    ("POST", "/api/stories/tags/", {"name": "check-tag", "tag_type": "theme"}),
+    ("POST", "/api/regions/", {"name": "North Testland", "parent_slug": "testland"}),
+    ("PUT", "/api/regions/north-testland", {"parent_slug": "west-testland"}),
+
+    ("DELETE", "/api/regions/north-testland", None),
+    ("DELETE", "/api/stories/tags/tag-3", None),
+    ("DELETE", "/api/stories/tags/?names=tag-4,tag-5", None),
+    ("DELETE", "/api/stories/story-43", None),
+    ("DELETE", "/api/stories/?time_context=historical&region=AE", None),
+    ("DELETE", "/api/countries/baked-goods/7", None),
+    ("DELETE", "/api/countries/ingredients/7", None),
+    ("DELETE", "/api/countries/AF", None),
+    ("DELETE", "/api/countries/?codes=AG,AH", None),
+]
+
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+SCAN = re.compile(r"SCAN (\w+)")
+ALIAS = re.compile(r"\b(\w+) AS (\w+)\b")
+
+
+def populate_all(engine, n):
+    """populate()'s countries and stories, plus everything else the routes read."""
+    populate(engine, n)
+    rng = random.Random(5)
+    with Session(bind=engine) as db:
+        testland = region_tree.add_region(db, "Testland", "region")
+        west = region_tree.add_region(db, "West Testland", "subregion", testland)
+        east = region_tree.add_region(db, "East Testland", "subregion", testland)
+        db.commit()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE countries SET region_id = CASE WHEN id % 2 THEN ? ELSE ? END", (west, east))
+        conn.exec_driver_sql("UPDATE stories SET time_context = ?, extra_data = ? WHERE id % 3 = 0",
+                             ("historical", None))
+        conn.exec_driver_sql("UPDATE stories SET extra_data = ? WHERE id = ?", [
+            (json.dumps({"lat": rng.uniform(-60, 70), "lng": rng.uniform(-170, 170)}), i) for i in range(1, n + 1, 2)
+        ])
+        conn.exec_driver_sql("INSERT OR IGNORE INTO story_regions (story_id, country_id) VALUES (?, ?)",
+                             [(i, rng.randint(1, 200)) for i in range(1, n + 1)])
+        conn.exec_driver_sql("INSERT INTO tags (id, name, tag_type) VALUES (?, ?, ?)",
+                             [(i, f"tag-{i}", ("ingredient", "technique", "theme")[i % 3]) for i in range(1, 301)])
+        conn.exec_driver_sql("INSERT OR IGNORE INTO story_tags (story_id, tag_id) VALUES (?, ?)",
+                             [(i, rng.randint(1, 300)) for i in range(1, n + 1) for _ in range(3)])
+        conn.exec_driver_sql("INSERT INTO baked_goods (country_id, name, category, extra_data) VALUES (?, ?, ?, ?)", [
+            (country_id, f"Loaf {country_id}-{k}", ("bread", "cake", "pastry")[k % 3],
+             json.dumps({"texture": rng.choice(("crispy", "soft", "chewy"))}))
+            for country_id in range(1, 201) for k in range(10)
+        ])
+        conn.exec_driver_sql("INSERT INTO canonical_ingredients (id, name, normalized_name) VALUES (?, ?, ?)",
+                             [(i, f"Ingredient {i}", f"ingredient {i}") for i in range(1, 401)])
+        conn.exec_driver_sql("INSERT OR IGNORE INTO ingredients (country_id, canonical_id) VALUES (?, ?)",
+                             [(country_id, rng.randint(1, 400)) for country_id in range(1, 201) for _ in range(10)])
+        conn.exec_driver_sql("INSERT INTO story_revisions (story_id, number, title, body, created_at) "
+                             "SELECT id, 1, title, body, published_at FROM stories")
+        conn.exec_driver_sql("INSERT INTO change_log (entity, entity_id, ref, deleted, changed_at) "
+                             "SELECT 'story', id, slug, 0, updated_at FROM stories")
+        story_pins.rebuild(conn)
+        story_sections.rebuild(conn)
+
+
+def make_app(engine):
+    # Like the app's SessionLocal
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def check_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    for module in ROUTERS:
+        app.include_router(module.router)
+    app.dependency_overrides[get_db] = check_db
+    return app
+
+
+def route_name(app, method, url):
+    """The declared route a request goes to, e.g. "GET /api/stories/{slug}"."""
+    path = url.partition("?")[0]
+    scope = {"type": "http", "method": method, "path": path}
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.matches(scope)[0] == Match.FULL:
+            return f"{method} {route.path}"
+    return f"{method} {path}"
+
+
+async def request_stream(app, url, seconds=0.5):
+    """A streaming GET whose client goes away after a moment."""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("check", 0), "server": ("check", 80),
+    }
+    messages = []
+    received = []
+
+    async def receive():
+        received.append(True)
+        if len(received) == 1:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(seconds)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+def explain(raw, statement, parameters):
+    """EXPLAIN QUERY PLAN lines for a captured statement."""
+    if isinstance(parameters, list):  # executemany: the plan is the same for every row
+        parameters = parameters[0] if parameters else ()
+    return [detail for _, _, _, detail in raw.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def problems(route, statement, plan, large_tables, used):
+    """The plan lines to flag, as (line, allowed reason or None). Adds the ALLOWED entries that matched to `used`."""
+    aliases = {alias: table for table, alias in ALIAS.findall(statement)}
+    flagged = []
+    for line in plan:
+        if line.startswith("SCAN") and "VIRTUAL TABLE" not in line:
+            name = SCAN.match(line).group(1)
+            if aliases.get(name, name) not in large_tables:
+                continue
+        elif "USE TEMP B-TREE" not in line:
+            continue
+        allowed = next((entry for entry in ALLOWED if entry[0] == route and line.startswith(entry[1])), None)
+        if allowed is not None:
+            used.add(allowed)
+        flagged.append((line, allowed[2] if allowed else None))
+    return flagged
+
+
+def find_large_tables(engine):
+    """Tables (not virtual ones) with at least LARGE_TABLE_ROWS rows."""
+    with engine.connect() as conn:
+        tables = [name for name, in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%'")]
+        return {table for table in tables
+                if conn.exec_driver_sql(f'SELECT COUNT(*) FROM "{table}"').scalar() >= LARGE_TABLE_ROWS}
+
+
+def audit(engine):
+    """
+    Sends REQUESTS to the routes on a database filled by populate_all() and
+    explains every statement they run. Returns
+    ({route: [(statement, times run, plan, flagged lines)]}, the routes with
+    no request in REQUESTS, the ALLOWED entries that matched).
+    """
+    large_tables = find_large_tables(engine)
+
+    # A few country shapes, so the tile routes have something to cut
+    tile_cache.import_features(synthetic_countries(20, vertices=50), 2)
+
+    app = make_app(engine)
+    current = [None]
+    captured = defaultdict(dict)  # route -> {statement: (parameters, times run)}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if current[0] is not None and statement.lstrip().upper().startswith(EXPLAINED):
+            runs = captured[current[0]]
+            first, count = runs.get(statement, (parameters, 0))
+            runs[statement] = (first, count + 1)
+
+    event.listen(engine, "before_cursor_execute", capture)
+
+    async def run():
+        for method, url, body in REQUESTS:
+            current[0] = route_name(app, method, url)
+            captured[current[0]]  # Listed even if it runs no SQL
+            if url.startswith("/api/changes/stream"):
+                status = await request_stream(app, url)
+            else:
+                status, _, response = await request(app, method, url, {}, body)
+                assert status in (200, 202, 204), (method, url, status, response)
+        current[0] = None
+
+    try:
+        asyncio.run(run())
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    declared = {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute)
+                for method in route.methods}
+    missing = sorted(declared - set(captured) - set(NOT_EXERCISED))
+
+    raw = engine.raw_connection()  # Not through SQLAlchemy, so EXPLAINs aren't captured
+    used = set()
+    routes = {}
+    try:
+        for route in sorted(captured, key=lambda name: (name.split()[1], name.split()[0])):
+            routes[route] = []
+            for statement, (parameters, count) in captured[route].items():
+                plan = explain(raw, statement, parameters)
+                routes[route].append((statement, count, plan, problems(route, statement, plan, large_tables, used)))
+    finally:
+        raw.close()
+    return routes, missing, used
+
+
+def failures(routes):
+    """(route, plan line) for every flagged line that isn't ALLOWED."""
+    return [(route, line) for route, statements in routes.items()
+            for _, _, _, flagged in statements for line, reason in flagged if reason is None]
+
+
+def main():
+    verbose = "--verbose" in sys.argv[1:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'check.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        populate_all(engine, STORIES)
+        tile_cache.path = os.path.join(tmp, "check.mbtiles")
+        large_tables = find_large_tables(engine)
+        routes, missing, used = audit(engine)
+        engine.dispose()
+
+    failed = failures(routes)
+    print(f"{STORIES:,} stories; large tables (>= {LARGE_TABLE_ROWS:,} rows): {', '.join(sorted(large_tables))}\n")
+    for route, statements in routes.items():
+        report = []
+        for statement, count, plan, flagged in statements:
+            if verbose or flagged:
+                times = f" (x{count})" if count > 1 else ""
+                report.append("    " + " ".join(statement.split())[:150] + times)
+                for line in plan if verbose else ():
+                    report.append("        " + line)
+                for line, reason in flagged:
+                    if reason is None:
+                        report.append(f"      FAIL  {line}")
+                    else:
+                        report.append(f"      ok    {line}  ({reason})")
+        bad = sum(1 for failed_route, _ in failed if failed_route == route)
+        status = f"{bad} flagged" if bad else "ok"
+        print(f"{route:<48} {len(statements):>3} statements  {status}")
+        for line in report:
+            print(line)
+
+    print()
+    for route, reason in NOT_EXERCISED.items():
+        print(f"not checked: {route} ({reason})")
+    for entry in ALLOWED:
+        if entry not in used:
+            print(f"ALLOWED entry no plan needed (remove it?): {entry[0]} {entry[1]}")
+    if missing:
+        print(f"\nNo request in REQUESTS for: {', '.join(missing)}")
+    if failed:
+        print(f"\n{len(failed)} plan line(s) scan a large table or sort in a temp B-tree")
+    if failed or missing:
+        sys.exit(1)
+    print("\nNo unexpected scans or sorts")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
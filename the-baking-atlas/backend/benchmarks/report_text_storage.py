@@ -0,0 +1,247 @@
+"""
+Report on compressed text storage (app/database/compression.py): database
+size and SQLite page cache behaviour, before and after compressing.
+
+Fills a scratch database the way an older version stored it, with plain
+text (or, given a path, uses a copy of that database with its text
+decompressed), VACUUMs it, and then makes a second copy with a trained
+dictionary and every long text column compressed. For each copy it prints:
+
+- the file size and the pages each big table takes up
+- for a mix of typical requests (story lists and pages, country lists
+  and pages) with SQLite's default 2 MB page cache: pages read from the
+  file per request, an estimated cache hit rate, and the time taken
+
+Pages read from the file are counted with Linux's /proc/self/io. The hit
+rate estimate compares that with running the same requests with an almost
+empty cache (where practically every page needed is read), so it's
+approximate.
+
+Usage (from the backend folder):
+    python -m benchmarks.report_text_storage                 # 3000 generated stories
+    python -m benchmarks.report_text_storage 10000
+    python -m benchmarks.report_text_storage baking_atlas.db
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import compression
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.routes import countries, stories
+from app.services.story_filter_index import story_filter_index
+from benchmarks.asgi import request
+
+REQUESTS = 1000
+CACHE_SIZE = -2000  # SQLite's default: 2000 KiB per connection
+
+# Made-up editorial prose: common words are much more common than rare ones
+COMMON = ("the of and a to in is was that for it with as on by from at this "
+          "their were be or an which but not they had have are its into than").split()
+BAKING = ("bread dough flour butter sugar oven loaf crust crumb yeast starter rye wheat "
+          "pastry bakery bakers baking knead proof steam honey almond cinnamon cardamom "
+          "festival market village family grandmother recipe morning harvest kitchen "
+          "tradition tradesmen guild monastery empire century region coast mountain").split()
+PHRASES = [
+    "passed down through generations", "in the early hours of the morning",
+    "during the nineteenth century", "at weddings and religious festivals",
+    "a dense, slightly sour crumb", "wood-fired ovens", "the local bakery",
+    "according to oral histories", "sold at the weekly market", "after the harvest",
+]
+
+
+def sentence(rng):
+    words = []
+    for _ in range(rng.randint(10, 24)):
+        roll = rng.random()
+        if roll < 0.5:
+            words.append(COMMON[min(int(rng.paretovariate(1.2)) - 1, len(COMMON) - 1)])
+        elif roll < 0.93:
+            words.append(rng.choice(BAKING))
+        else:
+            words.append(rng.choice(PHRASES))
+    return " ".join(words).capitalize() + "."
+
+
+def story_body(rng):
+    sections = []
+    for section in range(rng.randint(3, 12)):
+        paragraphs = [" ".join(sentence(rng) for _ in range(rng.randint(3, 7))) for _ in range(rng.randint(2, 5))]
+        sections.append(f"## {sentence(rng)[:40]}\n\n" + "\n\n".join(paragraphs))
+    return "\n\n".join(sections)
+
+
+def populate(engine, n):
+    """Stories and countries stored as plain text, like before compression (raw SQL skips it)."""
+    rng = random.Random(11)
+    codes = [f"{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(200)]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO countries (id, name, code, region, overview) VALUES (?, ?, ?, ?, ?)", [
+            (i, f"Country {code}", code, "Testland", " ".join(sentence(rng) for _ in range(rng.randint(5, 15))))
+            for i, code in enumerate(codes, start=1)
+        ])
+        conn.exec_driver_sql(
+            "INSERT INTO stories (id, title, slug, summary, body, time_context, sources, published_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, '2024-01-01 00:00:00', '2024-01-01 00:00:00')",
+            [(i, f"Story {i}", f"story-{i}", sentence(rng), story_body(rng), "modern",
+              "\n".join(f"- {sentence(rng)[:60]} ({rng.randint(1890, 2020)})" for _ in range(rng.randint(2, 8))))
+             for i in range(1, n + 1)],
+        )
+        conn.exec_driver_sql("INSERT INTO story_regions (story_id, country_id) VALUES (?, ?)",
+                             [(i, rng.randint(1, len(codes))) for i in range(1, n + 1)])
+
+
+def decompress_all(engine):
+    """Store a copy of a real database's text plainly again, for the 'before' numbers."""
+    with engine.begin() as conn:
+        for table, column in compression.compressed_columns():
+            conn.exec_driver_sql(f"UPDATE {table} SET {column} = decompress_text({column})")
+
+
+def vacuum(engine):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+def table_pages(path):
+    """{table: (pages, KiB)} for the tables holding the compressed columns."""
+    tables = {table for table, _ in compression.compressed_columns()}
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT name, COUNT(*), SUM(pgsize) FROM dbstat GROUP BY name").all()
+    engine.dispose()
+    return {name: (pages, size / 1024) for name, pages, size in rows if name in tables}
+
+
+def bytes_read():
+    """Bytes this process has read with read() calls so far (Linux only)."""
+    with open("/proc/self/io") as io:
+        for line in io:
+            if line.startswith("rchar:"):
+                return int(line.split()[1])
+
+
+def workload(slugs, codes, rng):
+    urls = []
+    for _ in range(REQUESTS):
+        roll = rng.random()
+        if roll < 0.35:
+            urls.append(f"/api/stories/?limit=50&offset={rng.randrange(0, max(len(slugs) - 50, 1))}")
+        elif roll < 0.55 or not codes:
+            urls.append("/api/countries/")
+        elif roll < 0.75 or not slugs:
+            urls.append(f"/api/countries/{rng.choice(codes)}")
+        else:
+            urls.append(f"/api/stories/{rng.choice(slugs)}")
+    return urls
+
+
+async def run_workload(path, urls, cache_size):
+    """(bytes read from the file, seconds) for the requests, after a warm-up round."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, record: conn.execute(f"PRAGMA cache_size = {cache_size}"))
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def bench_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = bench_db
+
+    story_filter_index.invalidate()
+    for url in urls[:len(urls) // 4]:
+        await request(app, "GET", url)
+
+    read_before = bytes_read()
+    start = time.perf_counter()
+    for url in urls:
+        status, _, _ = await request(app, "GET", url)
+        assert status == 200, url
+    elapsed = time.perf_counter() - start
+    read = bytes_read() - read_before
+    engine.dispose()
+    return read, elapsed
+
+
+def measure(path, urls, page_size):
+    misses, elapsed = asyncio.run(run_workload(path, urls, CACHE_SIZE))
+    needed, _ = asyncio.run(run_workload(path, urls, 1))
+    return {
+        "size": os.path.getsize(path) / 1024 / 1024,
+        "pages": table_pages(path),
+        "misses": misses / page_size / len(urls),
+        "hit_rate": 1 - misses / needed if needed else 1.0,
+        "time": elapsed / len(urls) * 1000,
+    }
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else "3000"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = os.path.join(tmp, "before.db")
+        if argument.isdigit():
+            n = int(argument)
+            engine = create_engine(f"sqlite:///{before}")
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+            print(f"generating {n:,} stories ...")
+            populate(engine, n)
+        else:
+            shutil.copy(argument, before)
+            engine = create_engine(f"sqlite:///{before}")
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+            decompress_all(engine)
+        vacuum(engine)
+        with engine.connect() as conn:
+            page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+            slugs = [slug for slug, in conn.exec_driver_sql("SELECT slug FROM stories")]
+            codes = [code for code, in conn.exec_driver_sql("SELECT code FROM countries")]
+        engine.dispose()
+
+        after = os.path.join(tmp, "after.db")
+        shutil.copy(before, after)
+        engine = create_engine(f"sqlite:///{after}")
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            trained = compression.train(conn) is not None
+            compression.recompress(conn)
+        vacuum(engine)
+        engine.dispose()
+        print(f"compressed in {time.perf_counter() - started:.1f}s "
+              f"({'with a trained dictionary' if trained else 'too little text for a dictionary'})\n")
+
+        urls = workload(slugs, codes, random.Random(2))
+        results = [measure(path, urls, page_size) for path in (before, after)]
+
+    print(f"{'':<34} {'plain text':>14} {'compressed':>14}")
+    print(f"{'database file':<34} " + " ".join(f"{r['size']:>11.1f} MB" for r in results))
+    for table in sorted(results[0]["pages"]):
+        print(f"{table + ' table':<34} " + " ".join(
+            f"{r['pages'].get(table, (0, 0))[1] / 1024:>11.1f} MB" for r in results))
+    print(f"\n{len(urls):,} requests, {abs(CACHE_SIZE)} KiB page cache:")
+    print(f"{'  pages read from file / request':<34} " + " ".join(f"{r['misses']:>14.1f}" for r in results))
+    print(f"{'  page cache hit rate (approx.)':<34} " + " ".join(f"{r['hit_rate']:>14.1%}" for r in results))
+    print(f"{'  time / request':<34} " + " ".join(f"{r['time']:>11.2f} ms" for r in results))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
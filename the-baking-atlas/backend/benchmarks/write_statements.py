@@ -0,0 +1,132 @@
+"""
+Counts the SQL statements each write route runs, and fails if any route
+runs more than its budget.
+
+Run it after changing a write route (from the backend folder):
+    python -m benchmarks.write_statements
+
+Exits with status 1 if a route goes over its budget.
+tests/test_write_statements.py checks the same budgets under pytest.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, get_db
+from app.database.migrations import run_migrations
+from app.routes import countries, stories
+from benchmarks.asgi import request
+
+TRANSACTION_CONTROL = {"BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT"}
+
+# (description, method, url, body, most statements allowed)
+WRITES = [
+    ("create country", "POST", "/api/countries/",
+     {"name": "Korea", "code": "KR", "region": "East Asia"}, 5),
+    ("add baked good", "POST", "/api/countries/JP/baked-goods",
+     {"country_id": 1, "name": "Castella", "category": "cake"}, 3),
+    ("add ingredient (known)", "POST", "/api/countries/KR/ingredients",
+     {"country_id": 2, "name": "Rice flour"}, 4),
+    ("add ingredient (new)", "POST", "/api/countries/KR/ingredients",
+     {"country_id": 2, "name": "Sesame"}, 5),
+    ("replace country", "PUT", "/api/countries/JP",
+     {"name": "Japan", "code": "JP", "region": "East Asia", "overview": "Updated"}, 8),
+    ("patch country", "PATCH", "/api/countries/JP", {"overview": "Patched"}, 6),
+    ("replace baked good", "PUT", "/api/countries/baked-goods/1",
+     {"country_id": 1, "name": "Melonpan", "category": "bread"}, 3),
+    ("patch baked good", "PATCH", "/api/countries/baked-goods/1", {"category": "sweet bread"}, 3),
+    ("replace ingredient", "PUT", "/api/countries/ingredients/1",
+     {"country_id": 1, "name": "Rice flour", "description": "Fine"}, 4),
+    ("patch ingredient", "PATCH", "/api/countries/ingredients/1", {"description": "Very fine"}, 4),
+    ("create story", "POST", "/api/stories/",
+     {"title": "Castella", "slug": "castella", "body": "...", "region_codes": ["JP"],
+      "tag_names": ["sponge"], "extra_data": {"lat": 32.7, "lng": 129.9}}, 13),
+    ("update story", "PUT", "/api/stories/castella", {"summary": "Short"}, 6),
+    ("edit story body", "PUT", "/api/stories/castella",
+     {"body": "A longer body.", "revision_notes": "Expanded"}, 10),
+    ("move story pin", "PUT", "/api/stories/castella", {"extra_data": {"lat": 33.6, "lng": 130.4}}, 12),
+]
+
+
+def count_statements(engine):
+    """
+    Sends WRITES to the routes on an empty database, after creating a
+    country, baked good and ingredient to write to. Returns
+    [(description, statements run, budget, the statements)] per write.
+    """
+    # Like the app's SessionLocal
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def check_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(countries.router)
+    app.include_router(stories.router)
+    app.dependency_overrides[get_db] = check_db
+
+    # Transaction control (the write queue's BEGIN and SAVEPOINTs) isn't
+    # counted, like the BEGIN/COMMIT pysqlite sends by itself
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        if statement.split()[0].upper() not in TRANSACTION_CONTROL:
+            statements.append(statement)
+
+    async def run():
+        # Something to write to
+        await request(app, "POST", "/api/countries/", {}, {"name": "Japan", "code": "JP", "region": "East Asia"})
+        await request(app, "POST", "/api/countries/JP/baked-goods", {}, {"country_id": 1, "name": "Melonpan"})
+        await request(app, "POST", "/api/countries/JP/ingredients", {}, {"country_id": 1, "name": "Rice flour"})
+
+        results = []
+        for description, method, url, body, budget in WRITES:
+            statements.clear()
+            status, _, response = await request(app, method, url, {}, body)
+            assert status == 200, (description, status, response)
+            results.append((description, len(statements), budget, list(statements)))
+        return results
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        return asyncio.run(run())
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'check.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        results = count_statements(engine)
+        engine.dispose()
+
+    over_budget = 0
+    print(f"{'write':<24} {'statements':>10} {'budget':>7}")
+    for description, count, budget, statements in results:
+        flag = "" if count <= budget else "  <-- over budget"
+        print(f"{description:<24} {count:>10} {budget:>7}{flag}")
+        if count > budget:
+            over_budget += 1
+            for statement in statements:
+                print("    " + " ".join(statement.split())[:110])
+    if over_budget:
+        print(f"\n{over_budget} write route(s) over budget")
+        sys.exit(1)
+    print("\nAll write routes within budget")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
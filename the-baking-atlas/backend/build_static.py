@@ -0,0 +1,59 @@
+"""
+Prebuild the public read API as static JSON files for a CDN or static host
+(see app/services/static_build.py for what's built and how).
+
+Usage (from the backend folder):
+    python build_static.py                    # into static_api/
+    python build_static.py --out /srv/site    # somewhere else
+    python build_static.py --full             # render every page again
+
+Run it again after editing content: only pages whose data changed are
+rendered again, and only files whose JSON changed are rewritten, so
+syncing the folder to the host uploads just those. Install the brotli
+package to get .br copies as well as .gz.
+"""
+
+import argparse
+import time
+
+from app.database.database import Base, SessionLocal, engine
+from app.database.migrations import run_migrations
+from app.services import static_build
+
+
+def build_static(out_dir: str, full: bool):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    print("=" * 60)
+    print(f"Building the static API into {out_dir}/...")
+    print("=" * 60)
+    if static_build.brotli is None:
+        print("  (brotli isn't installed: writing .gz copies only)")
+    started = time.perf_counter()
+    result = static_build.build(
+        SessionLocal, out_dir, full=full,
+        progress=lambda done, total: print(f"  {done}/{total}"),
+    )
+    elapsed = time.perf_counter() - started
+
+    entries = static_build.read_manifest(out_dir)["files"]
+    plain = sum(entry["bytes"] for entry in entries.values())
+    gzipped = static_build.compressed_size(entries, "gzip_bytes")
+    brotlied = static_build.compressed_size(entries, "br_bytes")
+
+    print("\n" + "=" * 60)
+    print(f"✓ {len(entries)} pages in {elapsed:.1f}s")
+    print(f"  {result.rendered} rendered, {result.written} written "
+          f"({result.bytes_written / 1024:,.0f} KB), {result.unchanged} unchanged, {result.removed} removed")
+    print(f"  {plain / 1024:,.0f} KB of JSON, {gzipped / 1024:,.0f} KB gzipped"
+          + (f", {brotlied / 1024:,.0f} KB brotli" if brotlied is not None else ""))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prebuild the public read API as static JSON files")
+    parser.add_argument("--out", default="static_api", help="output folder (default: static_api)")
+    parser.add_argument("--full", action="store_true", help="render every page, even those whose data didn't change")
+    args = parser.parse_args()
+    build_static(args.out, args.full)
\ No newline at end of file
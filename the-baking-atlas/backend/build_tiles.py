@@ -0,0 +1,67 @@
+"""
+Build the world map's vector tiles from a GeoJSON file of country boundaries.
+
+Any country boundaries file with ISO alpha-2 codes works, e.g. Natural Earth's
+"Admin 0 - Countries" converted to GeoJSON (ne_50m_admin_0_countries.geojson).
+
+Usage (from the backend folder):
+    python build_tiles.py countries.geojson
+    python build_tiles.py countries.geojson --max-zoom 5
+
+Tiles are written to tiles.mbtiles (or $TILES_MBTILES_PATH) and served by
+the API at /api/tiles/{z}/{x}/{y}.pbf. Tiles the build doesn't reach are
+cut on demand, and edits to countries or stories refresh only their tiles.
+"""
+
+import argparse
+import time
+
+from app.database.database import SessionLocal
+from app.services import versions
+from app.services.vector_tiles import DEFAULT_MAX_ZOOM, country_stats, read_geojson, tile_cache
+
+
+def build_tiles(geojson_path: str, max_zoom: int):
+    print("=" * 60)
+    print(f"Reading {geojson_path}...")
+    print("=" * 60)
+    features = read_geojson(geojson_path)
+    print(f"✓ {len(features)} countries with ISO codes")
+
+    tile_cache.import_features(features, max_zoom)
+
+    db = SessionLocal()
+    try:
+        # Tiles dropped by a write while we cut them aren't stored (see render_and_store)
+        generation = tile_cache.generation()
+        stats = country_stats(db)
+        # New tiles: let cached copies in browsers revalidate
+        versions.bump(db, "tiles")
+        db.commit()
+    finally:
+        db.close()
+    print(f"✓ {len(stats)} countries in the database have content\n")
+
+    tiles = tile_cache.all_tiles(max_zoom)
+    print(f"Cutting {len(tiles)} tiles (zoom 0-{max_zoom})...")
+    started = time.perf_counter()
+    total_bytes = 0
+    for done, (z, x, y) in enumerate(tiles, start=1):
+        total_bytes += len(tile_cache.render_and_store(z, x, y, stats, generation))
+        if done % 500 == 0:
+            print(f"  {done}/{len(tiles)}")
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    print(f"✓ Wrote {len(tiles)} tiles to {tile_cache.path}")
+    print(f"  {elapsed:.1f}s, {len(tiles) / elapsed:.0f} tiles/s, "
+          f"{total_bytes / 1024 / 1024:.1f} MB gzipped")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build vector tiles for the world map")
+    parser.add_argument("geojson", help="GeoJSON file of country boundaries")
+    parser.add_argument("--max-zoom", type=int, default=DEFAULT_MAX_ZOOM)
+    args = parser.parse_args()
+    build_tiles(args.geojson, args.max_zoom)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Retrain the dictionary the long text columns are compressed with, and
+recompress them all with it (see app/database/compression.py).
+
+Worth running once the stories have grown or changed a lot since the last
+training; the first one happens in the database migration.
+
+Usage (from the backend folder):
+    python compress_text.py               # retrain, recompress, VACUUM
+    python compress_text.py --no-vacuum   # leave the freed pages for reuse
+
+It's safe to run while the API is up: values compressed with an older
+dictionary stay readable, and running workers load the new one when they
+first meet a value that uses it.
+"""
+
+import argparse
+import os
+import time
+
+from app.database import compression
+from app.database.database import Base, engine
+from app.database.migrations import run_migrations
+
+
+def stored_sizes(conn):
+    """{(table, column): (plain bytes, stored bytes)} for every compressed column."""
+    sizes = {}
+    for table, column in compression.compressed_columns():
+        sizes[(table, column)] = tuple(conn.exec_driver_sql(
+            f"SELECT COALESCE(SUM(length(CAST(decompress_text({column}) AS BLOB))), 0), "
+            f"COALESCE(SUM(length({column})), 0) FROM {table}"
+        ).one())
+    return sizes
+
+
+def compress_text(vacuum: bool):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    path = engine.url.database
+    size_before = os.path.getsize(path)
+
+    print("=" * 60)
+    print("Training a dictionary on the current text...")
+    print("=" * 60)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        dictionary_id = compression.train(conn)
+        if dictionary_id is None:
+            print(f"✗ Less than {compression.MIN_TRAINING_CHARS // 1024} KB of long text, compressing without a dictionary")
+        else:
+            print(f"✓ Dictionary {dictionary_id} trained")
+        compression.recompress(conn)
+        sizes = stored_sizes(conn)
+    print(f"✓ Recompressed in {time.perf_counter() - started:.1f}s\n")
+
+    for (table, column), (plain, stored) in sizes.items():
+        ratio = f"{plain / stored:.1f}x" if stored else "-"
+        print(f"  {table + '.' + column:<22} {plain / 1024:>10,.0f} KB of text, {stored / 1024:>8,.0f} KB stored ({ratio})")
+
+    if vacuum:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    print("\n" + "=" * 60)
+    print(f"✓ {path}: {size_before / 1024 / 1024:.1f} MB -> {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the text compression dictionary and recompress")
+    parser.add_argument("--no-vacuum", action="store_true", help="don't shrink the database file afterwards")
+    args = parser.parse_args()
+    compress_text(vacuum=not args.no_vacuum)
\ No newline at end of file
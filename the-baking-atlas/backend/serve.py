@@ -0,0 +1,50 @@
+"""
+Run the API with several worker processes, to use more than one CPU core.
+
+Usage (from the backend folder):
+    python serve.py                          # one worker per CPU core, port 8000
+    python serve.py --workers 4 --port 8080 --host 0.0.0.0
+
+All workers share baking_atlas.db. Each keeps its own in-memory indexes,
+and app/services/cache_sync.py drops them when another worker (or a script
+like build_tiles.py) changes the tables they're built from, within
+CACHE_SYNC_INTERVAL seconds (0.25 by default).
+
+A read-only replica of the public site can serve from an in-memory copy of
+the database instead, reloaded when the file changes or on SIGHUP (see
+app/database/snapshot.py); write requests get 405:
+    SERVE_FROM_MEMORY=1 python serve.py
+
+For development with auto-reload, keep using:
+    uvicorn app.main:app --reload
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+from app.database.database import Base, file_engine, use_wal
+from app.database.migrations import run_migrations
+
+
+def prepare_database():
+    """Create and migrate the database once, before the workers start and race to do it."""
+    Base.metadata.create_all(bind=file_engine)
+    run_migrations(file_engine)
+    # WAL lets the other workers keep reading while one of them writes
+    use_wal(file_engine)
+    file_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    prepare_database()
+    print(f"Starting {args.workers} workers on http://{args.host}:{args.port}")
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
\ No newline at end of file
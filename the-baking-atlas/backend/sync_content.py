@@ -0,0 +1,78 @@
+"""
+Sync the content folder into the database (see app/services/content_sync.py
+for the folder's layout and how records are matched).
+
+The content folder is where the atlas's countries, baked goods,
+ingredients, stories and tags are edited: change the files, then run this.
+Only records that changed since the last sync are written, in one
+transaction, so it's quick to run after every edit and safe to run while
+the API is up.
+
+Usage (from the backend folder):
+    python sync_content.py              # apply content/ to the database
+    python sync_content.py --dry-run    # only show what would change
+    python sync_content.py --full       # rewrite every record, changed or not
+    python sync_content.py --dir ../my-content
+    python sync_content.py --export     # write the database's content into the folder
+
+On a new database this creates the tables first, so it's also how a
+fresh database gets its content.
+"""
+
+import argparse
+import sys
+import time
+
+from app.database.database import Base, SessionLocal, engine
+from app.database.migrations import run_migrations
+from app.services import content_sync
+
+
+def sync_content(content_dir: str, dry_run: bool, full: bool):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        result = content_sync.sync(db, content_dir, dry_run=dry_run, full=full)
+    except content_sync.ContentError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+
+    if result.changed:
+        print(f"  {'':<12}{'inserted':>10}{'updated':>10}{'deleted':>10}")
+    for entity in content_sync.ENTITIES:
+        counts = (result.inserted[entity], result.updated[entity], result.deleted[entity])
+        if any(counts):
+            print(f"  {entity:<12}" + "".join(f"{count:>10}" for count in counts))
+    print(f"✓ {result.changed} records {'to write' if dry_run else 'written'}, "
+          f"{result.unchanged} unchanged ({elapsed * 1000:.0f} ms)")
+
+
+def export_content(content_dir: str):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        written = content_sync.export(db, content_dir)
+    finally:
+        db.close()
+    print(f"✓ Wrote {written} files into {content_dir}/")
+    print("  Run python sync_content.py to start syncing from them")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the content folder into the database")
+    parser.add_argument("--dir", default=content_sync.CONTENT_DIR, help="content folder (default: content)")
+    parser.add_argument("--dry-run", action="store_true", help="show what would change without writing it")
+    parser.add_argument("--full", action="store_true", help="write every record, even those whose hash matches")
+    parser.add_argument("--export", action="store_true", help="write the database's content into the folder instead")
+    args = parser.parse_args()
+    if args.export:
+        export_content(args.dir)
+    else:
+        sync_content(args.dir, args.dry_run, args.full)
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Shared fixtures. Run the tests from the backend folder:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.database.database import Base
+from app.database.migrations import run_migrations
+from app.services.cache_sync import CACHES
+from app.services.vector_tiles import tile_cache
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """
+    An empty, migrated database in a temporary folder. It's named like the
+    app's own file, so a server started in that folder (serve.py) uses it.
+
+    The process's in-memory indexes are dropped before and after, so they
+    load from this database and don't carry over to the next test, and the
+    tile cache is kept in the same folder.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'baking_atlas.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    monkeypatch.setattr(tile_cache, "path", str(tmp_path / "tiles.mbtiles"))
+    for _, invalidate in CACHES:
+        invalidate()
+    yield engine
+    for _, invalidate in CACHES:
+        invalidate()
+    engine.dispose()
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""Single-flight GETs (app/routes/coalescing.py)."""
+
+import asyncio
+
+from app.database.database import shared_session
+from app.routes.coalescing import CoalescingMiddleware, CoalescingStats
+
+
+def run_together(count, in_batch=False):
+    """`count` identical GETs at once; how many times the app ran."""
+    runs = []
+
+    async def app(scope, receive, send):
+        runs.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = CoalescingMiddleware(app, CoalescingStats())
+    scope = {"type": "http", "method": "GET", "path": "/api/countries/JP", "query_string": b"", "headers": []}
+
+    async def get():
+        if in_batch:
+            shared_session.set(object())  # Each task has its own copy of the context
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        return sent[0]["status"]
+
+    async def main():
+        return await asyncio.gather(*(get() for _ in range(count)))
+
+    assert asyncio.run(main()) == [200] * count
+    return len(runs)
+
+
+def test_identical_gets_share_one_run():
+    assert run_together(5) == 1
+
+
+def test_batch_sub_requests_run_on_their_own():
+    assert run_together(5, in_batch=True) == 5
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""?extra.<key>=<value> filtering (app/routes/filters.py), for indexed and unindexed keys alike."""
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.routes.filters import filter_by_extra, parse_value
+
+EXTRA_DATA = {
+    1: {"texture": "crispy", "occasions": ["new-year", "wedding"], "layers": 3},
+    2: {"texture": ["crispy", "soft"], "occasions": "new-year", "layers": [2, 3]},
+    3: {"texture": "soft", "occasions": ["wedding"]},
+    4: {"texture": {"crust": "crispy"}, "occasions": {"when": "new-year"}},  # Objects never match
+    5: None,
+}
+
+
+@pytest.fixture
+def db(engine):
+    with Session(bind=engine) as db:
+        db.add(models.Country(id=1, name="Japan", code="JP"))
+        db.add_all(models.BakedGood(id=id, country_id=1, name=f"Loaf {id}", extra_data=extra_data)
+                   for id, extra_data in EXTRA_DATA.items())
+        db.commit()
+        yield db
+
+
+def matching(db, **filters):
+    query = filter_by_extra(db.query(models.BakedGood.id), models.BakedGood,
+                            {key: parse_value(value) for key, value in filters.items()})
+    return {id for id, in query}
+
+
+def test_texture_is_indexed_and_occasions_is_not():
+    assert "texture" in models.BakedGood.EXTRA_INDEXED_KEYS
+    assert "occasions" not in models.BakedGood.EXTRA_INDEXED_KEYS
+
+
+@pytest.mark.parametrize("key", ["texture", "occasions"])
+def test_scalar_and_list_values_match_the_same_way(db, key):
+    value = {"texture": "crispy", "occasions": "new-year"}[key]
+    assert matching(db, **{key: value}) == {1, 2}
+
+
+def test_list_only_value(db):
+    assert matching(db, occasions="wedding") == {1, 3}
+    assert matching(db, texture="soft") == {2, 3}
+
+
+def test_numbers_and_several_keys(db):
+    assert matching(db, layers="3") == {1, 2}
+    assert matching(db, texture="crispy", occasions="wedding") == {1}
+    assert matching(db, texture="chewy") == set()
\ No newline at end of file
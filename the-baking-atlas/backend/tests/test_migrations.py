@@ -0,0 +1,47 @@
+"""Migrations (app/database/migrations.py) on databases in an older shape."""
+
+import json
+
+from app.database import migrations
+
+
+def test_canonical_ingredients_merges_duplicates(engine):
+    with engine.begin() as conn:
+        # ingredients as it was before canonical_ingredients, one row per country and spelling
+        conn.exec_driver_sql("DROP TABLE ingredients")
+        conn.exec_driver_sql(
+            "CREATE TABLE ingredients (id INTEGER PRIMARY KEY, country_id INTEGER NOT NULL REFERENCES countries (id), "
+            "name VARCHAR(200) NOT NULL, description TEXT, extra_data JSON)"
+        )
+        conn.exec_driver_sql("INSERT INTO countries (id, name, code) VALUES (1, 'Japan', 'JP'), (2, 'France', 'FR')")
+        conn.exec_driver_sql("INSERT INTO ingredients VALUES (?, ?, ?, ?, ?)", [
+            (1, 1, "Matcha", None, json.dumps({"grade": "ceremonial"})),
+            (2, 1, " matcha ", "Powdered green tea", json.dumps({"grade": "culinary", "season": "spring"})),
+            (3, 1, "MATCHA", "Tea", None),
+            (4, 1, "Butter", None, None),
+            (5, 2, "Butter", "Cultured", json.dumps({"salted": True})),
+            (6, 2, "butter", None, json.dumps(["not", "an", "object"])),
+            (7, 2, "Flour", None, None),
+            (8, 2, "flour", None, json.dumps({"type": 55})),
+        ])
+
+        migrations.canonical_ingredients(conn)
+
+        canonical = dict(conn.exec_driver_sql("SELECT normalized_name, name FROM canonical_ingredients").all())
+        rows = {
+            (country_id, name): (id, description, json.loads(extra) if extra else None)
+            for id, country_id, name, description, extra in conn.exec_driver_sql(
+                "SELECT ingredients.id, country_id, canonical_ingredients.name, description, extra_data "
+                "FROM ingredients JOIN canonical_ingredients ON canonical_ingredients.id = canonical_id"
+            )
+        }
+
+    assert canonical == {"matcha": "Matcha", "butter": "Butter", "flour": "Flour"}
+    assert rows == {
+        # The oldest row is kept; a missing description is borrowed, extra_data is merged
+        (1, "Matcha"): (1, "Powdered green tea", {"grade": "ceremonial", "season": "spring"}),
+        (1, "Butter"): (4, None, None),
+        # A list can't be merged into an object: the oldest row's value wins
+        (2, "Butter"): (5, "Cultured", {"salted": True}),
+        (2, "Flour"): (7, None, {"type": 55}),
+    }
\ No newline at end of file
@@ -0,0 +1,11 @@
+"""Writes reach every worker's in-memory indexes (benchmarks/check_multi_worker.py), with real worker processes."""
+
+from benchmarks import check_multi_worker
+
+
+def test_every_worker_catches_up(engine, tmp_path):
+    engine.dispose()  # serve.py opens the file itself
+    results = check_multi_worker.measure(str(tmp_path), workers=4)
+    stale = [(description, stale_for) for description, stale_for in results
+             if stale_for is None or stale_for > check_multi_worker.BOUND]
+    assert not stale
\ No newline at end of file
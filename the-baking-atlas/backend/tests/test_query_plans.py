@@ -0,0 +1,10 @@
+"""The query plan audit (benchmarks/query_plans.py), on its generated dataset."""
+
+from benchmarks import query_plans
+
+
+def test_no_unexpected_scans_or_sorts(engine):
+    query_plans.populate_all(engine, query_plans.STORIES)
+    routes, missing, _ = query_plans.audit(engine)
+    assert not missing, "routes with no request in REQUESTS"
+    assert not query_plans.failures(routes)
\ No newline at end of file
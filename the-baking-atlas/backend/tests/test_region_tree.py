@@ -0,0 +1,58 @@
+"""The region tree's closure table (app/services/region_tree.py) against its parent pointers."""
+
+import random
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.models import Region, region_closure
+from app.services import region_tree
+
+
+def closure(db):
+    return set(db.execute(select(region_closure.c.ancestor_id, region_closure.c.descendant_id,
+                                 region_closure.c.depth)).all())
+
+
+def closure_from_parents(db):
+    """(ancestor, descendant, depth) for every region, walking up its parent pointers."""
+    parents = dict(db.execute(select(Region.id, Region.parent_region_id)).all())
+    rows = set()
+    for region_id in parents:
+        ancestor, depth = region_id, 0
+        while ancestor is not None:
+            rows.add((ancestor, region_id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    return rows
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_closure_follows_adds_and_moves(engine):
+    rng = random.Random(3)
+    with Session(bind=engine) as db:
+        ids = []
+        for i in range(40):
+            parent = rng.choice(ids) if ids and rng.random() < 0.8 else None
+            ids.append(region_tree.add_region(db, f"Region {i}", "region", parent))
+        assert closure(db) == closure_from_parents(db)
+
+        for _ in range(100):
+            region_id = rng.choice(ids)
+            # A region can't move under itself or its own descendants
+            candidates = [None] + [id for id in ids if not region_tree.is_descendant(db, id, region_id)]
+            region_tree.move_region(db, region_id, rng.choice(candidates))
+            assert closure(db) == closure_from_parents(db)
+
+
+def test_is_descendant(engine):
+    with Session(bind=engine) as db:
+        asia = region_tree.add_region(db, "Asia", "region")
+        east = region_tree.add_region(db, "East Asia", "subregion", asia)
+        europe = region_tree.add_region(db, "Europe", "region")
+        assert region_tree.is_descendant(db, east, asia)
+        assert region_tree.is_descendant(db, asia, asia)
+        assert not region_tree.is_descendant(db, asia, east)
+        region_tree.move_region(db, east, europe)
+        assert region_tree.is_descendant(db, east, europe)
+        assert not region_tree.is_descendant(db, east, asia)
\ No newline at end of file
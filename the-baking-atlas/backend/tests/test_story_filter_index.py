@@ -0,0 +1,123 @@
+"""The in-memory story filter index (app/services/story_filter_index.py)."""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.story_filter_index import StoryFilterIndex
+
+# story id -> (tags, country codes, time context, published day)
+STORIES = {
+    1: (["rice", "steaming"], ["JP"], "modern", 1),
+    2: (["rice"], ["KR"], "traditional", 2),
+    3: (["steaming"], ["CN", "KR"], "traditional", 3),
+    4: (["rice", "steaming", "festival"], ["JP", "KR"], None, 4),
+    5: ([], ["FR"], "modern", None),  # Unpublished: sorts last
+}
+
+
+def story(story_id, tags, regions, time_context, day):
+    return SimpleNamespace(
+        id=story_id, tags=[SimpleNamespace(name=name) for name in tags],
+        regions=[SimpleNamespace(code=code) for code in regions], time_context=time_context,
+        published_at=datetime(2024, 1, day) if day else None,
+    )
+
+
+class FakeIndex(StoryFilterIndex):
+    """Reads STORIES instead of the database, and runs `during_read` midway."""
+
+    def __init__(self, stories, during_read=None):
+        super().__init__()
+        self.stories = stories
+        self.during_read = during_read
+
+    def _read(self, db):
+        rows = dict(self.stories)  # What the load sees, before any write below
+        if self.during_read:
+            self.during_read(self)
+        return ({story_id: row[0] for story_id, row in rows.items()},
+                {story_id: row[1] for story_id, row in rows.items()},
+                [(story_id, row[2], datetime(2024, 1, row[3]) if row[3] else None)
+                 for story_id, row in rows.items()])
+
+
+def loaded(stories=STORIES, during_read=None):
+    index = FakeIndex(stories, during_read)
+    index.load(db=None)
+    return index
+
+
+def test_order_and_paging():
+    index = loaded()
+    assert index.query() == ([4, 3, 2, 1, 5], 5)
+    assert index.query(offset=1, limit=2) == ([3, 2], 5)
+
+
+def test_match_all_and_any():
+    index = loaded()
+    assert index.query(tags=["rice", "steaming"]) == ([4, 1], 2)
+    assert index.query(tags=["rice", "steaming"], match_all=False) == ([4, 3, 2, 1], 4)
+    # Each region value is a group of countries, matched by any of them
+    assert index.query(regions=[["JP"], ["KR"]]) == ([4], 1)
+    assert index.query(regions=[["JP"], ["KR"]], match_all=False) == ([4, 3, 2, 1], 4)
+    assert index.query(regions=[["JP", "CN"]]) == ([4, 3, 1], 3)
+    # Time contexts are always "any of these"; different filters are ANDed
+    assert index.query(time_contexts=["modern", "traditional"]) == ([3, 2, 1, 5], 4)
+    assert index.query(tags=["rice"], time_contexts=["traditional"]) == ([2], 1)
+    assert index.query(tags=["unknown"]) == ([], 0)
+    assert index.query(tags=["rice"], match_all=False, offset=1, limit=1) == ([2], 3)
+
+
+def test_within():
+    index = loaded()
+    assert index.query(within={1, 3, 5}) == ([3, 1, 5], 3)
+    assert index.query(tags=["steaming"], within={1, 2, 3}) == ([3, 1], 2)
+    # Ids the index doesn't know yet (written by another worker) are left out
+    assert index.query(within={2, 99}) == ([2], 1)
+    assert index.query(within=set()) == ([], 0)
+
+
+def test_updates():
+    index = loaded()
+    index.set_story(story(2, ["steaming"], ["CN"], "modern", 10))
+    index.remove_story(4)
+    index.rename_region("KR", "KP")
+    assert index.query() == ([2, 3, 1, 5], 4)
+    assert index.query(tags=["rice"]) == ([1], 1)
+    assert index.query(regions=[["KP"]]) == ([3], 1)
+    assert index.query(regions=[["KR"]]) == ([], 0)
+    index.remove_tag("steaming")
+    assert index.query(tags=["steaming"]) == ([], 0)
+
+
+def test_writes_during_load_are_replayed():
+    def write(index):
+        # These commit after load() has read its rows
+        index.set_story(story(6, ["rice"], ["JP"], "modern", 20))
+        index.set_story(story(1, ["festival"], ["JP"], "modern", 1))
+        index.remove_story(3)
+
+    index = loaded(during_read=write)
+    assert index.query() == ([6, 4, 2, 1, 5], 5)
+    assert index.query(tags=["rice"]) == ([6, 4, 2], 3)
+    assert index.query(tags=["festival"]) == ([4, 1], 2)
+    assert index.query(regions=[["CN"]]) == ([], 0)
+
+    # The replayed writes are done with; a second load doesn't repeat them
+    index.during_read = None
+    index.stories = {**STORIES, 6: (["rice"], ["JP"], "modern", 20)}
+    index.load(db=None)
+    assert index.query() == ([6, 4, 3, 2, 1, 5], 6)
+
+
+def test_failed_load_doesnt_keep_pending_writes():
+    def fail(index):
+        index.set_story(story(6, ["rice"], ["JP"], "modern", 20))
+        raise RuntimeError("database is locked")
+
+    index = FakeIndex(STORIES, fail)
+    try:
+        index.load(db=None)
+    except RuntimeError:
+        pass
+    assert not index.loaded and index._pending == [] and index._loading == 0
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Map pins and their clusters (app/services/story_pins.py, GET /api/stories/pins/)."""
+
+import random
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.routes.stories import get_story_pins
+from app.services import story_pins
+
+
+@pytest.fixture
+def db(engine):
+    rng = random.Random(5)
+    with Session(bind=engine) as db:
+        for i in range(1, 41):
+            # 30 stories in a small patch of Tokyo, 10 spread over the world
+            if i <= 30:
+                extra_data = {"lat": 35.68 + rng.uniform(0, 0.01), "lng": 139.69 + rng.uniform(0, 0.01)}
+            else:
+                extra_data = {"lat": rng.uniform(-60, 60), "lng": rng.uniform(-170, 170)}
+            db.add(models.Story(id=i, title=f"Story {i}", slug=f"story-{i}", body="...", extra_data=extra_data))
+            db.flush()
+            story_pins.set_pin(db, i, extra_data, new=True)
+        db.commit()
+        yield db
+
+
+def counts(pins):
+    return sum(pin.count for pin in pins)
+
+
+def test_zoomed_in_pins_come_back_one_by_one(db):
+    pins = get_story_pins(bbox="139.6,35.6,139.8,35.8", zoom=15, db=db)
+    assert len(pins) == 30
+    assert {pin.type for pin in pins} == {"story"}
+    assert {pin.slug for pin in pins} == {f"story-{i}" for i in range(1, 31)}
+
+
+def test_too_many_pins_come_back_clustered(db, monkeypatch):
+    monkeypatch.setattr(story_pins, "MAX_PINS", 20)
+    pins = get_story_pins(bbox="139.6,35.6,139.8,35.8", zoom=15, db=db)
+    assert any(pin.type == "cluster" for pin in pins)
+    assert counts(pins) == 30
+
+
+def test_zoomed_out_clusters_count_every_pin(db):
+    for zoom in range(0, story_pins.CLUSTER_MAX_ZOOM + 1):
+        assert counts(get_story_pins(bbox="-180,-85,180,85", zoom=zoom, db=db)) == 40
\ No newline at end of file
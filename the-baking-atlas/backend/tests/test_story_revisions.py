@@ -0,0 +1,84 @@
+"""Story revision deltas and rebuilding revisions (app/services/story_revisions.py)."""
+
+import random
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services import story_revisions
+from app.services.story_revisions import SNAPSHOT_EVERY, apply_delta, make_delta
+
+# Lines that exercise splitlines(): blank lines, CRLF, no final newline,
+# non-ASCII, and separators other than \n (form feed, U+2028)
+LINES = ["Flour, water, salt.\n", "\n", "Knead for ten minutes.\r\n", "Crème pâtissière\n",
+         "パン\n", "Fold\x0cand rest\n", "Bake until golden\n", "# Heading\n", "- a list item\n"]
+
+
+def random_edit(rng, body):
+    lines = body.splitlines(keepends=True)
+    for _ in range(rng.randint(1, 4)):
+        position = rng.randint(0, len(lines))
+        action = rng.choice(("insert", "delete", "replace"))
+        if action == "insert" or not lines:
+            lines[position:position] = rng.choices(LINES, k=rng.randint(1, 3))
+        elif action == "delete":
+            del lines[min(position, len(lines) - 1):position + rng.randint(1, 3)]
+        else:
+            lines[min(position, len(lines) - 1)] = rng.choice(LINES)
+    body = "".join(lines)
+    if rng.random() < 0.2:
+        body = body.rstrip("\n")  # Sometimes no newline at the end
+    return body
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""),
+    ("", "Just one line"),
+    ("One line\n", ""),
+    ("a\nb\nc\n", "a\nb\nc"),
+    ("a\r\nb\r\n", "a\nb\n"),
+    ("same\n", "same\n"),
+])
+def test_delta_edge_cases(old, new):
+    assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_delta_round_trip_fuzz():
+    rng = random.Random(11)
+    body = "".join(rng.choices(LINES, k=30))
+    for _ in range(500):
+        new = random_edit(rng, body)
+        assert apply_delta(body, make_delta(body, new)) == new
+        body = new
+
+
+def test_get_revision_across_snapshots(engine):
+    rng = random.Random(7)
+    bodies = ["".join(rng.choices(LINES, k=40))]
+    with Session(bind=engine) as db:
+        story = models.Story(id=1, title="Bread", slug="bread", body=bodies[0])
+        db.add(story)
+        db.flush()
+        story_revisions.record_first(db, story)
+        for number in range(2, 3 * SNAPSHOT_EVERY + 3):
+            bodies.append(random_edit(rng, bodies[-1]))
+            story_revisions.record(db, 1, bodies[-2], f"Bread {number}", bodies[-1])
+        db.commit()
+
+        snapshots = [number for number, in db.execute(
+            select(models.StoryRevision.number)
+            .where(models.StoryRevision.body.isnot(None)).order_by(models.StoryRevision.number)
+        )]
+        # Revision 1 and then at least one every SNAPSHOT_EVERY
+        assert snapshots[0] == 1
+        assert all(b - a <= SNAPSHOT_EVERY for a, b in zip(snapshots, snapshots[1:] + [len(bodies) + 1]))
+        assert len(snapshots) < len(bodies)  # Most revisions are deltas
+
+        for number, body in enumerate(bodies, start=1):
+            revision = story_revisions.get_revision(db, 1, number)
+            assert revision["body"] == body, number
+            assert revision["title"] == ("Bread" if number == 1 else f"Bread {number}")
+        assert story_revisions.get_revision(db, 1, len(bodies) + 1) is None
+        assert [r["number"] for r in story_revisions.list_revisions(db, 1)] == list(range(len(bodies), 0, -1))
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""Cutting story bodies into sections (app/services/story_sections.py)."""
+
+import pytest
+
+from app.services.story_sections import split_sections
+
+BODY = """A note before any heading: crème brûlée, 抹茶, ünïcödé.
+
+# Pâte à choux
+
+Cook the panade — then beat in the eggs 🥚 one by one.
+
+```python
+# Not a heading, it's inside a code block
+print("é")
+```
+
+## Crème pâtissière ##
+
+~~~~
+### Not a heading either
+~~~
+# Still in the block (closed by at least four ~)
+~~~~
+
+### 焼き菓子\r
+Line with a CRLF ending.\r
+#Not a heading (no space)
+######
+"""
+
+
+def assert_consistent(body, sections):
+    encoded = body.encode("utf-8")
+    for section in sections:
+        assert encoded[section.byte_offset:section.byte_offset + section.byte_length].decode("utf-8") == section.body
+    assert "".join(section.body for section in sections) == body
+    assert [section.number for section in sections] == list(range(1, len(sections) + 1))
+
+
+def test_split_sections():
+    sections = split_sections(BODY)
+    assert_consistent(BODY, sections)
+    assert [(s.heading, s.level) for s in sections] == [
+        (None, 0), ("Pâte à choux", 1), ("Crème pâtissière", 2), ("焼き菓子", 3), ("", 6)]
+    assert sections[0].body.startswith("A note before any heading")
+    assert "Not a heading, it's inside" in sections[1].body
+    assert "Still in the block" in sections[2].body
+    assert "#Not a heading" in sections[3].body
+    # Multi-byte characters make byte offsets run ahead of character offsets
+    assert sections[1].byte_offset > BODY.index("# Pâte")
+
+
+@pytest.mark.parametrize("body", [
+    "",
+    "No headings at all, just ünïcödé text",
+    "# Only a heading",
+    "# First\n\n# Second\n",
+    "\n\n# Blank lines before the first heading\n",
+    "```\n# An unclosed code block\n",
+    "Form\x0cfeed and line separator\n# é\n",
+])
+def test_split_sections_edge_cases(body):
+    assert_consistent(body, split_sections(body))
+
+
+def test_no_section_for_empty_text():
+    assert split_sections("") == []
+    assert [s.heading for s in split_sections("# First\n")] == ["First"]
+    # Blank lines before the first heading are still text, so they're kept
+    assert [s.heading for s in split_sections("\n# First\n")] == [None, "First"]
\ No newline at end of file
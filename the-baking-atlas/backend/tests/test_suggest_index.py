@@ -0,0 +1,62 @@
+"""Ranking of the in-memory typeahead index (app/services/suggest_index.py)."""
+
+from app.services.suggest_index import SuggestIndex
+
+
+def make_index(rows):
+    index = SuggestIndex()
+    index.build(rows)
+    return index
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+def test_prefix_matches_rank_exact_then_prefix_then_word():
+    index = make_index([
+        ("baked_good", 1, "Melonpan", None),
+        ("baked_good", 2, "Melon pan", None),
+        ("baked_good", 3, "Melonpan Deluxe", None),
+        ("baked_good", 4, "Sweet melonpan", None),
+        ("baked_good", 5, "Anpan", None),
+    ])
+    results = index.suggest("melonpan")
+    # Exact (with or without the space) first, shorter names before longer ones
+    assert names(results)[:2] == ["Melon pan", "Melonpan"]
+    assert names(results)[2:] == ["Melonpan Deluxe", "Sweet melonpan"]
+    assert results[0]["score"] > results[2]["score"] > results[3]["score"]
+
+
+def test_fuzzy_match_only_when_no_prefix_matches():
+    index = make_index([
+        ("baked_good", 1, "Castella", None),
+        ("baked_good", 2, "Cassata", None),
+        ("country", 3, "Japan", "JP"),
+    ])
+    assert names(index.suggest("castela")) == ["Castella"]
+    # A prefix match keeps the fuzzy ones out
+    assert names(index.suggest("cas")) == ["Cassata", "Castella"]
+
+
+def test_kinds_filter_applies_before_the_candidate_cap():
+    rows = [("baked_good", i, f"Bread {i}", None) for i in range(200)]
+    rows += [("tag", 1, "breton", "breton"), ("tag", 2, "brezel", "brezel")]
+    index = make_index(rows)
+    results = index.suggest("bre", limit=5, kinds=["tag"])
+    assert [(result["type"], result["name"]) for result in results] == [("tag", "breton"), ("tag", "brezel")]
+
+
+def test_kinds_filter_applies_to_fuzzy_matches():
+    rows = [("baked_good", i, "Castella", None) for i in range(100)]
+    rows.append(("tag", 1, "castella", "castella"))
+    index = make_index(rows)
+    assert names(index.suggest("castela", kinds=["tag"])) == ["castella"]
+
+
+def test_removed_and_renamed_entries():
+    index = make_index([("country", 1, "Japan", "JP"), ("country", 2, "Jamaica", "JM")])
+    index.remove("country", 2)
+    index.add("country", 1, "Nippon", "JP")
+    assert names(index.suggest("ja")) == []
+    assert names(index.suggest("nip")) == ["Nippon"]
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""The statement budgets of the write routes (benchmarks/write_statements.py)."""
+
+from benchmarks import write_statements
+
+
+def test_write_routes_within_budget(engine):
+    results = write_statements.count_statements(engine)
+    over_budget = [(description, count, budget) for description, count, budget, _ in results if count > budget]
+    assert not over_budget
\ No newline at end of file
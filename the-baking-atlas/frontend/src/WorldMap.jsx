@@ -4,6 +4,12 @@ import 'maplibre-gl/dist/maplibre-gl.css';
 
 const MAPTILER_KEY = import.meta.env.VITE_MAPTILER_KEY;
 
+// Set VITE_SELF_HOSTED_TILES=true to use the country tiles our backend serves
+// (built with backend/build_tiles.py) instead of MapTiler's
+const COUNTRY_TILES_URL = import.meta.env.VITE_SELF_HOSTED_TILES === 'true'
+  ? 'http://localhost:8000/api/tiles/tiles.json'
+  : `https://api.maptiler.com/tiles/countries/tiles.json?key=${MAPTILER_KEY}`;
+
 // Color palette for countries with data
 const COUNTRY_COLORS = [
   '#667eea', // Purple-blue
@@ -94,11 +100,11 @@ function WorldMap({ countries, onCountryClick }) {
     map.current.addControl(new maplibregl.NavigationControl(), 'top-left');
 
     map.current.on('load', () => {
-      // Add country boundaries source from MapTiler
+      // Add country boundaries source (MapTiler, or our own backend)
       // Use promoteId to set iso_a2 as the feature ID for feature-state to work
       map.current.addSource('countries', {
         type: 'vector',
-        url: `https://api.maptiler.com/tiles/countries/tiles.json?key=${MAPTILER_KEY}`,
+        url: COUNTRY_TILES_URL,
         promoteId: { 'administrative': 'iso_a2' }
       });
 